@@ -0,0 +1,201 @@
+"""
+End-to-end benchmark: ingest, retrieval and generation on a synthetic corpus.
+
+Uses the in-process stub LLM backend by default, so only the embedding model
+has to be available locally. Caches are disabled so every stage does real work.
+The near-duplicate gate stays on: stub questions are worded from each prompt's
+topic and textbook context, so regenerations are rare. llm_usage counts them
+as extra requests, and questions still flagged are reported as near_duplicates.
+Results are JSON (with the git commit) for comparing runs across commits.
+Run from the repository root:
+    python -m bench.bench_end_to_end --questions 5000 --textbook-mb 5 --output end_to_end.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from config import Config
+from data_processor import DataProcessor
+from question_generator import QuestionGenerator
+from bench.synthetic_corpus import write_corpus, make_queries
+
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+def latency_summary(samples):
+    return {
+        "count": len(samples),
+        "p50_ms": percentile_ms(samples, 50),
+        "p95_ms": percentile_ms(samples, 95),
+        "p99_ms": percentile_ms(samples, 99),
+    }
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return round(peak / (1 << 20) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_config(args, workdir: str) -> Config:
+    class BenchConfig(Config):
+        VECTOR_DB_BACKEND = args.vector_backend
+        VECTOR_DB_PATH = os.path.join(workdir, "vector_db")
+        INGEST_MANIFEST_PATH = os.path.join(workdir, "vector_db", "ingest_manifest.json")
+        EMBEDDING_CACHE_PATH = None
+        RETRIEVAL_CACHE_SIZE = 0
+        LLM_BACKEND = args.llm_backend
+        LLM_STUB_LATENCY = args.llm_latency
+        LLM_CACHE_PATH = None
+
+    if args.embedding_model:
+        BenchConfig.EMBEDDING_MODEL = args.embedding_model
+    return BenchConfig()
+
+
+def bench_chunking(config: Config, textbook_path: str):
+    processor = DataProcessor(config.CHUNK_SIZE, config.CHUNK_OVERLAP)
+    start = time.perf_counter()
+    chunks = sum(1 for _ in processor.iter_textbook_file(textbook_path, block_size=config.TEXTBOOK_READ_BLOCK_SIZE))
+    elapsed = time.perf_counter() - start
+    return {"chunks": chunks, "seconds": round(elapsed, 3), "chunks_per_second": round(chunks / elapsed, 1)}
+
+
+def bench_ingest(generator: QuestionGenerator, questions_path: str, textbook_path: str):
+    embedding_system = generator.embedding_system
+    start = time.perf_counter()
+    generator.initialize_database(questions_file=questions_path)
+    questions_seconds = time.perf_counter() - start
+    questions = embedding_system.questions_collection.count()
+
+    start = time.perf_counter()
+    generator.initialize_database(textbook_file=textbook_path)
+    textbook_seconds = time.perf_counter() - start
+    chunks = embedding_system.textbook_collection.count()
+
+    return {
+        "questions": questions,
+        "questions_seconds": round(questions_seconds, 3),
+        "questions_per_second": round(questions / questions_seconds, 1),
+        "textbook_chunks": chunks,
+        "textbook_seconds": round(textbook_seconds, 3),
+        "textbook_chunks_per_second": round(chunks / textbook_seconds, 1),
+        "embeddings_per_second": round((questions + chunks) / (questions_seconds + textbook_seconds), 1),
+    }
+
+
+def bench_retrieval(generator: QuestionGenerator, queries, top_k_questions: int, top_k_textbook: int):
+    embedding_system = generator.embedding_system
+    # Warm-up: model kernels and the first query of each collection
+    embedding_system.search_similar_questions(queries[0], top_k_questions)
+    embedding_system.search_relevant_textbook(queries[0], top_k_textbook)
+
+    results = {}
+    for name, search, top_k in (("questions", embedding_system.search_similar_questions, top_k_questions),
+                                ("textbook", embedding_system.search_relevant_textbook, top_k_textbook)):
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            search(query, top_k)
+            latencies.append(time.perf_counter() - start)
+        results[name] = latency_summary(latencies)
+    return results
+
+
+def bench_generation(generator: QuestionGenerator, topics, batch_topics, max_concurrency: int):
+    latencies = []
+    errors = 0
+    near_duplicates = 0
+    start = time.perf_counter()
+    for topic in topics:
+        single_start = time.perf_counter()
+        question = generator.generate_new_question(topic)
+        latencies.append(time.perf_counter() - single_start)
+        errors += "error" in question
+        near_duplicates += "near_duplicate" in question
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = generator.batch_generate_questions(batch_topics, max_concurrency=max_concurrency)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "single": dict(latency_summary(latencies),
+                       questions_per_second=round(len(topics) / single_seconds, 2),
+                       errors=errors,
+                       near_duplicates=near_duplicates),
+        "batch": {
+            "questions": len(batch),
+            "seconds": round(batch_seconds, 3),
+            "questions_per_second": round(len(batch) / batch_seconds, 2),
+            "errors": sum("error" in q for q in batch),
+            "near_duplicates": sum("near_duplicate" in q for q in batch),
+            "max_concurrency": max_concurrency,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=5000, help="Synthetic questions to ingest")
+    parser.add_argument("--textbook-mb", type=float, default=5.0, help="Megabytes of synthetic textbook text")
+    parser.add_argument("--queries", type=int, default=200, help="Retrieval queries per search type")
+    parser.add_argument("--generate", type=int, default=20, help="Sequential generate_new_question calls")
+    parser.add_argument("--batch", type=int, default=50, help="Topics in the batch_generate_questions run")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--vector-backend", default="numpy", choices=["numpy", "chroma"])
+    parser.add_argument("--llm-backend", default="stub", choices=["stub", "http", "openai"],
+                        help="http/openai use LLM_BASE_URL and OPENAI_API_KEY from the environment")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per stub LLM request")
+    parser.add_argument("--embedding-model", help="Override Config.EMBEDDING_MODEL")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    questions_path, textbook_path = write_corpus(os.path.join(workdir, "corpus"), args.questions,
+                                                 args.textbook_mb, args.seed)
+    config = make_config(args, workdir)
+
+    start = time.perf_counter()
+    generator = QuestionGenerator(config)
+    startup_seconds = time.perf_counter() - start
+
+    queries = make_queries(args.queries, args.seed + 1)
+    report = {
+        "commit": git_commit(),
+        "parameters": vars(args),
+        "embedding_model": config.EMBEDDING_MODEL,
+        "startup_seconds": round(startup_seconds, 3),
+        "chunking": bench_chunking(config, textbook_path),
+        "ingest": bench_ingest(generator, questions_path, textbook_path),
+        "retrieval": bench_retrieval(generator, queries, config.TOP_K_QUESTIONS, config.TOP_K_TEXTBOOK),
+        "generation": bench_generation(generator, queries[:args.generate], make_queries(args.batch, args.seed + 2),
+                                       args.max_concurrency),
+        "llm_usage": generator.llm.usage_stats(),
+    }
+    report["peak_rss_mb"] = peak_rss_mb()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
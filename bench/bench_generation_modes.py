@@ -0,0 +1,118 @@
+"""
+Compare the two-call (generate, then evaluate) and combined generate-and-evaluate paths.
+
+Runs against a local stub chat-completions server by default, or entirely
+in-process with --in-process (no sockets); pass --base-url and --api-key to
+measure a real OpenAI-compatible endpoint instead (--backend http for a
+local llama.cpp/vLLM server).
+Run from the repository root:
+    python -m bench.bench_generation_modes --questions 20 --latency 0.3 --output generation_modes.json
+"""
+import argparse
+import json
+import time
+import numpy as np
+from llm_integration import LLMIntegration
+from llm_backends import StubBackend
+from llm_stub_server import StubLLMServer
+
+
+def make_context(count: int):
+    similar_questions = [{
+        "question": f"Which process in plants converts light energy into chemical energy? ({i})",
+        "answer": "Photosynthesis",
+        "topic": "Biology",
+    } for i in range(5)]
+    textbook_content = [{
+        "id": f"chunk_{i}",
+        "content": "Photosynthesis takes place in the chloroplasts. " * 8 + f"Passage {i}.",
+        "chapter": "Chapter 2",
+        "subject": "Biology",
+    } for i in range(3)]
+    return [(f"photosynthesis topic {i}", similar_questions, textbook_content) for i in range(count)]
+
+
+def run_mode(llm: LLMIntegration, mode: str, contexts, max_tokens: int):
+    before = llm.usage_stats()
+    latencies = []
+    valid = 0
+    for topic, similar_questions, textbook_content in contexts:
+        start = time.perf_counter()
+        if mode == "separate":
+            question = llm.generate_question(topic, similar_questions, textbook_content, max_tokens=max_tokens)
+            question["evaluation"] = llm.evaluate_question_quality(question)
+        else:
+            question = llm.generate_and_evaluate_question(topic, similar_questions, textbook_content,
+                                                          max_tokens=max_tokens)
+        latencies.append(time.perf_counter() - start)
+        evaluation = question.get("evaluation", {})
+        valid += "error" not in question and "overall" in evaluation and not question.get("validation_errors")
+
+    after = llm.usage_stats()
+    count = len(contexts)
+    usage = {key: after[key] - before[key] for key in after}
+    return {
+        "questions": count,
+        "valid_outputs": valid,
+        "latency_mean_ms": round(float(np.mean(latencies)) * 1000, 2),
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+        "latency_p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 2),
+        "requests_per_question": round(usage["requests"] / count, 2),
+        "prompt_tokens_per_question": round(usage["prompt_tokens"] / count, 1),
+        "completion_tokens_per_question": round(usage["completion_tokens"] / count, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="Stub server latency per request in seconds")
+    parser.add_argument("--max-tokens", type=int, default=500)
+    parser.add_argument("--base-url", help="OpenAI-compatible endpoint to use instead of the stub server")
+    parser.add_argument("--api-key", default="stub")
+    parser.add_argument("--backend", default="openai", choices=["openai", "http"],
+                        help="Client used for --base-url and the stub server")
+    parser.add_argument("--in-process", action="store_true", help="Use the in-process stub backend")
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    backend = args.backend
+    if args.in_process:
+        backend = StubBackend(latency=args.latency)
+    elif base_url is None:
+        server = StubLLMServer(latency=args.latency).start()
+        base_url = server.base_url
+
+    try:
+        llm = LLMIntegration(api_key=args.api_key, model=args.model, base_url=base_url, backend=backend)
+        contexts = make_context(args.questions)
+        report = {
+            "endpoint": "in-process stub" if args.in_process else "stub" if server else base_url,
+            "backend": llm.backend_name,
+            "model": args.model,
+            "stub_latency_seconds": args.latency if server or args.in_process else None,
+            "modes": {mode: run_mode(llm, mode, contexts, args.max_tokens) for mode in ("separate", "combined")},
+        }
+    finally:
+        if server is not None:
+            server.stop()
+
+    separate, combined = report["modes"]["separate"], report["modes"]["combined"]
+    report["combined_vs_separate"] = {
+        "latency_ratio": round(combined["latency_mean_ms"] / separate["latency_mean_ms"], 3),
+        "token_ratio": round(
+            (combined["prompt_tokens_per_question"] + combined["completion_tokens_per_question"]) /
+            max(separate["prompt_tokens_per_question"] + separate["completion_tokens_per_question"], 1e-9), 3),
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
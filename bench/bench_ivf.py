@@ -0,0 +1,94 @@
+"""
+Compare exact (flat) search with the IVF index of the NumPy backend as the collection grows.
+
+Reports build time, query latency and recall@k against exact search for several
+nprobe values at each size. Run from the repository root:
+    python -m bench.bench_ivf --rows 10000,100000,400000 --output ivf.json
+"""
+import argparse
+import json
+import tempfile
+import time
+import numpy as np
+from vector_store import NumpyVectorStore
+from bench.bench_quantization import clustered_vectors
+
+
+def timed_queries(store: NumpyVectorStore, queries, top_k: int, nprobe=None):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(store.query(query_embeddings=[query], n_results=top_k, nprobe=nprobe)["ids"][0])
+        latencies.append(time.perf_counter() - start)
+    return results, latencies
+
+
+def p50_ms(latencies):
+    return round(float(np.percentile(latencies, 50)) * 1000, 3)
+
+
+def bench_size(rows: int, args):
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(rows, args.dim, args.blobs, rng)
+    queries = clustered_vectors(args.queries, args.dim, args.blobs, np.random.default_rng(0))
+    queries += 0.3 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    path = tempfile.mkdtemp(prefix="bench_ivf_")
+    store = NumpyVectorStore(path, index="ivf", ivf_clusters=args.clusters)
+    ids = [f"row_{i}" for i in range(rows)]
+    for i in range(0, rows, args.batch_size):
+        store.upsert(ids=ids[i:i + args.batch_size], embeddings=vectors[i:i + args.batch_size],
+                     documents=[""] * len(ids[i:i + args.batch_size]),
+                     metadatas=[{}] * len(ids[i:i + args.batch_size]))
+    del vectors
+
+    start = time.perf_counter()
+    build = store.build_index()
+    build_seconds = time.perf_counter() - start
+
+    # A flat store over the same files gives the exact results and the scan latency
+    exact, flat_latencies = timed_queries(NumpyVectorStore(path), queries, args.top_k)
+    entry = {
+        "rows": rows,
+        "clusters": build["clusters"],
+        "build_seconds": round(build_seconds, 3),
+        "flat_query_p50_ms": p50_ms(flat_latencies),
+        "ivf": {},
+    }
+    for nprobe in args.nprobe:
+        results, latencies = timed_queries(store, queries, args.top_k, nprobe)
+        hits = sum(len(set(r) & set(e)) for r, e in zip(results, exact))
+        entry["ivf"][nprobe] = {
+            "query_p50_ms": p50_ms(latencies),
+            "recall_at_k": round(hits / (len(exact) * args.top_k), 4),
+            "speedup": round(p50_ms(flat_latencies) / max(p50_ms(latencies), 1e-3), 1),
+        }
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", default="10000,100000", help="Comma-separated collection sizes")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--blobs", type=int, default=500, help="Gaussian blobs in the synthetic data")
+    parser.add_argument("--clusters", type=int, help="IVF clusters (default 4 * sqrt(rows))")
+    parser.add_argument("--nprobe", default="1,4,8,16,32", help="Comma-separated nprobe values")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+    args.nprobe = [int(n) for n in args.nprobe.split(",")]
+
+    report = {"dim": args.dim, "top_k": args.top_k,
+              "sizes": [bench_size(int(rows), args) for rows in args.rows.split(",")]}
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
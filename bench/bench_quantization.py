@@ -0,0 +1,78 @@
+"""
+Measure memory and recall of quantized vector storage in the NumPy backend.
+
+Run from the repository root:
+    python -m bench.bench_quantization --rows 50000 --output quantization.json
+"""
+import argparse
+import json
+import tempfile
+import time
+import numpy as np
+from vector_store import NumpyVectorStore
+
+
+def clustered_vectors(rows: int, dim: int, clusters: int, rng) -> np.ndarray:
+    """Gaussian blobs, which resemble sentence embeddings better than isotropic noise"""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    assignment = rng.integers(0, clusters, rows)
+    return centers[assignment] + 0.6 * rng.standard_normal((rows, dim)).astype(np.float32)
+
+
+def run(precision: str, rerank_factor: int, vectors, queries, top_k: int, batch_size: int):
+    store = NumpyVectorStore(tempfile.mkdtemp(prefix=f"bench_{precision}_"),
+                             precision=precision, rerank_factor=rerank_factor)
+    ids = [f"row_{i}" for i in range(len(vectors))]
+    for i in range(0, len(ids), batch_size):
+        store.upsert(ids=ids[i:i + batch_size], embeddings=vectors[i:i + batch_size],
+                     documents=[""] * len(ids[i:i + batch_size]), metadatas=[{}] * len(ids[i:i + batch_size]))
+
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(store.query(query_embeddings=[query], n_results=top_k)["ids"][0])
+        latencies.append(time.perf_counter() - start)
+    return store.stats(), results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(args.rows, args.dim, args.clusters, rng)
+    queries = clustered_vectors(args.queries, args.dim, args.clusters, np.random.default_rng(0))
+    queries += 0.3 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    _, exact, _ = run("float32", 1, vectors, queries, args.top_k, args.batch_size)
+    report = {"rows": args.rows, "dim": args.dim, "top_k": args.top_k,
+              "rerank_factor": args.rerank_factor, "precisions": {}}
+
+    for precision in ("float32", "float16", "int8"):
+        entry = {}
+        for label, factor in (("coarse_only", 1), ("reranked", args.rerank_factor)):
+            stats, results, latencies = run(precision, factor, vectors, queries, args.top_k, args.batch_size)
+            hits = sum(len(set(r) & set(e)) for r, e in zip(results, exact))
+            entry[f"recall_at_k_{label}"] = round(hits / (len(exact) * args.top_k), 4)
+            entry[f"query_p50_ms_{label}"] = round(float(np.percentile(latencies, 50)) * 1000, 3)
+        entry["bytes_per_vector"] = stats["bytes_per_vector"]
+        entry["scan_megabytes"] = round(stats["scan_bytes"] / (1024 * 1024), 2)
+        report["precisions"][precision] = entry
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
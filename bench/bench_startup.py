@@ -0,0 +1,101 @@
+"""
+Measure cold-start cost: module import time, QuestionGenerator construction and first use.
+
+Every measurement runs in a fresh interpreter so nothing is already imported or
+loaded. Also reports which heavy dependencies an import pulls in. Run from the
+repository root:
+    python -m bench.bench_startup --runs 5 --output startup.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import numpy as np
+
+# Dependencies that should only be imported once they are actually used
+HEAVY_MODULES = ["pandas", "chromadb", "openai", "httpx", "langchain", "tiktoken",
+                 "sentence_transformers", "torch", "fastapi", "streamlit"]
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+# Construction and first use against an empty store with the stub LLM backend
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from config import Config
+from question_generator import QuestionGenerator
+imported = time.perf_counter()
+Config.VECTOR_DB_PATH = {db_path!r}
+Config.VECTOR_DB_BACKEND = {backend!r}
+Config.EMBEDDING_CACHE_PATH = None
+Config.LLM_CACHE_PATH = None
+Config.LLM_BACKEND = "stub"
+generator = QuestionGenerator(Config())
+constructed = time.perf_counter()
+generator.get_database_stats()
+stats = time.perf_counter()
+generator.embedding_system.search_relevant_textbook("warm up", top_k=1)
+searched = time.perf_counter()
+print(json.dumps({{
+    "import_seconds": imported - start,
+    "construct_seconds": constructed - imported,
+    "first_stats_seconds": stats - constructed,
+    "first_search_seconds": searched - stats,
+}}))
+"""
+
+
+def run_script(script: str) -> dict:
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark subprocess failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def median_ms(values):
+    return round(float(np.median(values)) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modules", default="config,question_generator,server",
+                        help="Comma-separated modules to import cold")
+    parser.add_argument("--backend", default="chroma", choices=["numpy", "chroma"])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--skip-model", action="store_true", help="Skip construction and first search")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    report = {"imports": {}}
+    for module in args.modules.split(","):
+        runs = [run_script(IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)) for _ in range(args.runs)]
+        report["imports"][module] = {
+            "median_ms": median_ms([run["seconds"] for run in runs]),
+            "heavy_modules_loaded": runs[0]["loaded"],
+        }
+
+    if not args.skip_model:
+        runs = []
+        for _ in range(args.runs):
+            # A new store per run, so the first stats call also creates the collections
+            script = STARTUP_SCRIPT.format(db_path=tempfile.mkdtemp(prefix="bench_startup_"), backend=args.backend)
+            runs.append(run_script(script))
+        report["startup"] = {"backend": args.backend}
+        report["startup"].update({key.replace("_seconds", "_ms"): median_ms([run[key] for run in runs])
+                                  for key in runs[0]})
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
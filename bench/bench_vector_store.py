@@ -0,0 +1,107 @@
+"""
+Compare the ChromaDB and in-process NumPy vector store backends.
+
+Run from the repository root:
+    python -m bench.bench_vector_store --rows 20000 --queries 200 --output vector_store.json
+"""
+import argparse
+import json
+import tempfile
+import time
+import numpy as np
+from vector_store import ChromaVectorStore, NumpyVectorStore
+
+
+def make_rows(rows: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((rows, dim)).astype(np.float32)
+    ids = [f"row_{i}" for i in range(rows)]
+    documents = [f"document {i}" for i in range(rows)]
+    topics = ["Biology", "Chemistry", "Physics", "Mathematics", "History"]
+    metadatas = [{"topic": topics[i % len(topics)], "difficulty": ["Easy", "Medium", "Hard"][i % 3]}
+                 for i in range(rows)]
+    return ids, vectors, documents, metadatas
+
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+def bench_store(store, ids, vectors, documents, metadatas, queries, top_k, batch_size):
+    start = time.perf_counter()
+    for i in range(0, len(ids), batch_size):
+        store.upsert(ids=ids[i:i + batch_size], embeddings=vectors[i:i + batch_size].tolist(),
+                     documents=documents[i:i + batch_size], metadatas=metadatas[i:i + batch_size])
+    insert_seconds = time.perf_counter() - start
+
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        result = store.query(query_embeddings=[query.tolist()], n_results=top_k)
+        latencies.append(time.perf_counter() - start)
+        results.append(result["ids"][0])
+
+    start = time.perf_counter()
+    store.query(query_embeddings=queries.tolist(), n_results=top_k)
+    batch_seconds = time.perf_counter() - start
+
+    # One topic at one difficulty: 1/15 of the rows
+    filtered_latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        store.query(query_embeddings=[query.tolist()], n_results=top_k,
+                    where={"topic": "Biology", "difficulty": "Hard"})
+        filtered_latencies.append(time.perf_counter() - start)
+
+    return {
+        "insert_rows_per_second": round(len(ids) / insert_seconds, 1),
+        "query_p50_ms": percentile_ms(latencies, 50),
+        "query_p95_ms": percentile_ms(latencies, 95),
+        "query_p99_ms": percentile_ms(latencies, 99),
+        "batched_query_ms_per_query": round(batch_seconds / len(queries) * 1000, 3),
+        "filtered_query_p50_ms": percentile_ms(filtered_latencies, 50),
+        "filtered_query_p95_ms": percentile_ms(filtered_latencies, 95),
+    }, results
+
+
+def recall_at_k(results, exact):
+    hits = sum(len(set(r) & set(e)) for r, e in zip(results, exact))
+    return round(hits / sum(len(e) for e in exact), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    ids, vectors, documents, metadatas = make_rows(args.rows, args.dim)
+    queries = np.random.default_rng(1).standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    report = {"rows": args.rows, "dim": args.dim, "queries": args.queries, "top_k": args.top_k, "backends": {}}
+
+    numpy_store = NumpyVectorStore(tempfile.mkdtemp(prefix="bench_numpy_"))
+    report["backends"]["numpy"], exact = bench_store(
+        numpy_store, ids, vectors, documents, metadatas, queries, args.top_k, args.batch_size)
+    report["backends"]["numpy"]["recall_at_k"] = recall_at_k(exact, exact)
+
+    import chromadb
+    client = chromadb.PersistentClient(path=tempfile.mkdtemp(prefix="bench_chroma_"))
+    collection = client.get_or_create_collection(name="bench_collection", metadata={"hnsw:space": "cosine"})
+    report["backends"]["chroma"], approximate = bench_store(
+        ChromaVectorStore(collection), ids, vectors, documents, metadatas, queries, args.top_k, args.batch_size)
+    report["backends"]["chroma"]["recall_at_k"] = recall_at_k(approximate, exact)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Deterministic synthetic corpus for benchmarks: question banks and textbook text
+with chapter headings, drawn from a small per-subject vocabulary so retrieval
+has real topical structure.
+
+Write a corpus to disk from the repository root:
+    python -m bench.synthetic_corpus --questions 5000 --textbook-mb 10 --output-dir bench_corpus
+"""
+import argparse
+import json
+import os
+import random
+from typing import List, Dict, Any, Tuple
+
+SUBJECTS = {
+    "Biology": ["cell", "membrane", "enzyme", "chloroplast", "mitochondria", "protein", "gene", "ribosome",
+                "photosynthesis", "respiration", "nucleus", "tissue", "organism", "ecosystem", "mutation"],
+    "Chemistry": ["atom", "molecule", "electron", "bond", "reaction", "catalyst", "acid", "base", "solution",
+                  "oxidation", "isotope", "polymer", "equilibrium", "compound", "ion"],
+    "Physics": ["force", "energy", "momentum", "velocity", "wave", "field", "charge", "current", "friction",
+                "gravity", "photon", "pressure", "torque", "frequency", "mass"],
+    "Mathematics": ["function", "derivative", "integral", "matrix", "vector", "limit", "series", "equation",
+                    "polynomial", "probability", "theorem", "sequence", "graph", "angle", "proof"],
+    "History": ["empire", "treaty", "revolution", "dynasty", "trade", "parliament", "colony", "war",
+                "constitution", "reform", "migration", "monarchy", "republic", "alliance", "industry"],
+}
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+VERBS = ["affects", "controls", "depends on", "transforms", "describes", "limits", "produces", "measures"]
+QUESTION_TEMPLATES = [
+    "How does the {a} relate to the {b}?",
+    "What role does the {a} play in {b} formation?",
+    "Explain why the {a} {verb} the {b}.",
+    "Which property of the {a} determines the {b}?",
+]
+
+
+def _sentence(rng: random.Random, terms: List[str]) -> str:
+    a, b, c = rng.sample(terms, 3)
+    return f"The {a} {rng.choice(VERBS)} the {b} through changes in the {c}."
+
+
+def make_questions(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Questions in the format DataProcessor.process_questions expects"""
+    rng = random.Random(seed)
+    subjects = list(SUBJECTS)
+    questions = []
+    for i in range(count):
+        topic = subjects[i % len(subjects)]
+        a, b = rng.sample(SUBJECTS[topic], 2)
+        template = rng.choice(QUESTION_TEMPLATES)
+        questions.append({
+            "question": template.format(a=a, b=b, verb=rng.choice(VERBS)) + f" (#{i})",
+            "answer": _sentence(rng, SUBJECTS[topic]),
+            "topic": topic,
+            "difficulty": DIFFICULTIES[i % len(DIFFICULTIES)],
+        })
+    return questions
+
+
+def make_textbook(megabytes: float, seed: int = 0, paragraphs_per_chapter: int = 40) -> str:
+    """About megabytes of textbook text, with a "Chapter N: Subject" heading every few paragraphs"""
+    rng = random.Random(seed)
+    subjects = list(SUBJECTS)
+    target = int(megabytes * 1_000_000)
+    parts = []
+    size = 0
+    chapter = 0
+    while size < target:
+        chapter += 1
+        subject = subjects[(chapter - 1) % len(subjects)]
+        heading = f"Chapter {chapter}: {subject}\n\n"
+        parts.append(heading)
+        size += len(heading)
+        for _ in range(paragraphs_per_chapter):
+            paragraph = " ".join(_sentence(rng, SUBJECTS[subject]) for _ in range(rng.randint(4, 8))) + "\n\n"
+            parts.append(paragraph)
+            size += len(paragraph)
+            if size >= target:
+                break
+    return "".join(parts)
+
+
+def make_queries(count: int, seed: int = 1) -> List[str]:
+    """Topic-style search queries over the corpus vocabulary"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        terms = SUBJECTS[rng.choice(list(SUBJECTS))]
+        queries.append(" ".join(rng.sample(terms, 2)))
+    return queries
+
+
+def write_corpus(output_dir: str, questions: int, textbook_mb: float, seed: int = 0) -> Tuple[str, str]:
+    """Write questions.json and textbook.txt; returns their paths"""
+    os.makedirs(output_dir, exist_ok=True)
+    questions_path = os.path.join(output_dir, "questions.json")
+    textbook_path = os.path.join(output_dir, "textbook.txt")
+    with open(questions_path, "w", encoding="utf-8") as f:
+        json.dump(make_questions(questions, seed), f)
+    with open(textbook_path, "w", encoding="utf-8") as f:
+        f.write(make_textbook(textbook_mb, seed))
+    return questions_path, textbook_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=5000)
+    parser.add_argument("--textbook-mb", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default="bench_corpus")
+    args = parser.parse_args()
+
+    questions_path, textbook_path = write_corpus(args.output_dir, args.questions, args.textbook_mb, args.seed)
+    print(f"Wrote {args.questions} questions to {questions_path}")
+    print(f"Wrote {os.path.getsize(textbook_path) / 1e6:.1f} MB of textbook text to {textbook_path}")
+
+
+if __name__ == "__main__":
+    main()
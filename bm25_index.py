@@ -0,0 +1,208 @@
+import json
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from vector_store import matches_where
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; formulas such as "6CO2" stay single tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    In-memory BM25 index with array-backed postings.
+    Each term owns two growable int arrays (document numbers and term
+    frequencies), so adding documents only appends. Removed documents are
+    tombstoned and skipped at query time; the postings are compacted once
+    tombstones make up COMPACT_RATIO of all document numbers.
+    Metadata is kept per document so searches can apply the same `where`
+    filters as the vector store.
+    """
+
+    COMPACT_RATIO = 0.25
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.doc_ids: List[Optional[str]] = []
+            self.metadatas: List[Optional[Dict[str, Any]]] = []
+            self._doc_of: Dict[str, int] = {}
+            self._lengths = array("i")
+            self._alive = array("b")
+            self._terms: Dict[str, int] = {}
+            self._postings_docs: List[array] = []
+            self._postings_tfs: List[array] = []
+            self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_of)
+
+    def add(self, ids: List[str], documents: List[str], metadatas: Optional[List[Dict[str, Any]]] = None):
+        """Index documents; an existing ID is replaced"""
+        metadatas = metadatas or [{}] * len(ids)
+        with self._lock:
+            for item_id, document, metadata in zip(ids, documents, metadatas):
+                if item_id in self._doc_of:
+                    self._remove_one(item_id)
+                tokens = tokenize(document)
+                doc_no = len(self.doc_ids)
+                self.doc_ids.append(item_id)
+                self.metadatas.append(metadata or {})
+                self._doc_of[item_id] = doc_no
+                self._lengths.append(len(tokens))
+                self._alive.append(1)
+                self._total_length += len(tokens)
+
+                for term, tf in Counter(tokens).items():
+                    term_no = self._terms.get(term)
+                    if term_no is None:
+                        term_no = len(self._postings_docs)
+                        self._terms[term] = term_no
+                        self._postings_docs.append(array("i"))
+                        self._postings_tfs.append(array("i"))
+                    self._postings_docs[term_no].append(doc_no)
+                    self._postings_tfs[term_no].append(tf)
+
+    def remove(self, ids: List[str]):
+        with self._lock:
+            for item_id in ids:
+                if item_id in self._doc_of:
+                    self._remove_one(item_id)
+            if len(self.doc_ids) - len(self._doc_of) > self.COMPACT_RATIO * len(self.doc_ids):
+                self._compact()
+
+    def _remove_one(self, item_id: str):
+        doc_no = self._doc_of.pop(item_id)
+        self._alive[doc_no] = 0
+        self._total_length -= self._lengths[doc_no]
+        self.doc_ids[doc_no] = None
+        self.metadatas[doc_no] = None
+
+    def _compact(self):
+        """Drop tombstoned documents and renumber the live ones"""
+        alive = np.frombuffer(self._alive, dtype=np.int8).astype(bool)
+        remap = np.cumsum(alive, dtype=np.int64) - 1
+        terms, postings_docs, postings_tfs = {}, [], []
+        for term, term_no in self._terms.items():
+            docs = np.frombuffer(self._postings_docs[term_no], dtype=np.intc)
+            keep = alive[docs]
+            if not keep.any():
+                continue
+            terms[term] = len(postings_docs)
+            postings_docs.append(array("i", remap[docs[keep]].astype(np.intc).tobytes()))
+            tfs = np.frombuffer(self._postings_tfs[term_no], dtype=np.intc)[keep]
+            postings_tfs.append(array("i", tfs.tobytes()))
+
+        lengths = np.frombuffer(self._lengths, dtype=np.intc)[alive]
+        self.doc_ids = [d for d in self.doc_ids if d is not None]
+        self.metadatas = [m for m in self.metadatas if m is not None]
+        self._doc_of = {item_id: i for i, item_id in enumerate(self.doc_ids)}
+        self._lengths = array("i", lengths.tobytes())
+        self._alive = array("b", [1]) * len(self.doc_ids)
+        self._terms, self._postings_docs, self._postings_tfs = terms, postings_docs, postings_tfs
+
+    def search(self, query: str, top_k: int = 10,
+               where: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        """Best (id, BM25 score) pairs for the query, highest first"""
+        terms = set(tokenize(query))
+        with self._lock:
+            live_count = len(self._doc_of)
+            if not live_count or not terms or top_k <= 0:
+                return []
+            alive = np.frombuffer(self._alive, dtype=np.int8).astype(bool)
+            lengths = np.frombuffer(self._lengths, dtype=np.intc)
+            avg_length = max(self._total_length / live_count, 1e-9)
+            scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+
+            for term in terms:
+                term_no = self._terms.get(term)
+                if term_no is None:
+                    continue
+                docs = np.frombuffer(self._postings_docs[term_no], dtype=np.intc)
+                live = alive[docs]
+                doc_freq = int(live.sum())
+                if not doc_freq:
+                    continue
+                docs = docs[live]
+                tfs = np.frombuffer(self._postings_tfs[term_no], dtype=np.intc)[live].astype(np.float32)
+                idf = np.log(1.0 + (live_count - doc_freq + 0.5) / (doc_freq + 0.5))
+                norm = self.k1 * (1.0 - self.b + self.b * lengths[docs] / avg_length)
+                scores[docs] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+
+            candidates = np.flatnonzero(scores)
+            if where:
+                candidates = np.array([c for c in candidates if matches_where(self.metadatas[c], where)],
+                                      dtype=np.int64)
+            if len(candidates) > top_k:
+                candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [(self.doc_ids[c], float(scores[c])) for c in candidates]
+
+    def save(self, path: str):
+        """Write the index to a directory; meta.json is replaced last, so readers never see a partial copy"""
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            if len(self.doc_ids) != len(self._doc_of):
+                self._compact()
+            terms = sorted(self._terms, key=self._terms.get)
+            sizes = [len(docs) for docs in self._postings_docs]
+            np.savez(os.path.join(path, "postings.tmp.npz"),
+                     lengths=np.frombuffer(self._lengths, dtype=np.intc),
+                     offsets=np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)]).astype(np.int64),
+                     docs=np.frombuffer(b"".join(d.tobytes() for d in self._postings_docs), dtype=np.intc),
+                     tfs=np.frombuffer(b"".join(t.tobytes() for t in self._postings_tfs), dtype=np.intc))
+            meta = {"k1": self.k1, "b": self.b, "documents": len(self.doc_ids), "terms": terms,
+                    "doc_ids": self.doc_ids, "metadatas": self.metadatas}
+        os.replace(os.path.join(path, "postings.tmp.npz"), os.path.join(path, "postings.npz"))
+        with open(os.path.join(path, "meta.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(os.path.join(path, "meta.json.tmp"), os.path.join(path, "meta.json"))
+
+    def load(self, path: str) -> bool:
+        """Replace the contents with a copy written by save; False if there is none"""
+        try:
+            with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = np.load(os.path.join(path, "postings.npz"))
+        except (OSError, ValueError):
+            return False
+        lengths, offsets = arrays["lengths"], arrays["offsets"]
+        if len(lengths) != meta["documents"] or len(offsets) != len(meta["terms"]) + 1:
+            return False
+        docs, tfs = arrays["docs"].astype(np.intc), arrays["tfs"].astype(np.intc)
+        with self._lock:
+            self.clear()
+            self.doc_ids = meta["doc_ids"]
+            self.metadatas = meta["metadatas"]
+            self._doc_of = {item_id: i for i, item_id in enumerate(self.doc_ids)}
+            self._lengths = array("i", lengths.astype(np.intc).tobytes())
+            self._alive = array("b", [1]) * len(self.doc_ids)
+            self._total_length = int(lengths.sum())
+            self._terms = {term: i for i, term in enumerate(meta["terms"])}
+            self._postings_docs = [array("i", docs[start:end].tobytes()) for start, end in zip(offsets, offsets[1:])]
+            self._postings_tfs = [array("i", tfs[start:end].tobytes()) for start, end in zip(offsets, offsets[1:])]
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            postings = sum(len(p) for p in self._postings_docs)
+            return {
+                "documents": len(self._doc_of),
+                "terms": len(self._terms),
+                "postings": postings,
+                "tombstones": len(self.doc_ids) - len(self._doc_of),
+                "postings_bytes": postings * 2 * array("i").itemsize,
+            }
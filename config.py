@@ -9,19 +9,90 @@ class Config:
     
     # Model Configuration
     EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # Sentence transformer model
+    EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE")  # None lets sentence-transformers pick
+    EMBEDDING_PRECISION = "float32"  # "float32" or "float16"
+    EMBEDDING_CACHE_PATH = "./embedding_cache"  # Set to None to disable the on-disk cache
+    EMBEDDING_CACHE_MAX_ENTRIES = 200000  # ~300 MB of float32 vectors for MiniLM
     LLM_MODEL = "gpt-3.5-turbo"  # Can be changed to gpt-4 or other models
+    LLM_BASE_URL = os.getenv("LLM_BASE_URL")  # None uses the OpenAI API; point at any compatible server
+    LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")  # "openai" (SDK), "http" (local OpenAI-compatible server) or "stub" (offline)
+    LLM_POOL_SIZE = 16         # Keep-alive HTTP connections shared by LLM worker threads
+    LLM_STUB_LATENCY = 0.0     # Simulated seconds per request for the stub backend
     
     # RAG Configuration
     TOP_K_QUESTIONS = 5  # Number of similar questions to retrieve
     TOP_K_TEXTBOOK = 3   # Number of relevant textbook chunks to retrieve
+    RETRIEVAL_CACHE_SIZE = 1024   # Cached search results (0 disables the cache)
+    RETRIEVAL_CACHE_TTL = 300.0   # Seconds before a cached search result expires
+    FILTER_SIMILAR_BY_DIFFICULTY = True  # Retrieve example questions of the requested difficulty only
+    HYBRID_SEARCH = True      # Fuse BM25 keyword matches with dense textbook retrieval
+    HYBRID_CANDIDATES = 20    # Candidates taken from each retriever before fusion
+    RRF_K = 60                # Reciprocal rank fusion constant
     CHUNK_SIZE = 500     # Size of textbook chunks
     CHUNK_OVERLAP = 50   # Overlap between chunks
+    TEXTBOOK_READ_BLOCK_SIZE = 1 << 20  # Characters read per block when streaming textbook files
+    INGEST_BATCH_SIZE = 256  # Items embedded and written to the database per batch
+    QUESTIONS_READ_CHUNK_ROWS = 50000  # Rows read per chunk from CSV/JSONL question files
+    INGEST_WORKERS = None  # Processes used to chunk textbook directories (None = CPU count - 1)
+    INGEST_ENCODE_BATCH_SIZE = 64  # Chunks per encode call in the parallel ingest pipeline
     
     # Vector Database
+    VECTOR_DB_BACKEND = "chroma"  # "chroma" or "numpy" (in-process exact search)
+    VECTOR_PRECISION = "float32"  # numpy backend only: "float32", "float16" or "int8"
+    VECTOR_RERANK_FACTOR = 4      # Candidates re-scored exactly per result when quantized
+    VECTOR_INDEX = "flat"         # numpy backend only: "flat" (exact scan) or "ivf" (clustered textbook index)
+    IVF_CLUSTERS = None           # IVF clusters; None: 4 * sqrt(textbook chunks)
+    IVF_NPROBE = 8                # Clusters searched per query; higher is slower with better recall
     VECTOR_DB_PATH = "./vector_db"
     COLLECTION_NAME_QUESTIONS = "questions_collection"
     COLLECTION_NAME_TEXTBOOK = "textbook_collection"
+    INGEST_MANIFEST_PATH = "./vector_db/ingest_manifest.json"  # Per-source record used by incremental ingest
     
     # Generation Parameters
     MAX_TOKENS = 500
-    TEMPERATURE = 0.7
\ No newline at end of file
+    TEMPERATURE = 0.7
+    PROMPT_TOKEN_BUDGET = 2000   # Input tokens per generation prompt (instructions + context)
+    PROMPT_QUESTION_SHARE = 0.3  # Share of the context budget available to similar questions
+    GENERATION_MODE = "combined"  # "combined": question + self-assessment in one call; "separate": two calls
+    AUDIT_SAMPLE_RATE = 0.1       # Share of combined-mode questions also graded by the separate evaluator
+    
+    # LLM Request Handling
+    LLM_MAX_CONCURRENCY = 8     # Parallel LLM calls in batch generation/evaluation
+    LLM_REQUEST_TIMEOUT = 60.0  # Seconds per chat-completion request
+    LLM_MAX_RETRIES = 3         # Retries on rate limits, timeouts and 5xx errors
+    LLM_SEED = None             # Fixed sampling seed passed to the API (None = unset)
+    
+    # LLM Response Cache (opt-in)
+    LLM_CACHE_PATH = None                # e.g. "./llm_cache/responses.db"; None disables the cache
+    LLM_CACHE_MAX_ENTRIES = 10000        # Least recently used responses are evicted beyond this
+    LLM_CACHE_TTL = 7 * 24 * 3600.0      # Seconds before a cached response expires
+    LLM_CACHE_DETERMINISTIC_ONLY = True  # Only cache requests at temperature 0 or with LLM_SEED set
+    
+    # Instrumentation (per-stage timings in generation_metadata["timings"])
+    INSTRUMENTATION_ENABLED = False          # Off: spans cost a single context lookup
+    INSTRUMENTATION_SINKS = ["histogram"]    # Any of "histogram", "json", "prometheus"
+    INSTRUMENTATION_LOG_PATH = "./logs/traces.jsonl"  # JSON log sink output, one trace per line
+    PROMETHEUS_TEXTFILE_PATH = None          # Prometheus sink also rewrites this file after each trace
+    
+    # HTTP Serving (server.py)
+    SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_MAX_CONCURRENT_GENERATIONS = 16  # Generate/batch-generate requests running at once
+    SERVER_MAX_CONCURRENT_SEARCHES = 64     # Search requests running at once
+    SERVER_MAX_WAITING = 128                # Requests queued per limit before answering 503
+    SERVER_QUEUE_TIMEOUT = 2.0              # Seconds a queued request waits for a slot before 503
+    SERVER_MAX_BATCH_QUESTIONS = 200        # Questions allowed in one batch-generate request
+    EMBEDDING_BATCH_MAX_SIZE = 64           # Query texts encoded together by the micro-batcher
+    EMBEDDING_BATCH_WAIT_MS = 5.0           # Window for collecting concurrent query encodes
+    
+    # Background Batch Jobs
+    JOB_QUEUE_PATH = "./jobs/jobs.db"  # SQLite queue with per-question checkpoints
+    JOB_WORKERS = 4                   # Questions generated concurrently by the job workers
+    JOB_MAX_ATTEMPTS = 3              # Attempts per question before it is marked failed
+    JOB_RETRY_BACKOFF = 5.0           # Seconds before a failed question is retried, doubled per attempt
+    JOB_RETRY_BACKOFF_MAX = 300.0     # Upper bound for that delay
+    JOB_LEASE_SECONDS = 600.0         # A running question whose worker died is claimed again after this
+    
+    # Near-Duplicate Gate
+    DEDUP_THRESHOLD = 0.92        # Cosine similarity at which a generated question counts as a near-duplicate (None: off)
+    DEDUP_MAX_REGENERATIONS = 1   # Regeneration attempts for a near-duplicate before it is returned flagged
\ No newline at end of file
@@ -1,40 +1,126 @@
-import pandas as pd
 import re
-from typing import List, Dict, Any
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import json
+import math
+import hashlib
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Optional, Set, TYPE_CHECKING
+
+# pandas and langchain are imported on first use, so importing the package stays fast
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Short title-shaped lines such as "Chapter 2: Cell Structure", "Unit 3.1" or "PART IV The Cell"
+# start a new section of a textbook: Chapter/Unit/Part, a number or roman numeral, then
+# optionally a separator or a capitalized title that does not end like a sentence
+SECTION_HEADING = re.compile(
+    r'^[ \t]*(?i:chapter|unit|part)[ \t]+'
+    r'(?:\d+(?:\.\d+)*|(?=[ivxlcdmIVXLCDM])(?i:m{0,3}(?:cm|cd|d?c{0,3})(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3})))'
+    r'(?:[ \t]*[:.\-\u2013\u2014](?:[ \t]*[^\n]{0,79}[^\s.!?,;])?|[ \t]+[A-Z](?:[^\n]{0,79}[^\s.!?,;])?)?'
+    r'[ \t]*$',
+    re.MULTILINE
+)
+
+def make_id(prefix: str, *parts: Any) -> str:
+    """Build a stable ID from the content and source of an item"""
+    digest = hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f"{prefix}_{digest[:16]}"
+
+# Characters removed by clean_text (special characters other than basic punctuation)
+SPECIAL_CHARACTERS = r'[^\w\s\.\?\!\,\;\:\-\(\)]'
+
+# Question fields and their defaults when a file leaves them out or empty
+QUESTION_FIELDS = {"question": "", "answer": "", "topic": "General", "difficulty": "Medium"}
+
+def question_field(item: Dict[str, Any], field: str) -> str:
+    """A field of a question dict read the way process_question_frame reads a column"""
+    value = item.get(field)
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        value = ""
+    value = str(value)
+    default = QUESTION_FIELDS[field]
+    return default if default and not value.strip() else value
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Yield lists of at most `size` items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def column_batches(columns: Dict[str, List[Any]], size: int) -> Iterator[Dict[str, List[Any]]]:
+    """Split a dict of equally long columns into dicts of at most `size` rows"""
+    total = len(columns["id"])
+    for start in range(0, total, size):
+        yield {name: values[start:start + size] for name, values in columns.items()}
+
+def take_rows(columns: Dict[str, List[Any]], rows: List[int]) -> Dict[str, List[Any]]:
+    """The given rows of a dict of columns"""
+    return {name: [values[i] for i in rows] for name, values in columns.items()}
 
 class DataProcessor:
     def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-        )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._text_splitter = None
+    
+    @property
+    def text_splitter(self):
+        """The langchain text splitter, created on first use"""
+        if self._text_splitter is None:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+            
+            self._text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                length_function=len,
+            )
+        return self._text_splitter
     
     def clean_text(self, text: str) -> str:
         """Clean and normalize text data"""
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        # Remove special characters but keep punctuation
-        text = re.sub(r'[^\w\s\.\?\!\,\;\:\-\(\)]', '', text)
-        return text.strip()
+        return self._clean_block(text).strip()
     
-    def process_questions(self, questions_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def split_sections(self, text: str, at_line_start: bool = True) -> List[Tuple[str, str]]:
+        """
+        Split raw textbook text at chapter headings.
+        Returns (heading, section_text) pairs; text before the first heading has an empty heading.
+        Headings are cleaned like the text they label. With at_line_start=False the text
+        continues a line, so its first line cannot be a heading.
+        """
+        sections = []
+        matches = [match for match in SECTION_HEADING.finditer(text) if at_line_start or match.start() > 0]
+        if not matches or matches[0].start() > 0:
+            end = matches[0].start() if matches else len(text)
+            sections.append(("", text[:end]))
+        for j, match in enumerate(matches):
+            end = matches[j + 1].start() if j + 1 < len(matches) else len(text)
+            sections.append((self.clean_text(match.group(0)), text[match.start():end]))
+        return sections
+    
+    def process_questions(self, questions_data: List[Dict[str, Any]], source: str = "inline") -> List[Dict[str, Any]]:
         """
         Process old questions data
         Expected format: [{"question": "...", "answer": "...", "topic": "...", "difficulty": "..."}]
+        Missing, empty or NaN fields get the QUESTION_FIELDS defaults, so IDs match process_question_frame.
         """
         processed_questions = []
+        seen_ids = set()
         
-        for i, item in enumerate(questions_data):
-            question = self.clean_text(item.get("question", ""))
-            answer = self.clean_text(item.get("answer", ""))
-            topic = item.get("topic", "General")
-            difficulty = item.get("difficulty", "Medium")
+        for item in questions_data:
+            question = self.clean_text(question_field(item, "question"))
+            answer = self.clean_text(question_field(item, "answer"))
+            topic = question_field(item, "topic")
+            difficulty = question_field(item, "difficulty")
+            question_id = make_id("q", source, question, answer, topic, difficulty)
             
-            if question:  # Only process if question exists
+            if question and question_id not in seen_ids:  # Skip empty and repeated questions
+                seen_ids.add(question_id)
                 processed_questions.append({
-                    "id": f"q_{i}",
+                    "id": question_id,
+                    "source": source,
                     "question": question,
                     "answer": answer,
                     "topic": topic,
@@ -44,43 +130,216 @@ class DataProcessor:
         
         return processed_questions
     
-    def process_textbook(self, textbook_content: str, metadata: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    def process_textbook(self, textbook_content: str, metadata: Dict[str, Any] = None, source: str = "inline") -> List[Dict[str, Any]]:
+        """
+        Process textbook content into chunks.
+        Each chapter is chunked on its own so that editing one chapter leaves
+        the chunks (and IDs) of every other chapter unchanged.
+        """
+        return list(self.iter_textbook_chunks([textbook_content], metadata, source))
+    
+    def iter_textbook_file(self, file_path: str, metadata: Dict[str, Any] = None, source: str = None,
+                           block_size: int = 1 << 20) -> Iterator[Dict[str, Any]]:
+        """Stream chunks from a textbook file without loading it into memory"""
+        return self.iter_textbook_chunks(self.iter_text_blocks(file_path, block_size), metadata, source or file_path)
+    
+    def iter_text_blocks(self, file_path: str, block_size: int = 1 << 20) -> Iterator[str]:
+        """Read a text file in fixed-size blocks"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for block in iter(lambda: f.read(block_size), ''):
+                yield block
+    
+    def iter_textbook_chunks(self, blocks: Iterable[str], metadata: Dict[str, Any] = None,
+                             source: str = "inline") -> Iterator[Dict[str, Any]]:
         """
-        Process textbook content into chunks
+        Clean and chunk textbook text incrementally.
+        Only the unfinished tail of the current chapter is kept between blocks,
+        so memory stays bounded by the block size rather than the input size.
         """
         if metadata is None:
             metadata = {}
         
-        # Clean the textbook content
-        cleaned_content = self.clean_text(textbook_content)
+        # Enough cleaned text for several chunks before we split and emit
+        split_threshold = 4 * self.chunk_size
+        # "offset" is the position of the carry within the current section's cleaned text, so
+        # edits to one chapter leave the offsets of the other chapters' chunks unchanged
+        state = {"heading": "", "carry": "", "index": 0, "occurrences": {}, "offset": 0}
+        heading_counts = {}
         
-        # Split into chunks
-        chunks = self.text_splitter.split_text(cleaned_content)
-        
-        processed_chunks = []
-        for i, chunk in enumerate(chunks):
-            processed_chunks.append({
-                "id": f"tb_{i}",
+        def make_chunk(chunk: str, start: int) -> Dict[str, Any]:
+            heading = state["heading"]
+            chapter = metadata.get("chapter") or heading or "Unknown"
+            # Identical chunks (and repeated headings) get distinct, still stable IDs
+            occurrence = state["occurrences"].get(chunk, 0)
+            state["occurrences"][chunk] = occurrence + 1
+            chunk_id = make_id("tb", source, heading, heading_counts.get(heading, 0), occurrence, chunk)
+            state["index"] += 1
+            return {
+                "id": chunk_id,
+                "source": source,
                 "content": chunk,
-                "chapter": metadata.get("chapter", "Unknown"),
+                "chapter": chapter,
                 "subject": metadata.get("subject", "General"),
-                "page": metadata.get("page", i),
+                "page": metadata.get("page", state["index"] - 1),
+                "start_char": start,
+                "end_char": start + len(chunk),
                 "metadata": metadata
-            })
+            }
+        
+        def chunk_starts(text: str, chunks: List[str]) -> List[int]:
+            """Offsets of the chunks in text; each chunk overlaps the previous one by at most chunk_overlap"""
+            starts = []
+            end = 0
+            for chunk in chunks[:-1]:
+                start = text.find(chunk, max(end - self.chunk_overlap - 1, starts[-1] + 1 if starts else 0))
+                starts.append(start)
+                end = start + len(chunk)
+            # The last chunk always runs to the end of the text
+            starts.append(text.rfind(chunks[-1]))
+            return starts
+        
+        def add_text(raw: str) -> Iterator[Dict[str, Any]]:
+            cleaned = self._clean_block(raw)
+            carry = state["carry"]
+            # Whitespace runs that straddle two blocks collapse to one space
+            if carry.endswith(' ') and cleaned.startswith(' '):
+                cleaned = cleaned[1:]
+            carry = (carry + cleaned) if carry else cleaned.lstrip()
+            if len(carry) >= split_threshold:
+                chunks = self.text_splitter.split_text(carry)
+                if len(chunks) > 1:
+                    # The last chunk may still grow, so it is re-split with the next block
+                    starts = chunk_starts(carry, chunks)
+                    for chunk, chunk_start in zip(chunks[:-1], starts[:-1]):
+                        yield make_chunk(chunk, state["offset"] + chunk_start)
+                    start = starts[-1]
+                    # Keep the separator in front of the chunk so it is measured as before
+                    if start > 0 and carry[start - 1] == ' ':
+                        start -= 1
+                    carry = carry[start:]
+                    state["offset"] += start
+            state["carry"] = carry
+        
+        def end_section() -> Iterator[Dict[str, Any]]:
+            carry = state["carry"].rstrip()
+            if carry:
+                chunks = self.text_splitter.split_text(carry)
+                for chunk, chunk_start in zip(chunks, chunk_starts(carry, chunks)):
+                    yield make_chunk(chunk, state["offset"] + chunk_start)
+            state["offset"] = 0
+            state["carry"] = ""
+            state["occurrences"] = {}
+        
+        def add_lines(text: str, at_line_start: bool) -> Iterator[Dict[str, Any]]:
+            for heading, section in self.split_sections(text, at_line_start):
+                if heading:
+                    yield from end_section()
+                    heading_counts[heading] = heading_counts.get(heading, -1) + 1
+                    state["heading"] = heading
+                yield from add_text(section)
         
-        return processed_chunks
+        pending = ""
+        # Whether pending starts a line; after a forced cut inside a very long line it does not
+        at_line_start = True
+        for block in blocks:
+            pending += block
+            # Only complete lines can be checked for chapter headings
+            cut = pending.rfind('\n') + 1
+            if cut == 0 and len(pending) < split_threshold:
+                continue
+            if cut == 0:
+                cut = len(pending)
+            yield from add_lines(pending[:cut], at_line_start)
+            at_line_start = pending[cut - 1] == '\n'
+            pending = pending[cut:]
+        
+        if pending:
+            yield from add_lines(pending, at_line_start)
+        yield from end_section()
+    
+    def _clean_block(self, text: str) -> str:
+        """clean_text without the final strip, so cleaned blocks can be joined"""
+        # Remove special characters but keep punctuation
+        text = re.sub(SPECIAL_CHARACTERS, '', text)
+        # Remove extra whitespace, including runs left behind by removed characters
+        return re.sub(r'\s+', ' ', text)
+    
+    def clean_series(self, series: "pd.Series") -> "pd.Series":
+        """clean_text for a whole column at once with vectorized string operations"""
+        return (series.str.replace(SPECIAL_CHARACTERS, '', regex=True)
+                      .str.replace(r'\s+', ' ', regex=True)
+                      .str.strip())
     
     def load_questions_from_file(self, file_path: str) -> List[Dict[str, Any]]:
-        """Load questions from various file formats"""
+        """Load questions from CSV, JSON (a list or {"questions": [...]}) or JSONL files"""
+        return [record for frame in self.iter_question_frames(file_path) for record in frame.to_dict('records')]
+    
+    def iter_question_frames(self, file_path: str, chunk_rows: int = 50000) -> Iterator["pd.DataFrame"]:
+        """
+        Read a question file as DataFrames of at most chunk_rows rows, so large
+        CSV and JSONL files are never held in memory at once. Only the question
+        fields are kept, as strings.
+        """
+        import pandas as pd
+        
         if file_path.endswith('.csv'):
-            df = pd.read_csv(file_path)
-            return df.to_dict('records')
+            yield from pd.read_csv(file_path, chunksize=chunk_rows, dtype=str, keep_default_na=False,
+                                   usecols=lambda column: column in QUESTION_FIELDS)
+        elif file_path.endswith('.jsonl'):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                for lines in batched((line for line in f if line.strip()), chunk_rows):
+                    yield pd.DataFrame.from_records([json.loads(line) for line in lines])
         elif file_path.endswith('.json'):
-            import json
             with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                data = json.load(f)
+            if isinstance(data, dict):
+                data = data.get("questions", [])
+            for start in range(0, len(data), chunk_rows):
+                yield pd.DataFrame.from_records(data[start:start + chunk_rows])
         else:
-            raise ValueError("Unsupported file format. Use CSV or JSON.")
+            raise ValueError("Unsupported file format. Use CSV, JSON or JSONL.")
+    
+    def process_question_frame(self, frame: "pd.DataFrame", source: str = "inline",
+                               seen_ids: Optional[Set[str]] = None) -> Dict[str, List[Any]]:
+        """
+        process_questions for a DataFrame, returning columns instead of one dict
+        per question: {"id": [...], "question": [...], "answer": [...], "topic": [...],
+        "difficulty": [...], "content": [...], "source": [...]}. IDs match
+        process_questions; rows already in seen_ids (which is updated) are skipped.
+        """
+        import pandas as pd
+        
+        columns = {}
+        for field, default in QUESTION_FIELDS.items():
+            values = frame[field] if field in frame.columns else pd.Series(default, index=frame.index)
+            values = values.fillna("").astype(str)
+            if default:
+                values = values.mask(values.str.strip() == "", default)
+            columns[field] = values
+        question = self.clean_series(columns["question"])
+        answer = self.clean_series(columns["answer"])
+        topic, difficulty = columns["topic"], columns["difficulty"]
+        content = "Question: " + question + "\nAnswer: " + answer + "\nTopic: " + topic
+        
+        seen_ids = set() if seen_ids is None else seen_ids
+        result = {name: [] for name in ("id", "question", "answer", "topic", "difficulty", "content", "source")}
+        for row in zip(question.tolist(), answer.tolist(), topic.tolist(), difficulty.tolist(), content.tolist()):
+            question_id = make_id("q", source, *row[:4])
+            if row[0] and question_id not in seen_ids:  # Skip empty and repeated questions
+                seen_ids.add(question_id)
+                result["id"].append(question_id)
+                for name, value in zip(("question", "answer", "topic", "difficulty", "content"), row):
+                    result[name].append(value)
+        result["source"] = [source] * len(result["id"])
+        return result
+    
+    def iter_question_columns(self, file_path: str, source: str = None, batch_size: int = 256,
+                              chunk_rows: int = 50000) -> Iterator[Dict[str, List[Any]]]:
+        """Stream a question file as processed column batches of at most batch_size rows"""
+        seen_ids = set()
+        for frame in self.iter_question_frames(file_path, chunk_rows):
+            columns = self.process_question_frame(frame, source or file_path, seen_ids)
+            yield from column_batches(columns, batch_size)
     
     def load_textbook_from_file(self, file_path: str) -> str:
         """Load textbook content from file"""
@@ -0,0 +1,91 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Dict, Any, Callable
+import numpy as np
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces encode requests from many threads into single model calls.
+    The first waiting request opens a window of max_wait_ms; everything that
+    arrives within it (up to max_batch_size texts) is encoded together and
+    each caller gets back its own rows.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_batch_size: int = 64,
+                 max_wait_ms: float = 5.0):
+        self.encode_batch = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.texts = 0
+        self.requests = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embeddings for texts, computed in a shared batch with concurrent callers"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Requests that fill a batch on their own gain nothing from waiting
+        if len(texts) >= self.max_batch_size:
+            return np.asarray(self.encode_batch(texts))
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((list(texts), future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+            self._encode_pending(pending)
+
+    def _encode_pending(self, pending):
+        # Identical texts from different callers are encoded once
+        unique = list(dict.fromkeys(text for texts, _ in pending for text in texts))
+        try:
+            embeddings = np.asarray(self.encode_batch(unique))
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        rows = {text: i for i, text in enumerate(unique)}
+        with self._lock:
+            self.batches += 1
+            self.texts += len(unique)
+            self.requests += len(pending)
+        for texts, future in pending:
+            future.set_result(embeddings[[rows[text] for text in texts]])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "texts_encoded": self.texts,
+                "mean_requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+            }
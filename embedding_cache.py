@@ -0,0 +1,239 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different copies share a cache entry"""
+    return " ".join(text.split())
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent content-addressed embedding cache.
+    Vectors live in a memory-mapped float32 file, one slot per row; an SQLite
+    index maps text hashes to slots and tracks last access for LRU eviction.
+    Each (model, precision, normalization) gets its own directory, so keys are
+    effectively (model, precision, normalization, text hash).
+    Slots are allocated and written inside an SQLite write transaction, so
+    several processes can share one cache directory.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, max_entries: int = 200000,
+                 precision: str = "float32", normalize: bool = False):
+        safe_name = re.sub(r"[^\w\-\.]", "_", model_name)
+        self.path = os.path.join(cache_dir, f"{safe_name}-{precision}" + ("-normalized" if normalize else ""))
+        os.makedirs(self.path, exist_ok=True)
+
+        self.model_name = model_name
+        self.precision = precision
+        self.normalize = normalize
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._vectors_path = os.path.join(self.path, "vectors.f32")
+        # Transactions are explicit (see _write); other processes wait up to the timeout for the lock
+        self._db = sqlite3.connect(os.path.join(self.path, "index.db"), timeout=60.0,
+                                   check_same_thread=False, isolation_level=None)
+        with self._write():
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+
+        self.dim = self._get_meta("dim")
+        self._capacity = 0
+        self._vectors = None
+        self._map(self._get_meta("capacity") or 0)
+
+    @contextmanager
+    def _write(self):
+        """Write transaction holding SQLite's write lock, so processes sharing the cache take turns"""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _map(self, capacity: int):
+        """Map the vectors file up to capacity rows when another process (or we) grew it"""
+        if capacity <= self._capacity or not self.dim:
+            return
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                  shape=(capacity, self.dim))
+        self._capacity = capacity
+
+    def _get_meta(self, name: str) -> Optional[int]:
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name: str, value: int):
+        self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def _ensure_capacity(self, slots_needed: int):
+        """Grow the memory-mapped file geometrically, up to max_entries rows (call inside _write)"""
+        capacity = self._get_meta("capacity") or 0
+        if slots_needed > capacity:
+            capacity = min(max(slots_needed, capacity * 2, 1024), self.max_entries)
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(capacity * self.dim * 4)
+            self._set_meta("capacity", capacity)
+        self._map(capacity)
+
+    def _allocate_slots(self, count: int) -> List[int]:
+        """Hand out fresh slots, evicting least recently used entries once full (call inside _write)"""
+        next_slot = self._get_meta("next_slot") or 0
+        fresh = max(min(count, self.max_entries - next_slot), 0)
+        slots = list(range(next_slot, next_slot + fresh))
+        self._set_meta("next_slot", next_slot + fresh)
+        self._ensure_capacity(next_slot + fresh)
+
+        remaining = count - fresh
+        if remaining > 0:
+            evicted = self._db.execute(
+                "SELECT key, slot FROM entries ORDER BY last_access LIMIT ?", (remaining,)
+            ).fetchall()
+            self._db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in evicted])
+            slots.extend(slot for _, slot in evicted)
+            self.evictions += len(evicted)
+        return slots
+
+    def _lookup_slots(self, keys: List[str]) -> Dict[str, int]:
+        slots = {}
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._db.execute(
+                f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            slots.update(rows)
+        return slots
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return cached vectors for the given keys, skipping misses"""
+        if not keys:
+            return {}
+
+        slots = self._lookup_slots(list(dict.fromkeys(keys)))
+        if not slots:
+            return {}
+        if max(slots.values()) >= self._capacity:
+            # Another process stored these rows after we mapped the file
+            self.dim = self.dim or self._get_meta("dim")
+            self._map(self._get_meta("capacity") or 0)
+        found = {key: np.array(self._vectors[slot]) for key, slot in slots.items()}
+        now = time.time()
+        with self._write():
+            self._db.executemany("UPDATE entries SET last_access = ? WHERE key = ?",
+                                 [(now, k) for k in found])
+        return found
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        """Store vectors for the given keys"""
+        if not keys:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        # Keep only the first occurrence of each key
+        unique = {}
+        for key, vector in zip(keys, vectors):
+            unique.setdefault(key, vector)
+
+        # Slots are allocated, written and indexed under one write lock, so processes
+        # sharing the directory never hand out the same slot
+        with self._write():
+            self.dim = self._get_meta("dim")
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._set_meta("dim", self.dim)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match cache dimension {self.dim}")
+
+            # Skip keys already stored, including by other processes
+            existing = self._lookup_slots(list(unique))
+            new_items = [(k, v) for k, v in unique.items() if k not in existing]
+            new_items = new_items[-self.max_entries:]
+            if not new_items:
+                return
+
+            slots = self._allocate_slots(len(new_items))
+            now = time.time()
+            for (key, vector), slot in zip(new_items, slots):
+                self._vectors[slot] = vector
+            self._vectors.flush()
+            self._db.executemany(
+                "INSERT OR REPLACE INTO entries (key, slot, last_access) VALUES (?, ?, ?)",
+                [(key, slot, now) for (key, _), slot in zip(new_items, slots)]
+            )
+
+    def encode(self, model, texts: List[str], **encode_kwargs) -> np.ndarray:
+        """Encode texts, computing only the cache misses in a single model call"""
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+
+        keys = [text_key(t) for t in texts]
+        with self._lock:
+            cached = self.get_many(keys)
+            miss_count = sum(1 for k in keys if k not in cached)
+            self.hits += len(keys) - miss_count
+            self.misses += miss_count
+
+        misses = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                misses.setdefault(key, text)
+        miss_keys = list(misses)
+        miss_texts = list(misses.values())
+
+        if miss_texts:
+            encode_kwargs.setdefault("convert_to_tensor", False)
+            if encode_kwargs.setdefault("normalize_embeddings", self.normalize) != self.normalize:
+                raise ValueError("normalize_embeddings does not match the cache's normalization")
+            new_vectors = np.asarray(model.encode(miss_texts, **encode_kwargs), dtype=np.float32)
+            with self._lock:
+                self.put_many(miss_keys, new_vectors)
+            cached.update(zip(miss_keys, new_vectors))
+
+        return np.stack([cached[k] for k in keys]).astype(np.float32, copy=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "model_name": self.model_name,
+            "precision": self.precision,
+            "normalize": self.normalize,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "bytes_on_disk": self._capacity * (self.dim or 0) * 4,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            self._db.close()
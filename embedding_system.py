@@ -1,123 +1,506 @@
-from sentence_transformers import SentenceTransformer
 import numpy as np
-from typing import List, Dict, Any
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
-import uuid
+from typing import List, Dict, Any, Optional, Tuple
+import os
+import threading
+from model_registry import SharedModel, get_model
+from embedding_cache import EmbeddingCache
+from retrieval_cache import RetrievalCache, filters_key
+from vector_store import VectorStore, ChromaVectorStore, NumpyVectorStore
+from bm25_index import BM25Index
+from instrumentation import span
+from embedding_batcher import EmbeddingBatcher
 
-class CustomEmbeddingFunction(embedding_functions.EmbeddingFunction):
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+class CustomEmbeddingFunction:
+    """
+    Chroma embedding function backed by the shared model. Chroma checks the
+    __call__(self, input) signature, so subclassing its protocol (and importing
+    chromadb for it) is not needed.
+    """
+    
+    def __init__(self,
+                 model_name: str = "all-MiniLM-L6-v2",
+                 model: Optional[SharedModel] = None,
+                 cache: Optional[EmbeddingCache] = None):
+        # Reuse the caller's model handle instead of loading a second copy
+        self.model = model if model is not None else get_model(model_name)
+        self.cache = cache
     
     def __call__(self, input: List[str]) -> List[List[float]]:
-        embeddings = self.model.encode(input, convert_to_tensor=False)
+        if self.cache is not None:
+            embeddings = self.cache.encode(self.model, input)
+        else:
+            embeddings = self.model.encode(input, convert_to_tensor=False)
         return embeddings.tolist()
 
 class EmbeddingSystem:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2", db_path: str = "./vector_db"):
-        self.model = SentenceTransformer(model_name)
-        self.embedding_function = CustomEmbeddingFunction(model_name)
-        self.client = chromadb.PersistentClient(path=db_path)
+    def __init__(self,
+                 model_name: str = "all-MiniLM-L6-v2",
+                 db_path: str = "./vector_db",
+                 device: Optional[str] = None,
+                 precision: str = "float32",
+                 cache_dir: Optional[str] = None,
+                 cache_max_entries: int = 200000,
+                 retrieval_cache_size: int = 1024,
+                 retrieval_cache_ttl: float = 300.0,
+                 backend: str = "chroma",
+                 vector_precision: str = "float32",
+                 rerank_factor: int = 4,
+                 hybrid_search: bool = True,
+                 hybrid_candidates: int = 20,
+                 rrf_k: int = 60,
+                 vector_index: str = "flat",
+                 ivf_clusters: Optional[int] = None,
+                 ivf_nprobe: int = 8):
+        # The model is shared process-wide and only loaded on first encode
+        self.model = get_model(model_name, device=device, precision=precision)
+        self.embedding_cache = (EmbeddingCache(cache_dir, model_name, cache_max_entries, precision=precision)
+                                if cache_dir else None)
+        self.embedding_function = CustomEmbeddingFunction(model_name, model=self.model, cache=self.embedding_cache)
+        if backend not in ("chroma", "numpy"):
+            raise ValueError(f"Unsupported vector store backend: {backend}")
+        if backend == "chroma" and vector_precision != "float32":
+            raise ValueError("Quantized vector storage requires the numpy backend")
+        if backend == "chroma" and vector_index != "flat":
+            raise ValueError("The IVF textbook index requires the numpy backend")
+        self.backend = backend
+        self.vector_index = vector_index
+        self.ivf_clusters = ivf_clusters
+        self.ivf_nprobe = ivf_nprobe
+        self.vector_precision = vector_precision
+        self.rerank_factor = rerank_factor
+        self.db_path = db_path
+        # The Chroma client and the collections are opened on first use (see client / questions_collection)
+        self._client = None
+        self._collection_names: Dict[str, str] = {}
+        self._collections: Dict[str, VectorStore] = {}
+        self._open_lock = threading.RLock()
+        
+        # Search results are cached per collection version; writes bump the version
+        self.retrieval_cache = RetrievalCache(retrieval_cache_size, retrieval_cache_ttl) if retrieval_cache_size else None
+        self.collection_versions = {"questions": 0, "textbook": 0}
+        self._version_lock = threading.Lock()
+        
+        # Keyword index over the textbook collection, loaded (or rebuilt) when the collection is opened
+        # and updated by every write; build_textbook_index persists it after an ingest
+        self.lexical_index = BM25Index() if hybrid_search else None
+        self.hybrid_candidates = hybrid_candidates
+        self.rrf_k = rrf_k
+        self._lexical_dirty = False
         
+        # Set by enable_query_batching when many threads search concurrently (HTTP serving)
+        self.query_batcher = None
+        
+    def enable_query_batching(self, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        """Micro-batch query encodes from concurrent searches into shared model calls"""
+        self.query_batcher = EmbeddingBatcher(self.create_embeddings, max_batch_size, max_wait_ms)
+    
     def create_embeddings(self, texts: List[str]) -> np.ndarray:
         """Create embeddings for a list of texts"""
+        if self.embedding_cache is not None:
+            return self.embedding_cache.encode(self.model, texts)
         embeddings = self.model.encode(texts, convert_to_tensor=False)
         return embeddings
     
     def setup_collections(self, questions_collection_name: str, textbook_collection_name: str):
-        """Set up ChromaDB collections for questions and textbook content"""
-        # Create or get collections with custom embedding function
-        self.questions_collection = self.client.get_or_create_collection(
-            name=questions_collection_name,
-            embedding_function=self.embedding_function,
-            metadata={"hnsw:space": "cosine"}
-        )
+        """Set up vector store collections for questions and textbook content; they are opened on first use"""
+        with self._open_lock:
+            self._collection_names = {"questions": questions_collection_name, "textbook": textbook_collection_name}
+            self._collections = {}
+    
+    def open_collections(self):
+        """Open both collections (and load the BM25 index) now rather than on first use"""
+        self._collection("questions")
+        self._collection("textbook")
+    
+    @property
+    def client(self):
+        """Chroma persistent client (chroma backend only), created on first use"""
+        if self._client is None and self.backend == "chroma":
+            with self._open_lock:
+                if self._client is None:
+                    import chromadb
+                    
+                    self._client = chromadb.PersistentClient(path=self.db_path)
+        return self._client
+    
+    @property
+    def questions_collection(self) -> VectorStore:
+        return self._collection("questions")
+    
+    @property
+    def textbook_collection(self) -> VectorStore:
+        return self._collection("textbook")
+    
+    def _open_collection(self, name: str, index: str = "flat") -> VectorStore:
+        if self.backend == "numpy":
+            return NumpyVectorStore(os.path.join(self.db_path, "numpy", name),
+                                    precision=self.vector_precision,
+                                    rerank_factor=self.rerank_factor,
+                                    index=index,
+                                    ivf_clusters=self.ivf_clusters,
+                                    nprobe=self.ivf_nprobe)
         
-        self.textbook_collection = self.client.get_or_create_collection(
-            name=textbook_collection_name,
+        # Create or get collection with custom embedding function
+        return ChromaVectorStore(self.client.get_or_create_collection(
+            name=name,
             embedding_function=self.embedding_function,
             metadata={"hnsw:space": "cosine"}
-        )
+        ))
     
-    def add_questions_to_db(self, questions: List[Dict[str, Any]]):
-        """Add processed questions to the vector database"""
-        texts = [q["content"] for q in questions]
-        
-        ids = [q["id"] for q in questions]
+    def add_questions_to_db(self, questions: List[Dict[str, Any]], embeddings: Optional[np.ndarray] = None):
+        """
+        Add processed questions to the vector database (existing IDs are overwritten).
+        Precomputed embeddings may be passed to skip encoding.
+        """
+        if not questions:
+            return
+        columns = {name: [q[name] for q in questions]
+                   for name in ("id", "content", "topic", "difficulty", "question", "answer")}
+        columns["source"] = [q.get("source", "inline") for q in questions]
+        self.add_question_columns(columns, embeddings)
+    
+    def add_question_columns(self, columns: Dict[str, List[Any]], embeddings: Optional[np.ndarray] = None):
+        """
+        add_questions_to_db for column batches as produced by DataProcessor.iter_question_columns
+        ({"id": [...], "content": [...], "topic": [...], ...}), without building a dict per question first.
+        """
+        ids = columns["id"]
+        if not ids:
+            return
+        texts = columns["content"]
         metadatas = [{
-            "topic": q["topic"],
-            "difficulty": q["difficulty"],
-            "question": q["question"],
-            "answer": q["answer"]
-        } for q in questions]
-        
-        # ChromaDB will use our custom embedding function automatically
-        self.questions_collection.add(
+            "topic": topic,
+            "difficulty": difficulty,
+            "question": question,
+            "answer": answer,
+            "source": source
+        } for topic, difficulty, question, answer, source in zip(
+            columns["topic"], columns["difficulty"], columns["question"], columns["answer"], columns["source"]
+        )]
+        
+        if embeddings is None:
+            embeddings = self.create_embeddings(texts)
+        
+        self.questions_collection.upsert(
+            ids=ids,
+            embeddings=np.asarray(embeddings).tolist(),
             documents=texts,
-            metadatas=metadatas,
-            ids=ids
+            metadatas=metadatas
         )
+        self._bump_version("questions")
     
-    def add_textbook_to_db(self, textbook_chunks: List[Dict[str, Any]]):
-        """Add processed textbook chunks to the vector database"""
+    def add_textbook_to_db(self, textbook_chunks: List[Dict[str, Any]], embeddings: Optional[np.ndarray] = None):
+        """
+        Add processed textbook chunks to the vector database (existing IDs are overwritten).
+        Precomputed embeddings may be passed to skip encoding.
+        """
+        if not textbook_chunks:
+            return
         texts = [chunk["content"] for chunk in textbook_chunks]
         
         ids = [chunk["id"] for chunk in textbook_chunks]
         metadatas = [{
             "chapter": chunk["chapter"],
             "subject": chunk["subject"],
-            "page": chunk["page"]
+            "page": chunk["page"],
+            "source": chunk.get("source", "inline")
         } for chunk in textbook_chunks]
+        # Character spans let prompt assembly merge overlapping neighbours
+        for metadata, chunk in zip(metadatas, textbook_chunks):
+            if chunk.get("start_char") is not None:
+                metadata["start_char"] = chunk["start_char"]
+                metadata["end_char"] = chunk["end_char"]
+        
+        if embeddings is None:
+            embeddings = self.create_embeddings(texts)
         
-        # ChromaDB will use our custom embedding function automatically
-        self.textbook_collection.add(
+        self.textbook_collection.upsert(
+            ids=ids,
+            embeddings=np.asarray(embeddings).tolist(),
             documents=texts,
-            metadatas=metadatas,
-            ids=ids
+            metadatas=metadatas
         )
+        if self.lexical_index is not None:
+            self.lexical_index.add(ids, texts, metadatas)
+            self._lexical_dirty = True
+        self._bump_version("textbook")
+    
+    def delete_questions(self, ids: List[str]):
+        """Remove questions from the vector database by ID"""
+        if ids:
+            self.questions_collection.delete(ids=list(ids))
+            self._bump_version("questions")
+    
+    def delete_textbook_chunks(self, ids: List[str]):
+        """Remove textbook chunks from the vector database by ID"""
+        if ids:
+            self.textbook_collection.delete(ids=list(ids))
+            if self.lexical_index is not None:
+                self.lexical_index.remove(list(ids))
+                self._lexical_dirty = True
+            self._bump_version("textbook")
     
-    def search_similar_questions(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Search for similar questions using semantic similarity"""
-        query_embedding = self.create_embeddings([query])
+    def build_textbook_index(self, retrain: bool = False):
+        """
+        Bring the textbook indexes up to date after an ingest: the BM25 index is saved
+        and the IVF index rebuilt (no-op with the flat index).
+        Writes leave the IVF index stale, and stale indexes are bypassed for exact search until rebuilt.
+        """
+        if self.lexical_index is not None and self._lexical_dirty:
+            with span("bm25_save"):
+                self.lexical_index.save(self._lexical_path())
+            self._lexical_dirty = False
+        if self.vector_index != "ivf":
+            return
+        with span("ivf_build"):
+            report = self.textbook_collection.build_index(retrain)
+        if report is not None:
+            self._bump_version("textbook")
+            print(f"Built IVF textbook index: {report['rows']} chunks in {report['clusters']} clusters"
+                  + (" (retrained)" if report["retrained"] else ""))
+    
+    def search_similar_questions(self, query: str, top_k: int = 5,
+                                 where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Search for similar questions using semantic similarity.
+        `where` is a metadata filter, e.g. {"difficulty": "Hard"} or {"topic": {"$in": [...]}}
+        """
+        return self.search_many(question_queries=[query], top_k_questions=top_k, question_where=where)[0][0]
+    
+    def search_relevant_textbook(self, query: str, top_k: int = 3,
+                                 where: Optional[Dict[str, Any]] = None,
+                                 nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Search for relevant textbook content, optionally filtered by chapter/subject metadata.
+        With hybrid search, BM25 keyword matches are fused with the dense results.
+        nprobe trades latency for recall when the IVF index is enabled (default IVF_NPROBE).
+        """
+        return self.search_many(textbook_queries=[query], top_k_textbook=top_k, textbook_where=where,
+                                textbook_nprobe=nprobe)[1][0]
+    
+    def search_many(self,
+                    question_queries: List[str] = None,
+                    textbook_queries: List[str] = None,
+                    top_k_questions: int = 5,
+                    top_k_textbook: int = 3,
+                    question_where: Optional[Dict[str, Any]] = None,
+                    textbook_where: Optional[Dict[str, Any]] = None,
+                    textbook_nprobe: Optional[int] = None) -> Tuple[List[List[Dict[str, Any]]], List[List[Dict[str, Any]]]]:
+        """
+        Search both collections for many queries at once.
+        Cached results are reused; all remaining distinct query strings are
+        encoded in a single batch and each collection is queried once.
+        The optional where filters apply to every query of their collection;
+        textbook_nprobe sets the IVF clusters probed per textbook query.
+        Returns (similar_questions, relevant_textbook), one result list per input query.
+        """
+        searches = {
+            "questions": (question_queries or [], top_k_questions, question_where, self._format_question_results),
+            "textbook": (textbook_queries or [], top_k_textbook, textbook_where, self._format_textbook_results),
+        }
+        nprobes = {"questions": None, "textbook": textbook_nprobe}
         
-        results = self.questions_collection.query(
-            query_embeddings=query_embedding.tolist(),
-            n_results=top_k
-        )
+        found = {kind: {} for kind in searches}
+        pending = {kind: [] for kind in searches}
+        # Keys carry the collection version read before querying, so results racing a write
+        # are stored under the old version and never served after it
+        cache_keys = {kind: {} for kind in searches}
+        with span("retrieval_cache") as stage:
+            for kind, (queries, top_k, where, _) in searches.items():
+                for query in dict.fromkeys(queries):
+                    cache_keys[kind][query] = self._cache_key(kind, query, top_k, where, nprobes[kind])
+                    cached = self.retrieval_cache.get(cache_keys[kind][query]) if self.retrieval_cache else None
+                    if cached is not None:
+                        found[kind][query] = cached
+                    else:
+                        pending[kind].append(query)
+            stage.set(cache_hits=sum(len(hits) for hits in found.values()),
+                      cache_misses=sum(len(queries) for queries in pending.values()))
+        
+        to_encode = list(dict.fromkeys(pending["questions"] + pending["textbook"]))
+        if to_encode:
+            with span("encode", texts=len(to_encode)):
+                encode = self.query_batcher.encode if self.query_batcher else self.create_embeddings
+                embeddings = dict(zip(to_encode, encode(to_encode)))
+            for kind, (_, top_k, where, format_results) in searches.items():
+                if not pending[kind]:
+                    continue
+                hybrid = kind == "textbook" and self.lexical_index is not None
+                with span(f"vector_query_{kind}", queries=len(pending[kind])):
+                    results = self._collection(kind).query(
+                        query_embeddings=[np.asarray(embeddings[q]).tolist() for q in pending[kind]],
+                        n_results=max(top_k, self.hybrid_candidates) if hybrid else top_k,
+                        where=where,
+                        nprobe=nprobes[kind]
+                    )
+                for row, query in enumerate(pending[kind]):
+                    found[kind][query] = format_results(results, row)
+                    if hybrid:
+                        found[kind][query] = self._fuse_lexical(query, found[kind][query], top_k, where)
+                    if self.retrieval_cache:
+                        self.retrieval_cache.put(cache_keys[kind][query], found[kind][query])
+        
+        # Every input query gets its own copy, even when a query repeats
+        similar_questions = [[dict(hit) for hit in found["questions"][q]] for q in searches["questions"][0]]
+        relevant_textbook = [[dict(hit) for hit in found["textbook"][q]] for q in searches["textbook"][0]]
+        return similar_questions, relevant_textbook
+    
+    def find_near_duplicates(self, texts: List[str], threshold: float) -> List[Optional[Dict[str, Any]]]:
+        """
+        For each text, its closest match at cosine similarity >= threshold among the
+        stored questions and the texts before it in the list, or None. All texts are
+        embedded in one batch; the in-batch check is one similarity matrix and the
+        stored questions are searched with one nearest-neighbour query.
+        Matches are {"source": "bank", "id", "question", "similarity"} or
+        {"source": "batch", "index", "similarity"}.
+        """
+        matches = [None] * len(texts)
+        if not texts:
+            return matches
+        with span("encode", texts=len(texts)):
+            embeddings = np.asarray(self.create_embeddings(texts), dtype=np.float32)
+        
+        unit = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        similarity = unit @ unit.T
+        # Each text is only compared with earlier ones, so the first of a group of duplicates passes
+        similarity[np.triu_indices(len(texts))] = -1.0
+        closest = similarity.argmax(axis=1)
+        for i, j in enumerate(closest):
+            if similarity[i, j] >= threshold:
+                matches[i] = {"source": "batch", "index": int(j), "similarity": float(similarity[i, j])}
+        
+        if self.questions_collection.count():
+            with span("vector_query_questions", queries=len(texts)):
+                results = self.questions_collection.query(query_embeddings=embeddings.tolist(), n_results=1)
+            for i in range(len(texts)):
+                hits = self._format_question_results(results, i)
+                if not hits or hits[0]["similarity_score"] < threshold:
+                    continue
+                if matches[i] is None or hits[0]["similarity_score"] > matches[i]["similarity"]:
+                    matches[i] = {"source": "bank", "id": hits[0]["id"], "question": hits[0]["question"],
+                                  "similarity": float(hits[0]["similarity_score"])}
+        return matches
+    
+    def _fuse_lexical(self, query: str, dense_hits: List[Dict[str, Any]], top_k: int,
+                      where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Reciprocal rank fusion of dense hits with BM25 hits for the same query.
+        Chunks found only by BM25 are fetched from the store; their
+        similarity_score is None because no dense score was computed.
+        """
+        with span("bm25_search"):
+            self.textbook_collection  # opening it loads the BM25 index
+            lexical_hits = self.lexical_index.search(query, self.hybrid_candidates, where)
+        fused = {}
+        for rank, hit in enumerate(dense_hits):
+            fused[hit["id"]] = 1.0 / (self.rrf_k + rank + 1)
+        for rank, (chunk_id, _) in enumerate(lexical_hits):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        best = sorted(fused, key=fused.get, reverse=True)[:top_k]
         
+        by_id = {hit["id"]: hit for hit in dense_hits}
+        missing = [chunk_id for chunk_id in best if chunk_id not in by_id]
+        if missing:
+            extra = self.textbook_collection.get(ids=missing)
+            for chunk_id, document, metadata in zip(extra["ids"], extra["documents"], extra["metadatas"]):
+                by_id[chunk_id] = {
+                    "id": chunk_id,
+                    "content": document,
+                    "chapter": metadata["chapter"],
+                    "subject": metadata["subject"],
+                    "page": metadata["page"],
+                    "source": metadata.get("source"),
+                    "start_char": metadata.get("start_char"),
+                    "end_char": metadata.get("end_char"),
+                    "similarity_score": None
+                }
+        bm25_scores = dict(lexical_hits)
+        
+        hits = []
+        for chunk_id in best:
+            if chunk_id in by_id:
+                hit = dict(by_id[chunk_id])
+                hit["bm25_score"] = bm25_scores.get(chunk_id, 0.0)
+                hit["fusion_score"] = fused[chunk_id]
+                hits.append(hit)
+        return hits
+    
+    def _collection(self, kind: str) -> VectorStore:
+        """The questions or textbook collection, opened on first use"""
+        collection = self._collections.get(kind)
+        if collection is None:
+            with self._open_lock:
+                collection = self._collections.get(kind)
+                if collection is None:
+                    # Only the textbook collection grows large enough to need a clustered index
+                    index = self.vector_index if kind == "textbook" else "flat"
+                    collection = self._open_collection(self._collection_names[kind], index)
+                    if kind == "textbook" and self.lexical_index is not None:
+                        self._load_lexical_index(collection)
+                    self._collections[kind] = collection
+        return collection
+    
+    def _lexical_path(self) -> str:
+        return os.path.join(self.db_path, "lexical", self._collection_names["textbook"])
+    
+    def _load_lexical_index(self, collection: VectorStore):
+        """Load the saved BM25 index, or rebuild it from the collection if it is missing or out of date"""
+        if self.lexical_index.load(self._lexical_path()) and len(self.lexical_index) == collection.count():
+            self._lexical_dirty = False
+            return
+        with span("bm25_rebuild"):
+            self.lexical_index.clear()
+            page_size = 5000
+            offset = 0
+            while True:
+                page = collection.get(limit=page_size, offset=offset)
+                if not page["ids"]:
+                    break
+                self.lexical_index.add(page["ids"], page["documents"], page["metadatas"])
+                offset += len(page["ids"])
+            if len(self.lexical_index):
+                self.lexical_index.save(self._lexical_path())
+        self._lexical_dirty = False
+    
+    def _cache_key(self, kind: str, query: str, top_k: int, filters: Optional[Dict[str, Any]] = None,
+                   nprobe: Optional[int] = None):
+        return (kind, self.collection_versions[kind], query, top_k, filters_key(filters), nprobe)
+    
+    def _bump_version(self, kind: str):
+        """Record a write so cached results for the collection are no longer used"""
+        with self._version_lock:
+            self.collection_versions[kind] += 1
+    
+    def _format_question_results(self, results: Dict[str, Any], row: int) -> List[Dict[str, Any]]:
+        """Turn one query row of a vector store result into question dicts"""
         similar_questions = []
-        for i in range(len(results['ids'][0])):
+        for i in range(len(results['ids'][row])):
             similar_questions.append({
-                "id": results['ids'][0][i],
-                "question": results['metadatas'][0][i]['question'],
-                "answer": results['metadatas'][0][i]['answer'],
-                "topic": results['metadatas'][0][i]['topic'],
-                "difficulty": results['metadatas'][0][i]['difficulty'],
-                "similarity_score": 1 - results['distances'][0][i],  # Convert distance to similarity
-                "content": results['documents'][0][i]
+                "id": results['ids'][row][i],
+                "question": results['metadatas'][row][i]['question'],
+                "answer": results['metadatas'][row][i]['answer'],
+                "topic": results['metadatas'][row][i]['topic'],
+                "difficulty": results['metadatas'][row][i]['difficulty'],
+                "similarity_score": 1 - results['distances'][row][i],  # Convert distance to similarity
+                "content": results['documents'][row][i]
             })
         
         return similar_questions
     
-    def search_relevant_textbook(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
-        """Search for relevant textbook content"""
-        query_embedding = self.create_embeddings([query])
-        
-        results = self.textbook_collection.query(
-            query_embeddings=query_embedding.tolist(),
-            n_results=top_k
-        )
-        
+    def _format_textbook_results(self, results: Dict[str, Any], row: int) -> List[Dict[str, Any]]:
+        """Turn one query row of a vector store result into textbook chunk dicts"""
         relevant_content = []
-        for i in range(len(results['ids'][0])):
+        for i in range(len(results['ids'][row])):
             relevant_content.append({
-                "id": results['ids'][0][i],
-                "content": results['documents'][0][i],
-                "chapter": results['metadatas'][0][i]['chapter'],
-                "subject": results['metadatas'][0][i]['subject'],
-                "page": results['metadatas'][0][i]['page'],
-                "similarity_score": 1 - results['distances'][0][i]
+                "id": results['ids'][row][i],
+                "content": results['documents'][row][i],
+                "chapter": results['metadatas'][row][i]['chapter'],
+                "subject": results['metadatas'][row][i]['subject'],
+                "page": results['metadatas'][row][i]['page'],
+                "source": results['metadatas'][row][i].get('source'),
+                "start_char": results['metadatas'][row][i].get('start_char'),
+                "end_char": results['metadatas'][row][i].get('end_char'),
+                "similarity_score": 1 - results['distances'][row][i]
             })
         
-        return relevant_content
\ No newline at end of file
+        return relevant_content
@@ -0,0 +1,163 @@
+import json
+from typing import List, Dict, Any, Optional
+
+_WHITESPACE = " \t\r\n"
+
+
+def _decode_string(raw: str) -> str:
+    """Decode the body of a JSON string, dropping an incomplete trailing escape"""
+    for cut in range(len(raw), max(len(raw) - 6, -1), -1):
+        try:
+            return json.loads('"' + raw[:cut] + '"')
+        except json.JSONDecodeError:
+            continue
+    return raw
+
+
+class IncrementalJSONParser:
+    """
+    Parses a streamed JSON object as text arrives and reports top-level
+    fields as soon as they are complete. feed() returns a list of events:
+
+        {"type": "partial", "key": k, "value": text}      string field still streaming
+        {"type": "field", "key": k, "value": v}           field complete
+        {"type": "item", "key": k, "index": i, "value": v}  string/object/array element of an array complete
+
+    Text before the opening brace (prose or a code fence) is ignored.
+    Completed fields are collected in `result`; `done` turns True at the closing brace.
+    """
+
+    def __init__(self):
+        self.result: Dict[str, Any] = {}
+        self.done = False
+        self._state = "start"
+        self._key: Optional[str] = None
+        self._raw: List[str] = []
+        self._escape = False
+        self._in_string = False
+        self._depth = 0
+        self._item_start: Optional[int] = None
+        self._items = 0
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        for ch in text:
+            self._step(ch, events)
+        if self._state == "string" and self._raw:
+            events.append({"type": "partial", "key": self._key, "value": _decode_string("".join(self._raw))})
+        return events
+
+    def _emit_field(self, value: Any, events: List[Dict[str, Any]]):
+        self.result[self._key] = value
+        events.append({"type": "field", "key": self._key, "value": value})
+        self._state = "key_or_end"
+
+    def _step(self, ch: str, events: List[Dict[str, Any]]):
+        state = self._state
+        if state == "start":
+            if ch == "{":
+                self._state = "key_or_end"
+        elif state == "key_or_end":
+            if ch == '"':
+                self._state = "key"
+                self._raw = []
+            elif ch == "}":
+                self._state = "end"
+                self.done = True
+        elif state in ("key", "string"):
+            if self._escape:
+                self._escape = False
+                self._raw.append(ch)
+            elif ch == "\\":
+                self._escape = True
+                self._raw.append(ch)
+            elif ch == '"':
+                text = _decode_string("".join(self._raw))
+                if state == "key":
+                    self._key = text
+                    self._state = "colon"
+                else:
+                    self._emit_field(text, events)
+            else:
+                self._raw.append(ch)
+        elif state == "colon":
+            if ch == ":":
+                self._state = "value"
+        elif state == "value":
+            if ch in _WHITESPACE:
+                return
+            self._raw = []
+            if ch == '"':
+                self._state = "string"
+            elif ch in "[{":
+                self._state = "container"
+                self._raw = [ch]
+                self._depth = 1
+                self._in_string = False
+                self._item_start = None
+                self._items = 0
+            else:
+                self._state = "scalar"
+                self._raw = [ch]
+        elif state == "scalar":
+            if ch in ",}" or ch in _WHITESPACE:
+                raw = "".join(self._raw)
+                try:
+                    value = json.loads(raw)
+                except json.JSONDecodeError:
+                    value = raw
+                self._emit_field(value, events)
+                if ch == "}":
+                    self._state = "end"
+                    self.done = True
+            else:
+                self._raw.append(ch)
+        elif state == "container":
+            self._step_container(ch, events)
+
+    def _step_container(self, ch: str, events: List[Dict[str, Any]]):
+        raw = self._raw
+        raw.append(ch)
+        is_array = raw[0] == "["
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if is_array and self._depth == 1:
+                    self._emit_item(events)
+            return
+
+        if ch == '"':
+            self._in_string = True
+            if is_array and self._depth == 1:
+                self._item_start = len(raw) - 1
+        elif ch in "[{":
+            if is_array and self._depth == 1:
+                self._item_start = len(raw) - 1
+            self._depth += 1
+        elif ch in "]}":
+            self._depth -= 1
+            if self._depth == 0:
+                try:
+                    value = json.loads("".join(raw))
+                except json.JSONDecodeError:
+                    value = "".join(raw)
+                self._emit_field(value, events)
+            elif is_array and self._depth == 1:
+                self._emit_item(events)
+
+    def _emit_item(self, events: List[Dict[str, Any]]):
+        """Report the array element that just closed"""
+        if self._item_start is None:
+            return
+        try:
+            value = json.loads("".join(self._raw[self._item_start:]))
+        except json.JSONDecodeError:
+            return
+        finally:
+            self._item_start = None
+        events.append({"type": "item", "key": self._key, "index": self._items, "value": value})
+        self._items += 1
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+from typing import List, Dict, Any, Optional
+
+
+def file_digest(file_path: str, block_size: int = 1 << 20) -> str:
+    """Return the SHA-256 of a file without reading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_digest(content: Any) -> str:
+    """Return the SHA-256 of in-memory content (strings or JSON-serializable data)"""
+    if not isinstance(content, str):
+        content = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class IngestManifest:
+    """
+    Records what was ingested from each source: its mtime, content hash and the
+    IDs it produced, so re-ingesting can skip unchanged sources and delete
+    items that disappeared from changed ones.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def get(self, source: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(source)
+
+    def is_unchanged(self, source: str, mtime: Optional[float] = None, digest: Optional[str] = None) -> bool:
+        """A matching mtime is trusted as-is; otherwise fall back to comparing content hashes"""
+        entry = self.entries.get(source)
+        if entry is None:
+            return False
+        if mtime is not None and entry.get("mtime") == mtime:
+            return True
+        return digest is not None and entry.get("sha256") == digest
+
+    def update(self, source: str, kind: str, digest: str, ids: List[str], mtime: Optional[float] = None):
+        self.entries[source] = {
+            "kind": kind,
+            "mtime": mtime,
+            "sha256": digest,
+            "ids": ids,
+        }
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
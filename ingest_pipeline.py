@@ -0,0 +1,220 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Set
+from data_processor import DataProcessor, batched
+from ingest_manifest import file_digest
+
+# Set in each worker process by _init_worker: the bounded queue chunk batches are sent to the parent on
+_chunk_queue = None
+
+
+def _init_worker(chunk_queue):
+    global _chunk_queue
+    _chunk_queue = chunk_queue
+
+
+def chunk_textbook_file(file_path: str, source: str, chunk_size: int, chunk_overlap: int,
+                        metadata: Optional[Dict[str, Any]] = None, batch_size: int = 64) -> Dict[str, Any]:
+    """
+    Clean and chunk one textbook file (runs inside a worker process).
+    Chunks are sent to the parent in batches of batch_size as they are produced,
+    followed by a ("done", source, summary) message, so no process ever holds
+    all of a file's chunks.
+    """
+    start = time.perf_counter()
+    waited = 0.0
+    count = 0
+    processor = DataProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for batch in batched(processor.iter_textbook_file(file_path, metadata=metadata, source=source), batch_size):
+        put_start = time.perf_counter()
+        _chunk_queue.put(("chunks", source, batch))
+        waited += time.perf_counter() - put_start
+        count += len(batch)
+    result = {
+        "source": source,
+        "chunks": count,
+        "mtime": os.path.getmtime(file_path),
+        "sha256": file_digest(file_path),
+        # Time blocked on a full queue is backpressure from encoding, not chunking work
+        "seconds": time.perf_counter() - start - waited,
+    }
+    _chunk_queue.put(("done", source, result))
+    return result
+
+
+class StageStats:
+    """Item count and busy time of one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+
+    def record(self, items: int, seconds: float):
+        self.items += items
+        self.busy_seconds += seconds
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "items_per_second": round(self.items / self.busy_seconds, 1) if self.busy_seconds else None,
+        }
+
+
+class IngestPipeline:
+    """
+    Pipelined textbook ingestion.
+    A process pool cleans and chunks files in parallel and streams the chunks
+    back in batches, a single encoder thread embeds them in fixed-size batches,
+    and a writer thread upserts finished batches so database writes overlap
+    with encoding. Every hand-off is a bounded queue, so memory does not grow
+    with file size.
+    """
+
+    _DONE = object()
+
+    def __init__(self,
+                 embedding_system,
+                 chunk_size: int = 500,
+                 chunk_overlap: int = 50,
+                 workers: Optional[int] = None,
+                 batch_size: int = 64,
+                 queue_size: int = 8):
+        self.embedding_system = embedding_system
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.workers = workers or max((os.cpu_count() or 2) - 1, 1)
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+
+    def ingest_textbooks(self,
+                         files: List[Tuple[str, str]],
+                         metadata: Optional[Dict[str, Any]] = None,
+                         previous_ids: Optional[Dict[str, Set[str]]] = None) -> Dict[str, Any]:
+        """
+        Ingest (file_path, source) pairs.
+        Chunks whose IDs are already in previous_ids[source] are not re-embedded.
+        Returns per-source results (IDs, hash, mtime) and a per-stage throughput report.
+        """
+        previous_ids = previous_ids or {}
+        stats = {name: StageStats(name) for name in ("chunk", "encode", "write")}
+        encode_queue = queue.Queue(maxsize=self.queue_size)
+        write_queue = queue.Queue(maxsize=self.queue_size)
+        errors = []
+
+        def encoder():
+            pending = []
+            while True:
+                item = encode_queue.get()
+                # After a failure keep draining, so the ingest loop never blocks on a full queue
+                if item is not self._DONE and not errors:
+                    pending.extend(item)
+                try:
+                    while not errors and (len(pending) >= self.batch_size or (item is self._DONE and pending)):
+                        batch, pending = pending[:self.batch_size], pending[self.batch_size:]
+                        start = time.perf_counter()
+                        embeddings = self.embedding_system.create_embeddings([c["content"] for c in batch])
+                        stats["encode"].record(len(batch), time.perf_counter() - start)
+                        write_queue.put((batch, embeddings))
+                except Exception as e:
+                    errors.append(e)
+                    pending = []
+                if item is self._DONE:
+                    break
+            write_queue.put(self._DONE)
+
+        def writer():
+            while True:
+                item = write_queue.get()
+                if item is self._DONE:
+                    break
+                if errors:
+                    continue  # Drain the queue so the encoder never blocks
+                try:
+                    batch, embeddings = item
+                    start = time.perf_counter()
+                    self.embedding_system.add_textbook_to_db(batch, embeddings=embeddings)
+                    stats["write"].record(len(batch), time.perf_counter() - start)
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=encoder, daemon=True), threading.Thread(target=writer, daemon=True)]
+        results = {source: {"source": source, "ids": [], "added": 0} for _, source in files}
+        context = multiprocessing.get_context()
+        chunk_queue = context.Queue(maxsize=self.queue_size)
+        wall_start = time.perf_counter()
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                     initializer=_init_worker, initargs=(chunk_queue,)) as pool:
+                futures = [
+                    pool.submit(chunk_textbook_file, path, source, self.chunk_size, self.chunk_overlap, metadata,
+                                self.batch_size)
+                    for path, source in files
+                ]
+                # Start the stage threads only once the worker processes have been forked
+                for thread in threads:
+                    thread.start()
+                try:
+                    self._consume_chunks(chunk_queue, futures, len(files), results, previous_ids,
+                                         encode_queue, stats, errors)
+                finally:
+                    # Workers blocked on a full queue must be drained before the pool can shut down
+                    for future in futures:
+                        future.cancel()
+                    while not all(future.done() for future in futures):
+                        try:
+                            chunk_queue.get(timeout=0.1)
+                        except queue.Empty:
+                            pass
+        finally:
+            if threads[0].is_alive():
+                encode_queue.put(self._DONE)
+            for thread in threads:
+                if thread.ident is not None:
+                    thread.join()
+
+        if errors:
+            raise errors[0]
+
+        wall_seconds = time.perf_counter() - wall_start
+        total_chunks = stats["chunk"].items
+        return {
+            "sources": results,
+            "stages": {name: stage.report() for name, stage in stats.items()},
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "wall_seconds": round(wall_seconds, 3),
+            "chunks_per_second": round(total_chunks / wall_seconds, 1) if wall_seconds else None,
+        }
+
+    def _consume_chunks(self, chunk_queue, futures, file_count: int, results: Dict[str, Dict[str, Any]],
+                        previous_ids: Dict[str, Set[str]], encode_queue: "queue.Queue",
+                        stats: Dict[str, StageStats], errors: List[Exception]):
+        """Forward chunk batches from the workers to the encoder until every file is done"""
+        remaining = file_count
+        while remaining and not errors:
+            try:
+                kind, source, payload = chunk_queue.get(timeout=0.5)
+            except queue.Empty:
+                # A worker that failed never reports its file as done
+                for future in futures:
+                    if future.done() and not future.cancelled() and future.exception() is not None:
+                        raise future.exception()
+                continue
+            result = results[source]
+            if kind == "done":
+                stats["chunk"].record(payload["chunks"], payload["seconds"])
+                result.update(mtime=payload["mtime"], sha256=payload["sha256"])
+                remaining -= 1
+                continue
+            result["ids"].extend(c["id"] for c in payload)
+            known = previous_ids.get(source, set())
+            new_chunks = [c for c in payload if c["id"] not in known]
+            result["added"] += len(new_chunks)
+            if new_chunks:
+                encode_queue.put(new_chunks)
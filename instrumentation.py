@@ -0,0 +1,302 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional
+
+# Trace collecting spans for the current request; None when nothing is being traced
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Span:
+    """One timed stage of a trace, with attributes such as token counts or cache hits"""
+
+    __slots__ = ("name", "start", "duration", "attributes")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self.start = 0.0
+        self.duration = 0.0
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append(self)
+
+
+class _NoopSpan:
+    """Returned by span() when no trace is active, so disabled tracing costs one ContextVar lookup"""
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attributes):
+    """Time a stage of the active trace: `with span("llm_call") as s: ...; s.set(cache_hit=False)`"""
+    if _current_trace.get() is None:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+
+def annotate(**attributes):
+    """Attach attributes to the active trace itself (not to a particular span)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+class Trace:
+    """Spans recorded for one traced operation; worker threads may append to the same trace"""
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self.spans: List[Span] = []
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.duration = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        """Total time plus, per stage, call count, summed milliseconds and merged attributes"""
+        stages: Dict[str, Dict[str, Any]] = {}
+        for s in self.spans:
+            stage = stages.setdefault(s.name, {"count": 0, "ms": 0.0})
+            stage["count"] += 1
+            stage["ms"] += s.duration * 1000
+            for key, value in s.attributes.items():
+                # Numbers add up across calls (tokens, hits); other values keep the latest
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and key in stage:
+                    stage[key] += value
+                else:
+                    stage[key] = value
+        for stage in stages.values():
+            stage["ms"] = round(stage["ms"], 3)
+        return {
+            "trace": self.name,
+            "total_ms": round(self.duration * 1000, 3),
+            "stages": stages,
+            **self.attributes
+        }
+
+
+class _TraceContext:
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.trace = Trace(name, attributes)
+        self._token = None
+
+    def __enter__(self) -> Trace:
+        self._token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.duration = time.perf_counter() - self.trace.start
+        if exc_type is not None:
+            self.trace.attributes["error"] = exc_type.__name__
+        try:
+            _current_trace.reset(self._token)
+        except ValueError:
+            # Exited from another context, e.g. a streaming generator closed by the garbage collector
+            _current_trace.set(None)
+        self.tracer.export(self.trace)
+
+
+class _NoopTraceContext:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NOOP_TRACE = _NoopTraceContext()
+
+
+class Tracer:
+    """
+    Starts traces and hands finished ones to the sinks. When disabled,
+    trace() yields None and every span() inside it is a no-op.
+    """
+
+    def __init__(self, sinks: Optional[List[Any]] = None, enabled: bool = True):
+        self.sinks = sinks or []
+        self.enabled = enabled
+
+    def trace(self, name: str, **attributes):
+        """`with tracer.trace("generate_new_question") as trace:` (trace is None when disabled)"""
+        if not self.enabled:
+            return _NOOP_TRACE
+        return _TraceContext(self, name, attributes)
+
+    def export(self, trace: Trace):
+        for sink in self.sinks:
+            try:
+                sink.record(trace)
+            except Exception as e:
+                # A broken sink must never fail question generation
+                print(f"Instrumentation sink {type(sink).__name__} failed: {e}")
+
+    def sink(self, kind: type):
+        """The first sink of the given class, or None"""
+        return next((s for s in self.sinks if isinstance(s, kind)), None)
+
+
+class HistogramSink:
+    """
+    In-memory latency histograms per trace and stage. Keeps cumulative bucket
+    counts plus the most recent `window` durations for percentile estimates.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window: int = 10000):
+        self.buckets = tuple(buckets)
+        self.window = window
+        self._series: Dict[tuple, Dict[str, Any]] = {}
+        self._counters: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def _observe(self, trace_name: str, stage: str, seconds: float):
+        series = self._series.get((trace_name, stage))
+        if series is None:
+            series = self._series[(trace_name, stage)] = {
+                "count": 0, "sum": 0.0, "buckets": [0] * len(self.buckets), "recent": deque(maxlen=self.window)
+            }
+        series["count"] += 1
+        series["sum"] += seconds
+        series["recent"].append(seconds)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                series["buckets"][i] += 1
+
+    def record(self, trace: Trace):
+        with self._lock:
+            self._observe(trace.name, "total", trace.duration)
+            for s in trace.spans:
+                self._observe(trace.name, s.name, s.duration)
+                for key, value in s.attributes.items():
+                    # Token counts and hit flags become counters
+                    if isinstance(value, (bool, int, float)):
+                        counter = (s.name, key)
+                        self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def stats(self) -> Dict[str, Any]:
+        """{trace: {stage: {count, mean_ms, p50_ms, p95_ms, p99_ms}}} plus summed span attributes"""
+        with self._lock:
+            result: Dict[str, Any] = {}
+            for (trace_name, stage), series in self._series.items():
+                recent = sorted(series["recent"])
+
+                def percentile(q: float) -> float:
+                    return round(recent[min(int(q * len(recent)), len(recent) - 1)] * 1000, 3)
+
+                result.setdefault(trace_name, {})[stage] = {
+                    "count": series["count"],
+                    "mean_ms": round(series["sum"] / series["count"] * 1000, 3),
+                    "p50_ms": percentile(0.5),
+                    "p95_ms": percentile(0.95),
+                    "p99_ms": percentile(0.99),
+                }
+            result["counters"] = {f"{stage}.{key}": value for (stage, key), value in self._counters.items()}
+            return result
+
+
+class PrometheusSink(HistogramSink):
+    """
+    Histogram sink rendered in the Prometheus text exposition format, e.g. for
+    a /metrics endpoint or node_exporter's textfile collector (textfile_path).
+    """
+
+    def __init__(self, prefix: str = "question_generator", textfile_path: Optional[str] = None,
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(buckets)
+        self.prefix = prefix
+        self.textfile_path = textfile_path
+
+    def record(self, trace: Trace):
+        super().record(trace)
+        if self.textfile_path:
+            # Write and rename so the collector never reads a half-written file
+            tmp_path = self.textfile_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(tmp_path, self.textfile_path)
+
+    def render(self) -> str:
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines = [f"# HELP {name} Time spent per traced stage", f"# TYPE {name} histogram"]
+        with self._lock:
+            for (trace_name, stage), series in sorted(self._series.items()):
+                labels = f'trace="{trace_name}",stage="{stage}"'
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {series["count"]}')
+                lines.append(f"{name}_sum{{{labels}}} {series['sum']:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {series['count']}")
+
+            counter = f"{self.prefix}_stage_attribute_total"
+            lines += [f"# HELP {counter} Summed numeric span attributes (tokens, cache hits)",
+                      f"# TYPE {counter} counter"]
+            for (stage, key), value in sorted(self._counters.items()):
+                lines.append(f'{counter}{{stage="{stage}",attribute="{key}"}} {float(value)}')
+        return "\n".join(lines) + "\n"
+
+
+class JSONLogSink:
+    """Appends one JSON line per finished trace (its summary) to a file"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, trace: Trace):
+        line = json.dumps(dict(trace.summary(), timestamp=trace.started_at), default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def create_sinks(names: List[str], log_path: Optional[str] = None,
+                 prometheus_path: Optional[str] = None) -> List[Any]:
+    """Sinks by name: "histogram", "json" and "prometheus" (see Config.INSTRUMENTATION_SINKS)"""
+    sinks = []
+    for name in names:
+        if name == "histogram":
+            sinks.append(HistogramSink())
+        elif name == "json":
+            sinks.append(JSONLogSink(log_path or "./logs/traces.jsonl"))
+        elif name == "prometheus":
+            sinks.append(PrometheusSink(textfile_path=prometheus_path))
+        else:
+            raise ValueError(f"Unsupported instrumentation sink: {name}")
+    return sinks
@@ -0,0 +1,196 @@
+import json
+import os
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+
+
+def default_clusters(rows: int) -> int:
+    """Rule-of-thumb cluster count for an IVF index over `rows` vectors"""
+    return max(1, min(rows, int(4 * np.sqrt(rows))))
+
+
+def kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = 20, seed: int = 0,
+           block_rows: int = 65536) -> np.ndarray:
+    """
+    Spherical k-means over normalized vectors; returns normalized centroids.
+    Assignment is done block-wise, so only block_rows x n_clusters scores are held at once.
+    """
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = np.array(vectors[rng.choice(len(vectors), n_clusters, replace=False)], dtype=np.float32)
+    for _ in range(iterations):
+        labels, scores = assign(vectors, centroids, block_rows)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        present = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[present]
+        sums[present] = np.add.reduceat(vectors[order], starts, axis=0)
+        # Empty clusters restart at the vectors their centroids fit worst
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = vectors[np.argsort(scores)[:len(empty)]]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        updated = sums / norms
+        if np.allclose(updated, centroids, atol=1e-6):
+            break
+        centroids = updated
+    return centroids.astype(np.float32)
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, block_rows: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+    """Nearest centroid and its cosine score for every vector"""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    scores = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), block_rows):
+        block = np.asarray(vectors[start:start + block_rows]) @ centroids.T
+        labels[start:start + len(block)] = block.argmax(axis=1)
+        scores[start:start + len(block)] = block.max(axis=1)
+    return labels, scores
+
+
+class IVFIndex:
+    """
+    Inverted-file index over the rows of a NumpyVectorStore.
+    k-means centroids partition the vectors; each cluster's vectors are copied
+    contiguously into a memory-mapped file (its posting list) together with the
+    store rows they came from. A query scores the centroids and then only the
+    vectors of the nprobe closest clusters, so its cost grows with
+    rows * nprobe / clusters instead of rows.
+
+    The index describes the store at one version; after the store changes it is
+    stale until rebuilt, and NumpyVectorStore falls back to an exact scan.
+    Rebuilds reuse the trained centroids until the store has grown retrain_growth
+    times past the size they were trained on.
+    """
+
+    TRAIN_PER_CLUSTER = 40  # k-means sample size per centroid; more adds build time, not recall
+
+    def __init__(self, path: str, n_clusters: Optional[int] = None, train_sample: int = 100000,
+                 iterations: int = 10, retrain_growth: float = 4.0, seed: int = 0):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.n_clusters = n_clusters
+        self.train_sample = train_sample
+        self.iterations = iterations
+        self.retrain_growth = retrain_growth
+        self.seed = seed
+        self.centroids = None
+        self.offsets = None
+        self.rows = None
+        self.vectors = None
+        self.meta: Dict[str, Any] = {}
+        self._load()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        if not os.path.exists(self._file("meta.json")):
+            return
+        with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.centroids = np.load(self._file("centroids.npy"))
+        self.offsets = np.load(self._file("offsets.npy"))
+        self.rows = np.load(self._file("rows.npy"))
+        self.vectors = None
+        if self.meta["rows"]:
+            self.vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r",
+                                     shape=(self.meta["rows"], self.meta["dim"]))
+
+    def is_current(self, version: int) -> bool:
+        """Whether the index was built from the store at this version"""
+        return self.centroids is not None and self.meta.get("version") == version
+
+    def build(self, vectors: np.ndarray, version: int, retrain: bool = False) -> Dict[str, Any]:
+        """
+        Index the normalized store vectors (rows 0..n-1) as of the given store version.
+        Centroids are trained on TRAIN_PER_CLUSTER sampled vectors per cluster, at most train_sample.
+        """
+        count, dim = len(vectors), vectors.shape[1]
+        n_clusters = min(self.n_clusters or default_clusters(count), max(count, 1))
+        trained_rows = self.meta.get("trained_rows", 0)
+        retrain = (retrain or self.centroids is None or not len(self.centroids) or self.centroids.shape[1] != dim
+                   or (self.n_clusters is not None and len(self.centroids) != n_clusters)
+                   or count > trained_rows * self.retrain_growth)
+        if retrain and count:
+            rng = np.random.default_rng(self.seed)
+            sample_size = min(count, max(min(self.train_sample, self.TRAIN_PER_CLUSTER * n_clusters), n_clusters))
+            sample = np.sort(rng.choice(count, sample_size, replace=False))
+            centroids = kmeans(np.asarray(vectors[sample]), n_clusters, self.iterations, self.seed)
+            trained_rows = count
+        elif count:
+            centroids = self.centroids
+        else:
+            centroids = np.zeros((0, dim), dtype=np.float32)
+
+        labels = assign(vectors, centroids)[0] if count else np.zeros(0, dtype=np.int32)
+        order = np.argsort(labels, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=len(centroids)))]).astype(np.int64)
+
+        # Posting lists are written next to the live files and swapped in at the end
+        self.vectors = None
+        if count:
+            posting = np.memmap(self._file("vectors.f32.tmp"), dtype=np.float32, mode="w+", shape=(count, dim))
+            for start in range(0, count, 65536):
+                block = order[start:start + 65536]
+                # Gathering in ascending row order reads the store's memory map sequentially
+                ascending = np.argsort(block)
+                posting[start + ascending] = vectors[block[ascending]]
+            posting.flush()
+            del posting
+            os.replace(self._file("vectors.f32.tmp"), self._file("vectors.f32"))
+        np.save(self._file("centroids.npy"), centroids)
+        np.save(self._file("offsets.npy"), offsets)
+        np.save(self._file("rows.npy"), order.astype(np.int64))
+        meta = {"rows": count, "dim": dim, "clusters": len(centroids), "version": version,
+                "trained_rows": trained_rows}
+        with open(self._file("meta.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(self._file("meta.json.tmp"), self._file("meta.json"))
+        self._load()
+        return dict(meta, retrained=bool(retrain and count))
+
+    def search(self, queries: np.ndarray, k: int, nprobe: int,
+               allowed: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Best k store rows and their cosine scores per normalized query, searching
+        the nprobe closest clusters. allowed is an optional boolean mask over store rows.
+        """
+        results = []
+        if self.centroids is None or not len(self.centroids):
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in queries]
+        nprobe = max(1, min(nprobe, len(self.centroids)))
+        centroid_scores = queries @ self.centroids.T
+        probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+        for query, clusters in zip(queries, probes):
+            # Each probed posting list is a contiguous slice of the memory-mapped vectors
+            spans = [(self.offsets[c], self.offsets[c + 1]) for c in clusters if self.offsets[c + 1] > self.offsets[c]]
+            if not spans:
+                results.append((np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)))
+                continue
+            scores = np.concatenate([self.vectors[start:end] @ query for start, end in spans])
+            rows = np.concatenate([self.rows[start:end] for start, end in spans])
+            if allowed is not None:
+                keep = allowed[rows]
+                scores, rows = scores[keep], rows[keep]
+            if len(rows) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                scores, rows = scores[top], rows[top]
+            order = np.argsort(-scores)
+            results.append((rows[order], scores[order]))
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        if self.centroids is None:
+            return {"built": False}
+        sizes = np.diff(self.offsets) if len(self.offsets) > 1 else np.zeros(1)
+        return {
+            "built": True,
+            "rows": self.meta["rows"],
+            "clusters": self.meta["clusters"],
+            "trained_rows": self.meta["trained_rows"],
+            "largest_cluster": int(sizes.max()),
+            "mean_cluster": round(float(sizes.mean()), 1),
+        }
@@ -0,0 +1,280 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import List, Dict, Any, Optional
+
+# Item states; a "running" item whose lease has expired (its worker died) can be claimed again
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+
+
+class JobQueue:
+    """
+    Persistent queue of batch generation jobs in SQLite.
+    A job is split into one work item per question; worker threads claim
+    items, generate them with QuestionGenerator.generate_new_question and
+    checkpoint each result as soon as it is done. A claim is a lease of
+    lease_seconds: items whose worker crashed are claimed again once it
+    expires, so several processes can share one database. Failed items are
+    retried after retry_backoff seconds, doubling per attempt up to retry_backoff_max.
+    """
+
+    def __init__(self, path: str, generator, workers: int = 4, max_attempts: int = 3,
+                 retry_backoff: float = 5.0, retry_backoff_max: float = 300.0, lease_seconds: float = 600.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.generator = generator
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self.lease_seconds = lease_seconds
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, params TEXT NOT NULL, total INTEGER NOT NULL, "
+            "created REAL NOT NULL, updated REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS items ("
+            "job_id TEXT NOT NULL, idx INTEGER NOT NULL, topic TEXT NOT NULL, batch_id TEXT NOT NULL, "
+            "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT, "
+            "updated REAL NOT NULL, not_before REAL NOT NULL DEFAULT 0, lease_expires REAL NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (job_id, idx));"
+            "CREATE INDEX IF NOT EXISTS items_status ON items(status, job_id, idx);"
+        )
+        # Queues created before retry delays and leases existed
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(items)")}
+        for column in ("not_before", "lease_expires"):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE items ADD COLUMN {column} REAL NOT NULL DEFAULT 0")
+        self._db.commit()
+
+    def submit(self,
+               topics: List[str],
+               difficulty: str = "Medium",
+               question_type: str = "Multiple Choice",
+               questions_per_topic: int = 1,
+               question_filters: Optional[Dict[str, Any]] = None,
+               textbook_filters: Optional[Dict[str, Any]] = None,
+               with_evaluation: bool = False) -> str:
+        """Queue a batch like batch_generate_questions and return its job ID"""
+        job_id = uuid.uuid4().hex
+        params = {
+            "difficulty": difficulty,
+            "question_type": question_type,
+            "question_filters": question_filters,
+            "textbook_filters": textbook_filters,
+            "with_evaluation": with_evaluation,
+        }
+        items = [(topic, f"{topic}_{i+1}") for topic in topics for i in range(questions_per_topic)]
+        now = time.time()
+        with self._lock:
+            # A job without items has nothing left to do
+            self._db.execute("INSERT INTO jobs (id, status, params, total, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                             (job_id, PENDING if items else "completed", json.dumps(params), len(items), now, now))
+            self._db.executemany(
+                "INSERT INTO items (job_id, idx, topic, batch_id, status, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                [(job_id, idx, topic, batch_id, PENDING, now) for idx, (topic, batch_id) in enumerate(items)]
+            )
+            self._db.commit()
+        self._wakeup.set()
+        return job_id
+
+    def start(self) -> "JobQueue":
+        """Start the worker threads; items a crashed worker left running are picked up when their lease expires"""
+        if self._threads:
+            return self
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """Let workers finish their current item and exit"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Lease the next due item of a job that was not cancelled: a pending one past
+        its retry delay, or a running one whose lease expired
+        """
+        with self._lock:
+            while True:
+                now = time.time()
+                row = self._db.execute(
+                    "SELECT i.job_id, i.idx, i.topic, i.batch_id, i.attempts, i.status, j.params, j.status FROM items i "
+                    "JOIN jobs j ON j.id = i.job_id "
+                    "WHERE (i.status = ? AND i.not_before <= ? AND j.status != ?) OR (i.status = ? AND i.lease_expires <= ?) "
+                    "ORDER BY j.created, i.idx LIMIT 1", (PENDING, now, CANCELLED, RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                job_id, idx, topic, batch_id, attempts, status, params, job_status = row
+                if job_status == CANCELLED:
+                    # Its worker died after the job was cancelled
+                    self._db.execute("UPDATE items SET status = ?, updated = ? WHERE job_id = ? AND idx = ?",
+                                     (CANCELLED, now, job_id, idx))
+                    self._db.commit()
+                    continue
+                if status == RUNNING and attempts >= self.max_attempts:
+                    # Its last attempt died with the worker
+                    self._db.execute("UPDATE items SET status = ?, error = ?, updated = ? WHERE job_id = ? AND idx = ?",
+                                     (FAILED, "Worker lease expired", now, job_id, idx))
+                    self._finish_job_if_done(job_id)
+                    self._db.commit()
+                    continue
+                # The status and attempts checks make the claim fail if another process got there first
+                cursor = self._db.execute(
+                    "UPDATE items SET status = ?, attempts = ?, updated = ?, lease_expires = ? "
+                    "WHERE job_id = ? AND idx = ? AND status = ? AND attempts = ?",
+                    (RUNNING, attempts + 1, now, now + self.lease_seconds, job_id, idx, status, attempts)
+                )
+                if cursor.rowcount:
+                    self._db.execute("UPDATE jobs SET status = ?, updated = ? WHERE id = ? AND status = ?",
+                                     (RUNNING, now, job_id, PENDING))
+                self._db.commit()
+                if cursor.rowcount:
+                    return {"job_id": job_id, "idx": idx, "topic": topic, "batch_id": batch_id,
+                            "attempts": attempts + 1, "params": json.loads(params)}
+
+    def retry_delay(self, attempts: int) -> float:
+        """Seconds before an item that failed its attempts-th try is due again"""
+        return min(self.retry_backoff * 2 ** (attempts - 1), self.retry_backoff_max)
+
+    def _work(self):
+        while not self._stopping.is_set():
+            item = self._claim()
+            if item is None:
+                self._wakeup.wait(0.5)
+                self._wakeup.clear()
+                continue
+            self._process(item)
+
+    def _process(self, item: Dict[str, Any]):
+        params = item["params"]
+        try:
+            question = self.generator.generate_new_question(
+                topic=item["topic"],
+                difficulty=params["difficulty"],
+                question_type=params["question_type"],
+                question_filters=params["question_filters"],
+                textbook_filters=params["textbook_filters"],
+                with_evaluation=params["with_evaluation"]
+            )
+            error = question.get("error")
+        except Exception as e:
+            question, error = None, str(e)
+
+        now = time.time()
+        not_before = 0.0
+        if error is None:
+            question["batch_id"] = item["batch_id"]
+            status = DONE
+        else:
+            # Retry after a delay unless the attempts are used up; the last failed result is kept
+            status = PENDING if item["attempts"] < self.max_attempts else FAILED
+            not_before = now + self.retry_delay(item["attempts"])
+        with self._lock:
+            if status == PENDING:
+                # A job cancelled during the attempt is not retried
+                job = self._db.execute("SELECT status FROM jobs WHERE id = ?", (item["job_id"],)).fetchone()
+                if job is not None and job[0] == CANCELLED:
+                    status = CANCELLED
+            # Skipped if the lease expired and another worker has claimed the item since
+            self._db.execute("UPDATE items SET status = ?, result = ?, error = ?, updated = ?, not_before = ? "
+                             "WHERE job_id = ? AND idx = ? AND status = ? AND attempts = ?",
+                             (status, json.dumps(question, default=str) if question is not None else None, error,
+                              now, not_before, item["job_id"], item["idx"], RUNNING, item["attempts"]))
+            self._finish_job_if_done(item["job_id"])
+            self._db.commit()
+
+    def _finish_job_if_done(self, job_id: str):
+        counts = dict(self._db.execute("SELECT status, COUNT(*) FROM items WHERE job_id = ? GROUP BY status",
+                                       (job_id,)).fetchall())
+        if counts.get(PENDING) or counts.get(RUNNING):
+            return
+        status = "completed_with_errors" if counts.get(FAILED) else "completed"
+        self._db.execute("UPDATE jobs SET status = ?, updated = ? WHERE id = ? AND status != ?",
+                         (status, time.time(), job_id, CANCELLED))
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop the job's pending items; items already running still finish, but are not retried"""
+        with self._lock:
+            cursor = self._db.execute("UPDATE jobs SET status = ?, updated = ? WHERE id = ?",
+                                      (CANCELLED, time.time(), job_id))
+            self._db.execute("UPDATE items SET status = ?, updated = ? WHERE job_id = ? AND status = ?",
+                             (CANCELLED, time.time(), job_id, PENDING))
+            self._db.commit()
+        return cursor.rowcount > 0
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Progress of a job, or None if the ID is unknown"""
+        with self._lock:
+            job = self._db.execute("SELECT status, params, total, created, updated FROM jobs WHERE id = ?",
+                                   (job_id,)).fetchone()
+            if job is None:
+                return None
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM items WHERE job_id = ? GROUP BY status",
+                                           (job_id,)).fetchall())
+        status, params, total, created, updated = job
+        finished = counts.get(DONE, 0) + counts.get(FAILED, 0)
+        return {
+            "job_id": job_id,
+            "status": status,
+            "total": total,
+            "done": counts.get(DONE, 0),
+            "failed": counts.get(FAILED, 0),
+            "pending": counts.get(PENDING, 0),
+            "running": counts.get(RUNNING, 0),
+            "cancelled": counts.get(CANCELLED, 0),
+            "progress": finished / total if total else 1.0,
+            "params": json.loads(params),
+            "created": created,
+            "updated": updated,
+        }
+
+    def results(self, job_id: str, include_failed: bool = False) -> List[Dict[str, Any]]:
+        """Questions finished so far, in submission order"""
+        statuses = (DONE, FAILED) if include_failed else (DONE,)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT result FROM items WHERE job_id = ? AND status IN ({','.join('?' * len(statuses))}) "
+                "AND result IS NOT NULL ORDER BY idx", (job_id, *statuses)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def list_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            ids = [row[0] for row in self._db.execute("SELECT id FROM jobs ORDER BY created DESC LIMIT ?", (limit,))]
+        return [self.status(job_id) for job_id in ids]
+
+    def wait(self, job_id: str, timeout: Optional[float] = None, poll_interval: float = 0.2) -> Dict[str, Any]:
+        """Block until the job has no pending or running items (or the timeout passes); returns its status"""
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            status = self.status(job_id)
+            if status is None or status["pending"] + status["running"] == 0:
+                return status
+            if deadline is not None and time.time() >= deadline:
+                return status
+            time.sleep(poll_interval)
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,236 @@
+import json
+import threading
+import time
+from typing import List, Dict, Any, Optional, Iterator, Tuple, TYPE_CHECKING
+from llm_stub_server import stub_completion_text
+
+# httpx and the openai SDK are imported when a backend that needs them is created
+if TYPE_CHECKING:
+    import httpx
+
+# Token usage reported for one completion: {"prompt_tokens": n, "completion_tokens": n}, or None when unknown
+Usage = Optional[Dict[str, int]]
+
+
+class TransientBackendError(Exception):
+    """Rate limit, 5xx response or dropped connection from a backend; worth retrying"""
+
+    def __init__(self, message: str, response: Optional["httpx.Response"] = None):
+        super().__init__(message)
+        # Kept so the caller can honour Retry-After
+        self.response = response
+
+
+class LLMBackend:
+    """
+    Chat-completion transport used by LLMIntegration.
+    complete() returns the reply text and its token usage; stream() yields the
+    reply in pieces as they arrive. Transient failures raise TransientBackendError
+    so LLMIntegration can retry them.
+    """
+
+    name = "base"
+
+    def complete(self, model: str, messages: List[Dict[str, str]], max_tokens: int, temperature: float,
+                 timeout: float, seed: Optional[int] = None) -> Tuple[str, Usage]:
+        raise NotImplementedError
+
+    def stream(self, model: str, messages: List[Dict[str, str]], max_tokens: int, temperature: float,
+               timeout: float, seed: Optional[int] = None) -> Iterator[str]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class OpenAIBackend(LLMBackend):
+    """The openai SDK, against the OpenAI API or any compatible base_url, over a keep-alive connection pool"""
+
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str], base_url: Optional[str] = None, timeout: float = 60.0,
+                 pool_size: int = 16):
+        import httpx
+        import openai
+        
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        # Retries are handled in LLMIntegration so they can use jittered backoff
+        self.client = openai.OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=0,
+            http_client=httpx.Client(limits=limits, timeout=timeout)
+        )
+        # Rate limits, timeouts, dropped connections and 5xx responses become TransientBackendError
+        self.transient_errors = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+    def _transient(self, error: Exception) -> TransientBackendError:
+        return TransientBackendError(str(error), getattr(error, "response", None))
+
+    def complete(self, model, messages, max_tokens, temperature, timeout, seed=None):
+        extra = {"seed": seed} if seed is not None else {}
+        try:
+            response = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                timeout=timeout,
+                **extra
+            )
+        except self.transient_errors as e:
+            raise self._transient(e) from e
+        usage = response.usage
+        return response.choices[0].message.content, {
+            "prompt_tokens": usage.prompt_tokens or 0,
+            "completion_tokens": usage.completion_tokens or 0
+        } if usage is not None else None
+
+    def stream(self, model, messages, max_tokens, temperature, timeout, seed=None):
+        extra = {"seed": seed} if seed is not None else {}
+        try:
+            stream = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                timeout=timeout,
+                stream=True,
+                **extra
+            )
+            for chunk in stream:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    yield text
+        except self.transient_errors as e:
+            raise self._transient(e) from e
+
+    def close(self):
+        self.client.close()
+
+
+class HTTPBackend(LLMBackend):
+    """
+    Plain HTTP client for OpenAI-compatible servers on our own hosts
+    (llama.cpp server, vLLM, ...). Needs no openai SDK features or API key and
+    keeps a pool of keep-alive connections shared by all worker threads.
+    """
+
+    name = "http"
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, timeout: float = 60.0, pool_size: int = 16):
+        if not base_url:
+            raise ValueError("The http LLM backend needs a base URL (LLM_BASE_URL)")
+        import httpx
+        
+        self.transport_error = httpx.TransportError
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.Client(
+            base_url=base_url.rstrip("/") + "/",
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+
+    def _payload(self, model, messages, max_tokens, temperature, seed, stream=False) -> Dict[str, Any]:
+        payload = {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+        if seed is not None:
+            payload["seed"] = seed
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def _check(self, response: "httpx.Response"):
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransientBackendError(f"LLM server returned HTTP {response.status_code}", response)
+        if response.status_code >= 400:
+            response.read()
+            raise RuntimeError(f"LLM server returned HTTP {response.status_code}: {response.text[:200]}")
+
+    def complete(self, model, messages, max_tokens, temperature, timeout, seed=None):
+        try:
+            response = self.client.post("chat/completions", timeout=timeout,
+                                        json=self._payload(model, messages, max_tokens, temperature, seed))
+        except self.transport_error as e:
+            raise TransientBackendError(f"Connection to LLM server failed: {e}") from e
+        self._check(response)
+        body = response.json()
+        usage = body.get("usage")
+        return body["choices"][0]["message"]["content"], {
+            "prompt_tokens": usage.get("prompt_tokens") or 0,
+            "completion_tokens": usage.get("completion_tokens") or 0
+        } if usage else None
+
+    def stream(self, model, messages, max_tokens, temperature, timeout, seed=None):
+        payload = self._payload(model, messages, max_tokens, temperature, seed, stream=True)
+        try:
+            with self.client.stream("POST", "chat/completions", json=payload, timeout=timeout) as response:
+                self._check(response)
+                # Server-sent events: one "data: {chunk}" line per piece, ending with "data: [DONE]"
+                for line in response.iter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or [{}]
+                    text = choices[0].get("delta", {}).get("content")
+                    if text:
+                        yield text
+        except self.transport_error as e:
+            raise TransientBackendError(f"Connection to LLM server failed: {e}") from e
+
+    def close(self):
+        self.client.close()
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic in-process backend with the same replies as StubLLMServer.
+    For benchmarks and offline runs: no sockets, optional simulated latency.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency: float = 0.0, chunk_chars: int = 8):
+        self.latency = latency
+        self.chunk_chars = chunk_chars
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    def _reply(self, messages: List[Dict[str, str]]) -> str:
+        with self._lock:
+            self.request_count += 1
+        return stub_completion_text(messages)
+
+    def complete(self, model, messages, max_tokens, temperature, timeout, seed=None):
+        content = self._reply(messages)
+        time.sleep(self.latency)
+        return content, {
+            "prompt_tokens": sum(len(m.get("content", "").split()) for m in messages),
+            "completion_tokens": len(content.split())
+        }
+
+    def stream(self, model, messages, max_tokens, temperature, timeout, seed=None):
+        content = self._reply(messages)
+        pieces = [content[i:i + self.chunk_chars] for i in range(0, len(content), self.chunk_chars)]
+        for piece in pieces:
+            time.sleep(self.latency / len(pieces))
+            yield piece
+
+
+def create_backend(name: str,
+                   api_key: Optional[str] = None,
+                   base_url: Optional[str] = None,
+                   timeout: float = 60.0,
+                   pool_size: int = 16,
+                   stub_latency: float = 0.0) -> LLMBackend:
+    """Backend by name: "openai", "http" or "stub" (see Config.LLM_BACKEND)"""
+    if name == "openai":
+        return OpenAIBackend(api_key, base_url, timeout, pool_size)
+    if name == "http":
+        return HTTPBackend(base_url, api_key, timeout, pool_size)
+    if name == "stub":
+        return StubBackend(stub_latency)
+    raise ValueError(f"Unsupported LLM backend: {name}")
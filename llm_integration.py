@@ -1,11 +1,187 @@
-import openai
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Union
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 import json
+import random
+import threading
+import time
+from prompt_builder import PromptBuilder, merge_chunks
+from llm_cache import LLMCache, request_key
+from output_parser import parse_structured_output, GENERATE_AND_EVALUATE_SCHEMA
+from incremental_json import IncrementalJSONParser
+from llm_backends import LLMBackend, TransientBackendError, create_backend
+from instrumentation import span
+
+# Errors worth retrying: rate limits, timeouts, dropped connections and 5xx responses.
+# Backends translate their client's errors (e.g. the openai SDK's) into TransientBackendError.
+RETRYABLE_ERRORS = (TransientBackendError,)
+
+GENERATION_SYSTEM_PROMPT = "You are an expert educational content creator specializing in question generation."
+
+# Additions to the generation prompt when the question and its evaluation come back in one response
+SELF_ASSESSMENT_REQUIREMENT = """
+7. SELF-ASSESSMENT: then critically rate your own question from 1-10 (integers) on clarity, difficulty appropriateness, educational value, answer accuracy and overall quality, with brief feedback for improvement"""
+SELF_ASSESSMENT_FORMAT = """,
+    "evaluation": {
+        "clarity": score,
+        "difficulty": score,
+        "educational_value": score,
+        "accuracy": score,
+        "overall": score,
+        "feedback": "Brief feedback here"
+    }"""
+
+def avoid_requirement(avoid_questions: Optional[List[str]]) -> str:
+    """Prompt addition listing earlier attempts rejected as near-duplicates"""
+    if not avoid_questions:
+        return ""
+    listed = "".join(f"\n   - {question}" for question in avoid_questions)
+    return ("\nAVOID: earlier attempts were too close to existing questions. "
+            f"Do not repeat or paraphrase any of these:{listed}")
 
 class LLMIntegration:
-    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo"):
-        openai.api_key = api_key
+    def __init__(self,
+                 api_key: str,
+                 model: str = "gpt-3.5-turbo",
+                 base_url: Optional[str] = None,
+                 timeout: float = 60.0,
+                 max_retries: int = 3,
+                 max_concurrency: int = 8,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 30.0,
+                 prompt_token_budget: int = 2000,
+                 prompt_question_share: float = 0.3,
+                 seed: Optional[int] = None,
+                 cache_path: Optional[str] = None,
+                 cache_max_entries: int = 10000,
+                 cache_ttl: float = 7 * 24 * 3600,
+                 cache_deterministic_only: bool = True,
+                 backend: Union[str, LLMBackend] = "openai",
+                 pool_size: int = 16,
+                 stub_latency: float = 0.0):
+        self.api_key = api_key
         self.model = model
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # "openai", "http" or "stub" (see llm_backends.create_backend), or a ready LLMBackend
+        self._backend = backend if isinstance(backend, LLMBackend) else None
+        self.backend_name = backend.name if isinstance(backend, LLMBackend) else backend
+        self.pool_size = pool_size
+        self.stub_latency = stub_latency
+        self._backend_lock = threading.Lock()
+        self.prompt_builder = PromptBuilder(model, prompt_token_budget, prompt_question_share)
+        self.seed = seed
+        # Completed responses are reused for identical requests when a cache path is set
+        self.response_cache = LLMCache(cache_path, cache_max_entries, cache_ttl,
+                                       cache_deterministic_only) if cache_path else None
+        self.usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self._usage_lock = threading.Lock()
+    
+    @property
+    def backend(self) -> LLMBackend:
+        """Chat-completion backend, created on first use and shared by all worker threads"""
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = create_backend(self.backend_name, self.api_key, self.base_url,
+                                                   self.timeout, self.pool_size, self.stub_latency)
+        return self._backend
+    
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After when the server sends it"""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+    
+    def _chat_completion(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> str:
+        """
+        Run one chat completion with a per-request timeout and retries on transient errors.
+        Identical requests are answered from the response cache when one is configured.
+        """
+        cache_key = None
+        if self.response_cache is not None and self.response_cache.cacheable(temperature, self.seed):
+            cache_key = request_key(self.model, messages, temperature, max_tokens, self.seed)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                with span("llm_call", cache_hits=1):
+                    return cached
+        
+        with span("llm_call", cache_hits=0) as stage:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    content, usage = self.backend.complete(self.model, messages, max_tokens, temperature,
+                                                           self.timeout, self.seed)
+                    content = content.strip()
+                    self._record_usage(usage)
+                    stage.set(attempts=attempt + 1, **(usage or {}))
+                    if cache_key is not None:
+                        self.response_cache.put(cache_key, self.model, content)
+                    return content
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.max_retries:
+                        raise
+                    time.sleep(self._backoff_delay(attempt, e))
+    
+    def _chat_completion_stream(self, messages: List[Dict[str, str]], max_tokens: int,
+                                temperature: float) -> Iterator[str]:
+        """
+        Stream one chat completion as text pieces.
+        Transient errors are retried only until the first piece has arrived;
+        a cached response is yielded in one piece.
+        """
+        cache_key = None
+        if self.response_cache is not None and self.response_cache.cacheable(temperature, self.seed):
+            cache_key = request_key(self.model, messages, temperature, max_tokens, self.seed)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                with span("llm_call", cache_hits=1, streamed=True):
+                    yield cached
+                return
+        
+        received = []
+        started = time.perf_counter()
+        with span("llm_call", cache_hits=0, streamed=True) as stage:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    for text in self.backend.stream(self.model, messages, max_tokens, temperature,
+                                                    self.timeout, self.seed):
+                        if not received:
+                            stage.set(first_token_ms=round((time.perf_counter() - started) * 1000, 3))
+                        received.append(text)
+                        yield text
+                    break
+                except RETRYABLE_ERRORS as e:
+                    if received or attempt == self.max_retries:
+                        raise
+                    time.sleep(self._backoff_delay(attempt, e))
+            stage.set(attempts=attempt + 1)
+        
+        # Streamed responses carry no usage block, so only the request is counted
+        self._record_usage(None)
+        if cache_key is not None:
+            self.response_cache.put(cache_key, self.model, "".join(received).strip())
+    
+    def _record_usage(self, usage: Optional[Dict[str, int]]):
+        """Add a response's token usage to the running totals"""
+        with self._usage_lock:
+            self.usage["requests"] += 1
+            if usage is not None:
+                self.usage["prompt_tokens"] += usage["prompt_tokens"]
+                self.usage["completion_tokens"] += usage["completion_tokens"]
+    
+    def usage_stats(self) -> Dict[str, int]:
+        """API requests made and tokens billed so far (cache hits are not counted)"""
+        with self._usage_lock:
+            return dict(self.usage)
     
     def generate_question_prompt(self, 
                                topic: str,
@@ -14,27 +190,54 @@ class LLMIntegration:
                                difficulty: str = "Medium",
                                question_type: str = "Multiple Choice") -> str:
         """Create a comprehensive prompt for question generation"""
+        return self.build_question_prompt(topic, similar_questions, textbook_content, difficulty, question_type)[0]
+    
+    def build_question_prompt(self,
+                              topic: str,
+                              similar_questions: List[Dict[str, Any]],
+                              textbook_content: List[Dict[str, Any]],
+                              difficulty: str = "Medium",
+                              question_type: str = "Multiple Choice",
+                              with_evaluation: bool = False,
+                              avoid_questions: Optional[List[str]] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        Assemble the generation prompt within the prompt token budget.
+        Similar questions may use up to prompt_question_share of the context
+        budget and textbook content the rest; overlapping textbook chunks are
+        merged first. with_evaluation also asks for a self-assessment in the
+        same response; avoid_questions lists earlier attempts rejected as
+        near-duplicates. Returns the prompt and the tokens used per section.
+        """
+        with span("prompt_build") as stage:
+            prompt, report = self._assemble_prompt(topic, similar_questions, textbook_content, difficulty,
+                                                   question_type, with_evaluation, avoid_questions)
+            stage.set(prompt_tokens=report["total"], textbook_chunks_merged=report["textbook_chunks_merged"])
+        return prompt, report
+    
+    def _assemble_prompt(self,
+                         topic: str,
+                         similar_questions: List[Dict[str, Any]],
+                         textbook_content: List[Dict[str, Any]],
+                         difficulty: str,
+                         question_type: str,
+                         with_evaluation: bool,
+                         avoid_questions: Optional[List[str]] = None) -> Tuple[str, Dict[str, Any]]:
+        builder = self.prompt_builder
+        counter = builder.counter
         
-        prompt = f"""You are an expert question generator. Your task is to create a new, unique {question_type.lower()} question about {topic} at {difficulty.lower()} difficulty level.
+        header = f"""You are an expert question generator. Your task is to create a new, unique {question_type.lower()} question about {topic} at {difficulty.lower()} difficulty level.
 
 CONTEXT FROM SIMILAR QUESTIONS:
 """
-        
-        for i, q in enumerate(similar_questions[:3], 1):
-            prompt += f"\n{i}. Question: {q['question']}\n   Answer: {q['answer']}\n   Topic: {q['topic']}\n"
-        
-        prompt += "\nRELEVANT TEXTBOOK CONTENT:\n"
-        for i, content in enumerate(textbook_content, 1):
-            prompt += f"\n{i}. {content['content'][:300]}...\n"
-        
-        prompt += f"""
+        middle = "\nRELEVANT TEXTBOOK CONTENT:\n"
+        footer = f"""
 REQUIREMENTS:
 1. Create a NEW question that is similar in style but different in content from the examples above
 2. The question should be at {difficulty.lower()} difficulty level
 3. Base the question on the textbook content provided
 4. Make it a {question_type.lower()} question
 5. Ensure the question tests understanding, not just memorization
-6. Provide a clear, accurate answer
+6. Provide a clear, accurate answer{SELF_ASSESSMENT_REQUIREMENT if with_evaluation else ""}{avoid_requirement(avoid_questions)}
 
 OUTPUT FORMAT:
 {{
@@ -44,12 +247,79 @@ OUTPUT FORMAT:
     "explanation": "Detailed explanation of why this is the correct answer",
     "topic": "{topic}",
     "difficulty": "{difficulty}",
-    "question_type": "{question_type}"
+    "question_type": "{question_type}"{SELF_ASSESSMENT_FORMAT if with_evaluation else ""}
 }}
 
 Generate the question now:"""
         
-        return prompt
+        system_tokens = counter.count_messages([{"role": "system", "content": GENERATION_SYSTEM_PROMPT},
+                                                {"role": "user", "content": ""}])
+        instruction_tokens = counter.count(header + middle + footer)
+        available = max(builder.token_budget - system_tokens - instruction_tokens, 0)
+        
+        question_entries, question_tokens = builder.pack(
+            similar_questions,
+            lambda i, q: f"\n{i}. Question: {q['question']}\n   Answer: {q['answer']}\n   Topic: {q['topic']}\n",
+            int(available * builder.question_share)
+        )
+        chunks = merge_chunks(textbook_content)
+        textbook_entries, textbook_tokens = builder.pack(
+            chunks,
+            lambda i, c: f"\n{i}. {c['content']}\n",
+            available - question_tokens,
+            truncate_last=True,
+            truncate_item=builder.truncate_chunk
+        )
+        
+        prompt = header + "".join(question_entries) + middle + "".join(textbook_entries) + footer
+        report = {
+            "budget": builder.token_budget,
+            "system": system_tokens,
+            "instructions": instruction_tokens,
+            "similar_questions": question_tokens,
+            "textbook": textbook_tokens,
+            "total": system_tokens + counter.count(prompt),
+            "similar_questions_used": len(question_entries),
+            "textbook_chunks_used": len(textbook_entries),
+            "textbook_chunks_merged": len(textbook_content) - len(chunks),
+            "exact_counts": counter.exact
+        }
+        return prompt, report
+    
+    def _parse_generated(self,
+                         generated_content: str,
+                         topic: str,
+                         difficulty: str,
+                         question_type: str,
+                         with_evaluation: bool = False) -> Dict[str, Any]:
+        """
+        Turn a generation response into a question dict, keeping the raw text when it is not JSON.
+        Combined responses are validated against GENERATE_AND_EVALUATE_SCHEMA.
+        """
+        raw = {
+            "question": generated_content,
+            "raw_response": True,
+            "topic": topic,
+            "difficulty": difficulty,
+            "question_type": question_type
+        }
+        if not with_evaluation:
+            # Try to parse JSON response
+            try:
+                return json.loads(generated_content)
+            except json.JSONDecodeError:
+                # If JSON parsing fails, return raw content
+                return raw
+        
+        question_data, errors = parse_structured_output(generated_content, GENERATE_AND_EVALUATE_SCHEMA)
+        if question_data is None or not isinstance(question_data, dict):
+            question_data = raw
+        if errors:
+            question_data["validation_errors"] = errors
+        if not isinstance(question_data.get("evaluation"), dict):
+            question_data["evaluation"] = {"error": "Response did not include a valid self-assessment"}
+        question_data["evaluation"]["source"] = "self"
+        return question_data
     
     def generate_question(self, 
                          topic: str,
@@ -58,47 +328,135 @@ Generate the question now:"""
                          difficulty: str = "Medium",
                          question_type: str = "Multiple Choice",
                          max_tokens: int = 500,
-                         temperature: float = 0.7) -> Dict[str, Any]:
+                         temperature: float = 0.7,
+                         avoid_questions: Optional[List[str]] = None) -> Dict[str, Any]:
         """Generate a new question using the LLM"""
         
-        prompt = self.generate_question_prompt(
-            topic, similar_questions, textbook_content, difficulty, question_type
+        prompt, prompt_tokens = self.build_question_prompt(
+            topic, similar_questions, textbook_content, difficulty, question_type,
+            avoid_questions=avoid_questions
         )
         
         try:
-            response = openai.ChatCompletion.create(
-                model=self.model,
+            generated_content = self._chat_completion(
                 messages=[
-                    {"role": "system", "content": "You are an expert educational content creator specializing in question generation."},
+                    {"role": "system", "content": GENERATION_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=max_tokens,
                 temperature=temperature
             )
             
-            generated_content = response.choices[0].message.content.strip()
+            with span("json_parse"):
+                question_data = self._parse_generated(generated_content, topic, difficulty, question_type)
+                
+        except Exception as e:
+            question_data = {
+                "error": f"Failed to generate question: {str(e)}",
+                "topic": topic,
+                "difficulty": difficulty,
+                "question_type": question_type
+            }
+        
+        if isinstance(question_data, dict):
+            question_data["prompt_tokens"] = prompt_tokens
+        return question_data
+    
+    def generate_and_evaluate_question(self,
+                                       topic: str,
+                                       similar_questions: List[Dict[str, Any]],
+                                       textbook_content: List[Dict[str, Any]],
+                                       difficulty: str = "Medium",
+                                       question_type: str = "Multiple Choice",
+                                       max_tokens: int = 500,
+                                       temperature: float = 0.7,
+                                       evaluation_max_tokens: int = 300,
+                                       avoid_questions: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Generate a question and its self-assessment in a single LLM call.
+        The response is validated against GENERATE_AND_EVALUATE_SCHEMA; the
+        assessment is returned under "evaluation" like evaluate_question_quality's result.
+        """
+        prompt, prompt_tokens = self.build_question_prompt(
+            topic, similar_questions, textbook_content, difficulty, question_type, with_evaluation=True,
+            avoid_questions=avoid_questions
+        )
+        
+        try:
+            generated_content = self._chat_completion(
+                messages=[
+                    {"role": "system", "content": GENERATION_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens + evaluation_max_tokens,
+                temperature=temperature
+            )
             
-            # Try to parse JSON response
-            try:
-                question_data = json.loads(generated_content)
-                return question_data
-            except json.JSONDecodeError:
-                # If JSON parsing fails, return raw content
-                return {
-                    "question": generated_content,
-                    "raw_response": True,
-                    "topic": topic,
-                    "difficulty": difficulty,
-                    "question_type": question_type
-                }
+            with span("json_parse"):
+                question_data = self._parse_generated(generated_content, topic, difficulty, question_type,
+                                                      with_evaluation=True)
                 
         except Exception as e:
-            return {
+            question_data = {
+                "error": f"Failed to generate question: {str(e)}",
+                "topic": topic,
+                "difficulty": difficulty,
+                "question_type": question_type
+            }
+        
+        question_data["prompt_tokens"] = prompt_tokens
+        return question_data
+    
+    def generate_question_stream(self,
+                                 topic: str,
+                                 similar_questions: List[Dict[str, Any]],
+                                 textbook_content: List[Dict[str, Any]],
+                                 difficulty: str = "Medium",
+                                 question_type: str = "Multiple Choice",
+                                 max_tokens: int = 500,
+                                 temperature: float = 0.7,
+                                 with_evaluation: bool = False,
+                                 evaluation_max_tokens: int = 300) -> Iterator[Dict[str, Any]]:
+        """
+        Generate a question, yielding progress as the response streams in:
+        {"type": "token", "text": ...} for each received piece, the
+        IncrementalJSONParser events ("partial"/"field"/"item") as fields and
+        options complete, and finally {"type": "done", "question": ...} with
+        the dict generate_question (or generate_and_evaluate_question) would return.
+        """
+        prompt, prompt_tokens = self.build_question_prompt(
+            topic, similar_questions, textbook_content, difficulty, question_type, with_evaluation=with_evaluation
+        )
+        parser = IncrementalJSONParser()
+        pieces = []
+        
+        try:
+            for text in self._chat_completion_stream(
+                messages=[
+                    {"role": "system", "content": GENERATION_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens + (evaluation_max_tokens if with_evaluation else 0),
+                temperature=temperature
+            ):
+                pieces.append(text)
+                yield {"type": "token", "text": text}
+                yield from parser.feed(text)
+            
+            with span("json_parse"):
+                question_data = self._parse_generated("".join(pieces).strip(), topic, difficulty, question_type,
+                                                      with_evaluation=with_evaluation)
+        
+        except Exception as e:
+            question_data = {
                 "error": f"Failed to generate question: {str(e)}",
                 "topic": topic,
                 "difficulty": difficulty,
                 "question_type": question_type
             }
+        
+        question_data["prompt_tokens"] = prompt_tokens
+        yield {"type": "done", "question": question_data}
     
     def evaluate_question_quality(self, question_data: Dict[str, Any]) -> Dict[str, Any]:
         """Evaluate the quality of a generated question"""
@@ -131,8 +489,7 @@ Format your response as JSON:
 """
         
         try:
-            response = openai.ChatCompletion.create(
-                model=self.model,
+            evaluation_content = self._chat_completion(
                 messages=[
                     {"role": "system", "content": "You are an educational assessment expert."},
                     {"role": "user", "content": evaluation_prompt}
@@ -140,9 +497,39 @@ Format your response as JSON:
                 max_tokens=300,
                 temperature=0.3
             )
-            
-            evaluation_content = response.choices[0].message.content.strip()
             return json.loads(evaluation_content)
             
         except Exception as e:
-            return {"error": f"Failed to evaluate question: {str(e)}"}
\ No newline at end of file
+            return {"error": f"Failed to evaluate question: {str(e)}"}
+    
+    def _run_concurrently(self, func, items: List[Any], max_concurrency: Optional[int] = None) -> List[Any]:
+        """Apply func to every item on a bounded thread pool, returning results in input order"""
+        if not items:
+            return []
+        workers = min(max_concurrency or self.max_concurrency, len(items))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Each task runs in its own copy of the caller's context so its spans join the active trace
+            contexts = [contextvars.copy_context() for _ in items]
+            return list(pool.map(lambda context, item: context.run(func, item), contexts, items))
+    
+    def generate_questions_concurrently(self,
+                                        requests: List[Dict[str, Any]],
+                                        max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Run several generate_question calls in parallel.
+        Each request holds the keyword arguments for generate_question.
+        """
+        return self._run_concurrently(lambda kwargs: self.generate_question(**kwargs), requests, max_concurrency)
+    
+    def generate_and_evaluate_concurrently(self,
+                                           requests: List[Dict[str, Any]],
+                                           max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Run several generate_and_evaluate_question calls in parallel"""
+        return self._run_concurrently(lambda kwargs: self.generate_and_evaluate_question(**kwargs),
+                                      requests, max_concurrency)
+    
+    def evaluate_questions_concurrently(self,
+                                        questions: List[Dict[str, Any]],
+                                        max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Run evaluate_question_quality for several questions in parallel"""
+        return self._run_concurrently(self.evaluate_question_quality, questions, max_concurrency)
\ No newline at end of file
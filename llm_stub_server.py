@@ -0,0 +1,222 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+
+
+# Question stems for stub replies; {a} and {b} are terms taken from the prompt's textbook content
+STUB_TEMPLATES = [
+    "How does {a} influence {b} in {topic}?",
+    "Which statement best explains the role of {a} in {topic}?",
+    "What would happen to {b} if {a} were removed?",
+    "Why is {a} important when studying {topic}?",
+    "Which example shows {a} and {b} working together?",
+    "What is the main difference between {a} and {b}?",
+    "In {topic}, what evidence supports the link between {a} and {b}?",
+    "Which of these is a consequence of {a}?",
+]
+# Used when the prompt carries too little textbook content to draw terms from
+STUB_TERMS = ["energy", "structure", "balance", "pressure", "growth", "signal", "cycle", "boundary",
+              "transfer", "pattern", "storage", "feedback", "surface", "density", "network", "rhythm"]
+
+
+def _stub_question(prompt: str, seed: int) -> Dict[str, Any]:
+    """
+    A multiple-choice question about the prompt's topic, built from terms in its
+    textbook content. Different prompts give different wording, so stub runs do
+    not trip the near-duplicate gate the way one canned question would.
+    """
+    topic_match = re.search(r"question about (.+?) at (\w+) difficulty", prompt)
+    topic = topic_match.group(1) if topic_match else "stub"
+    context = prompt.split("RELEVANT TEXTBOOK CONTENT:", 1)[-1].split("REQUIREMENTS:", 1)[0]
+    terms = list(dict.fromkeys(re.findall(r"[a-z]{5,}", context.lower())))
+    terms += [term for term in STUB_TERMS if term not in terms]
+    rng = random.Random(seed)
+    a, b, *distractors = rng.sample(terms, 5)
+    answer = seed % 4
+    choices = distractors[:answer] + [a] + distractors[answer:]
+    return {
+        "question": rng.choice(STUB_TEMPLATES).format(a=a, b=b, topic=topic),
+        "options": [f"{letter}) {choice}" for letter, choice in zip("ABCD", choices)],
+        "correct_answer": "ABCD"[answer],
+        "explanation": f"Stub explanation: {a} is the term the question is about.",
+        "topic": topic,
+        "difficulty": topic_match.group(2).capitalize() if topic_match else "Medium",
+        "question_type": "Multiple Choice"
+    }
+
+
+def stub_completion_text(messages: List[Dict[str, str]]) -> str:
+    """Deterministic reply for a chat conversation: an evaluation, a generated question, or both"""
+    prompt = messages[-1]["content"] if messages else ""
+    seed = int(hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8], 16)
+
+    evaluation = {
+        "clarity": 6 + seed % 4,
+        "difficulty": 5 + seed % 5,
+        "educational_value": 6 + seed % 4,
+        "accuracy": 7 + seed % 3,
+        "overall": 6 + seed % 4,
+        "feedback": "Stub evaluation."
+    }
+    if prompt.startswith("Evaluate the quality"):
+        return json.dumps(evaluation)
+
+    question = _stub_question(prompt, seed)
+    # Combined generate-and-evaluate prompts ask for a self-assessment in the same reply
+    if "SELF-ASSESSMENT" in prompt:
+        question["evaluation"] = evaluation
+    return json.dumps(question)
+
+
+class _ChatCompletionsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        with server.lock:
+            server.request_count += 1
+            count = server.request_count
+        if server.rate_limit_every and count % server.rate_limit_every == 0:
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit"}},
+                            headers={"retry-after": "0"})
+            return
+
+        content = stub_completion_text(request.get("messages", []))
+        if request.get("stream"):
+            self._stream_completion(request, content, count)
+            return
+
+        time.sleep(server.latency)
+        prompt_tokens = sum(len(m.get("content", "").split()) for m in request.get("messages", []))
+        completion_tokens = len(content.split())
+        self._send_json(200, {
+            "id": f"chatcmpl-stub-{count}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+
+    def _stream_completion(self, request: Dict[str, Any], content: str, count: int):
+        """Send the reply as server-sent chat.completion.chunk events, spreading the latency over the pieces"""
+        pieces = [content[i:i + 8] for i in range(0, len(content), 8)] or [""]
+        delay = self.server.latency / len(pieces)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(delta: Dict[str, str], finish_reason: Optional[str] = None):
+            chunk = {
+                "id": f"chatcmpl-stub-{count}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        send({"role": "assistant", "content": ""})
+        for piece in pieces:
+            time.sleep(delay)
+            send({"content": piece})
+        send({}, finish_reason="stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class StubLLMServer:
+    """
+    Local HTTP server that mimics the OpenAI chat-completions endpoint.
+    Useful for exercising concurrency, timeouts and retries without network access:
+
+        with StubLLMServer(latency=0.5, rate_limit_every=5) as server:
+            llm = LLMIntegration(api_key="stub", base_url=server.base_url)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, rate_limit_every: int = 0):
+        self.httpd = ThreadingHTTPServer((host, port), _ChatCompletionsHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.rate_limit_every = rate_limit_every
+        self.httpd.request_count = 0
+        self.httpd.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def request_count(self) -> int:
+        return self.httpd.request_count
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "StubLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a stub chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with HTTP 429")
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, args.latency, args.rate_limit_every)
+    print(f"Stub LLM server listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
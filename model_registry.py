@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+
+def get_rss_bytes() -> int:
+    """Return the resident set size of the current process in bytes"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import resource
+        import sys
+        # ru_maxrss is peak RSS: kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return 0
+
+
+class SharedModel:
+    """
+    Lazily loaded handle to a SentenceTransformer.
+    The underlying model is created on the first call to encode().
+    """
+
+    def __init__(self, model_name: str, device: Optional[str] = None, precision: str = "float32"):
+        self.model_name = model_name
+        self.device = device
+        self.precision = precision
+        self._model = None
+        self._lock = threading.Lock()
+        self.load_seconds = None
+        self.rss_delta_bytes = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        """Return the underlying SentenceTransformer, loading it if needed"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+
+        rss_before = get_rss_bytes()
+        start = time.perf_counter()
+
+        model = SentenceTransformer(self.model_name, device=self.device)
+        if self.precision == "float16":
+            model = model.half()
+        elif self.precision != "float32":
+            raise ValueError(f"Unsupported model precision: {self.precision}")
+
+        self.load_seconds = time.perf_counter() - start
+        self.rss_delta_bytes = max(get_rss_bytes() - rss_before, 0)
+        print(f"Loaded embedding model {self.model_name} in {self.load_seconds:.2f}s "
+              f"(+{self.rss_delta_bytes / (1024 * 1024):.1f} MB RSS)")
+        return model
+
+    def encode(self, texts, **kwargs):
+        """Encode texts with the shared model"""
+        return self.model.encode(texts, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model_name": self.model_name,
+            "device": self.device,
+            "precision": self.precision,
+            "loaded": self.is_loaded,
+            "load_seconds": self.load_seconds,
+            "rss_delta_bytes": self.rss_delta_bytes,
+        }
+
+
+class ModelRegistry:
+    """Process-wide registry that hands out one SharedModel per (name, device, precision)"""
+
+    _models: Dict[Tuple[str, Optional[str], str], SharedModel] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, model_name: str, device: Optional[str] = None, precision: str = "float32") -> SharedModel:
+        key = (model_name, device, precision)
+        with cls._lock:
+            if key not in cls._models:
+                cls._models[key] = SharedModel(model_name, device=device, precision=precision)
+            return cls._models[key]
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        with cls._lock:
+            models = [m.stats() for m in cls._models.values()]
+        return {
+            "models": models,
+            "process_rss_bytes": get_rss_bytes(),
+        }
+
+    @classmethod
+    def clear(cls):
+        """Drop all registered models (mainly useful for tests and benchmarks)"""
+        with cls._lock:
+            cls._models.clear()
+
+
+def get_model(model_name: str, device: Optional[str] = None, precision: str = "float32") -> SharedModel:
+    """Return the shared model handle for the given configuration"""
+    return ModelRegistry.get(model_name, device=device, precision=precision)
@@ -0,0 +1,117 @@
+import json
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+SCORE = {"type": "integer", "minimum": 1, "maximum": 10}
+
+EVALUATION_SCHEMA = {
+    "type": "object",
+    "required": ["clarity", "difficulty", "educational_value", "accuracy", "overall"],
+    "properties": {
+        "clarity": SCORE,
+        "difficulty": SCORE,
+        "educational_value": SCORE,
+        "accuracy": SCORE,
+        "overall": SCORE,
+        "feedback": {"type": "string"},
+    },
+}
+
+QUESTION_SCHEMA = {
+    "type": "object",
+    "required": ["question", "correct_answer", "explanation"],
+    "properties": {
+        "question": {"type": "string", "minLength": 1},
+        "options": {"type": "array", "items": {"type": "string"}},
+        "correct_answer": {"type": "string"},
+        "explanation": {"type": "string"},
+        "topic": {"type": "string"},
+        "difficulty": {"type": "string"},
+        "question_type": {"type": "string"},
+    },
+}
+
+# One response carrying the question and its self-assessment
+GENERATE_AND_EVALUATE_SCHEMA = {
+    "type": "object",
+    "required": QUESTION_SCHEMA["required"] + ["evaluation"],
+    "properties": dict(QUESTION_SCHEMA["properties"], evaluation=EVALUATION_SCHEMA),
+}
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "number": (int, float),
+    "integer": int,
+    "null": type(None),
+}
+
+
+def validate(instance: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """
+    Check an instance against a JSON schema subset: type, required,
+    properties, items, enum, minimum/maximum, minLength and minItems/maxItems.
+    Returns a list of error messages (empty when valid).
+    """
+    expected = schema.get("type")
+    if expected is not None:
+        types = expected if isinstance(expected, list) else [expected]
+        # bool is an int subclass in Python but not a JSON number
+        if isinstance(instance, bool) and "boolean" not in types:
+            return [f"{path}: expected {expected}, got boolean"]
+        if not any(isinstance(instance, _TYPES[t]) for t in types):
+            return [f"{path}: expected {expected}, got {type(instance).__name__}"]
+
+    errors = []
+    if "enum" in schema and instance not in schema["enum"]:
+        errors.append(f"{path}: {instance!r} is not one of {schema['enum']}")
+    if isinstance(instance, (int, float)) and not isinstance(instance, bool):
+        if "minimum" in schema and instance < schema["minimum"]:
+            errors.append(f"{path}: {instance} is below the minimum {schema['minimum']}")
+        if "maximum" in schema and instance > schema["maximum"]:
+            errors.append(f"{path}: {instance} is above the maximum {schema['maximum']}")
+    if isinstance(instance, str) and len(instance) < schema.get("minLength", 0):
+        errors.append(f"{path}: string is shorter than {schema['minLength']}")
+    if isinstance(instance, dict):
+        for name in schema.get("required", []):
+            if name not in instance:
+                errors.append(f"{path}: missing required property '{name}'")
+        for name, subschema in schema.get("properties", {}).items():
+            if name in instance:
+                errors.extend(validate(instance[name], subschema, f"{path}.{name}"))
+    if isinstance(instance, list):
+        if len(instance) < schema.get("minItems", 0):
+            errors.append(f"{path}: fewer than {schema['minItems']} items")
+        if "maxItems" in schema and len(instance) > schema["maxItems"]:
+            errors.append(f"{path}: more than {schema['maxItems']} items")
+        if "items" in schema:
+            for i, item in enumerate(instance):
+                errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+
+def extract_json(text: str) -> Optional[str]:
+    """The JSON object in a model response, ignoring code fences and surrounding prose"""
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip())
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end < start:
+        return None
+    return text[start:end + 1]
+
+
+def parse_structured_output(text: str, schema: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    Parse a model response as JSON and validate it against the schema.
+    Returns (data, errors); data is None when the response is not JSON at all.
+    """
+    candidate = extract_json(text)
+    if candidate is None:
+        return None, ["$: no JSON object found in the response"]
+    try:
+        data = json.loads(candidate)
+    except json.JSONDecodeError as e:
+        return None, [f"$: invalid JSON ({e.msg} at position {e.pos})"]
+    return data, validate(data, schema)
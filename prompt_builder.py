@@ -0,0 +1,192 @@
+import math
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+
+_encodings: Dict[str, Any] = {}
+
+
+def _load_encoding(model: str):
+    """tiktoken encoding for the model, cached per process; None when tiktoken is unusable"""
+    if model not in _encodings:
+        # tiktoken is optional and only imported once a prompt is actually counted
+        try:
+            import tiktoken
+        except ImportError:
+            tiktoken = None
+        encoding = None
+        if tiktoken is not None:
+            try:
+                try:
+                    encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                # The encoding files could not be downloaded (e.g. offline); use the estimate
+                encoding = None
+        _encodings[model] = encoding
+    return _encodings[model]
+
+
+class TokenCounter:
+    """
+    Counts tokens with the model's tiktoken encoding when it is available,
+    otherwise with a ~4 characters per token estimate.
+    """
+
+    CHARS_PER_TOKEN = 4
+    MESSAGE_OVERHEAD = 4  # Role and separator tokens added per chat message
+
+    def __init__(self, model: str = "gpt-3.5-turbo"):
+        self.model = model
+
+    @property
+    def encoding(self):
+        return _load_encoding(self.model)
+
+    @property
+    def exact(self) -> bool:
+        return self.encoding is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        encoding = self.encoding
+        if encoding is not None:
+            return len(encoding.encode(text))
+        return math.ceil(len(text) / self.CHARS_PER_TOKEN)
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        return sum(self.count(m["content"]) + self.MESSAGE_OVERHEAD for m in messages) + 3
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text to at most max_tokens, ending on a word boundary"""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        encoding = self.encoding
+        if encoding is not None:
+            cut = encoding.decode(encoding.encode(text)[:max_tokens])
+        else:
+            cut = text[:max_tokens * self.CHARS_PER_TOKEN]
+        return cut.rsplit(" ", 1)[0] if " " in cut else cut
+
+
+def _text_overlap(left: str, right: str, min_chars: int) -> int:
+    """Length of the longest suffix of left that is a prefix of right (0 if shorter than min_chars)"""
+    for size in range(min(len(left), len(right)), min_chars - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def merge_chunks(chunks: List[Dict[str, Any]], min_overlap_chars: int = 30) -> List[Dict[str, Any]]:
+    """
+    Merge retrieved textbook chunks that share text, keeping retrieval order.
+    Chunks from the same source and chapter with intersecting start_char/end_char
+    spans (offsets within the chapter) are joined into one when their text agrees
+    on the shared part; other chunks are joined when one ends with
+    at least min_overlap_chars of the other's beginning, and dropped when
+    their text is contained in an earlier chunk. A merged chunk takes the
+    rank of its best-ranked part.
+    """
+    merged: List[Dict[str, Any]] = []
+    for chunk in chunks:
+        current = dict(chunk, merged_ids=[chunk.get("id")])
+        position = len(merged)
+        i = 0
+        while i < len(merged):
+            combined = _merge_pair(merged[i], current, min_overlap_chars)
+            if combined is None:
+                i += 1
+                continue
+            # The grown chunk may now bridge to chunks checked earlier
+            current = combined
+            position = min(position, i)
+            merged.pop(i)
+            i = 0
+        merged.insert(position, current)
+    return merged
+
+
+def _merge_pair(a: Dict[str, Any], b: Dict[str, Any], min_overlap_chars: int) -> Optional[Dict[str, Any]]:
+    spans = all(c.get("start_char") is not None for c in (a, b))
+    if spans and all(a.get(key) == b.get(key) for key in ("source", "chapter")):
+        first, second = (a, b) if a["start_char"] <= b["start_char"] else (b, a)
+        if second["start_char"] > first["end_char"]:
+            return None
+        # Chunks kept from an older ingest may carry outdated offsets, so the spans
+        # are only trusted when the text they claim to share is the same
+        shift = second["start_char"] - first["start_char"]
+        shared = first["content"][shift:shift + len(second["content"])]
+        if second["content"].startswith(shared):
+            return dict(a, content=first["content"] + second["content"][len(shared):],
+                        start_char=first["start_char"],
+                        end_char=max(first["end_char"], second["end_char"]),
+                        merged_ids=a["merged_ids"] + b["merged_ids"])
+
+    # Chunks from different sources or chapters never overlap
+    if any(a.get(key) is not None and b.get(key) is not None and a[key] != b[key] for key in ("source", "chapter")):
+        return None
+    if b["content"] in a["content"]:
+        return dict(a, merged_ids=a["merged_ids"] + b["merged_ids"])
+    if a["content"] in b["content"]:
+        return dict(a, content=b["content"], merged_ids=a["merged_ids"] + b["merged_ids"])
+    for first, second in ((a, b), (b, a)):
+        size = _text_overlap(first["content"], second["content"], min_overlap_chars)
+        if size:
+            return dict(a, content=first["content"] + second["content"][size:],
+                        merged_ids=a["merged_ids"] + b["merged_ids"])
+    return None
+
+
+class PromptBuilder:
+    """
+    Packs retrieved context into a prompt under a token budget.
+    Items are taken best-first; an item that does not fit is skipped, except
+    that the last textbook passage is truncated to fill the remaining space.
+    """
+
+    def __init__(self,
+                 model: str = "gpt-3.5-turbo",
+                 token_budget: int = 2000,
+                 question_share: float = 0.3,
+                 min_chunk_tokens: int = 40):
+        self.counter = TokenCounter(model)
+        self.token_budget = token_budget
+        self.question_share = question_share
+        self.min_chunk_tokens = min_chunk_tokens
+
+    def pack(self,
+             items: List[Any],
+             format_item: Callable[[int, Any], str],
+             budget: int,
+             truncate_last: bool = False,
+             truncate_item: Optional[Callable[[Any, int], Any]] = None) -> Tuple[List[str], int]:
+        """
+        Format items (numbered from 1) until the budget is used up.
+        Returns the formatted entries and the tokens they take.
+        """
+        entries = []
+        used = 0
+        for item in items:
+            entry = format_item(len(entries) + 1, item)
+            tokens = self.counter.count(entry)
+            if used + tokens <= budget:
+                entries.append(entry)
+                used += tokens
+                continue
+            remaining = budget - used
+            if truncate_last and truncate_item is not None and remaining >= self.min_chunk_tokens:
+                overhead = self.counter.count(format_item(len(entries) + 1, truncate_item(item, 0)))
+                entry = format_item(len(entries) + 1, truncate_item(item, remaining - overhead))
+                tokens = self.counter.count(entry)
+                if used + tokens <= budget:
+                    entries.append(entry)
+                    used += tokens
+                break
+        return entries, used
+
+    def truncate_chunk(self, chunk: Dict[str, Any], max_tokens: int) -> Dict[str, Any]:
+        content = self.counter.truncate(chunk["content"], max_tokens)
+        return dict(chunk, content=content + "..." if content else "")
@@ -1,8 +1,28 @@
-from typing import List, Dict, Any, Optional
-from data_processor import DataProcessor
+import os
+import glob
+import random
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator
+from data_processor import DataProcessor, batched, take_rows
 from embedding_system import EmbeddingSystem
 from llm_integration import LLMIntegration
 from config import Config
+from model_registry import ModelRegistry
+from ingest_manifest import IngestManifest, file_digest, content_digest
+from ingest_pipeline import IngestPipeline
+from instrumentation import Tracer, HistogramSink, create_sinks, span
+from job_queue import JobQueue
+
+def dedup_text(question: Dict[str, Any]) -> str:
+    """A generated question laid out like the stored question documents, for near-duplicate checks"""
+    answer = question.get("answer")
+    if answer is None:
+        # Multiple choice: the text of the correct option, e.g. "B) ..." for correct_answer "B"
+        answer = question.get("correct_answer", "")
+        for option in question.get("options") or []:
+            if isinstance(option, str) and option.startswith(f"{answer})"):
+                answer = option[len(answer) + 1:].strip()
+                break
+    return f"Question: {question.get('question', '')}\nAnswer: {answer}\nTopic: {question.get('topic', '')}"
 
 class QuestionGenerator:
     def __init__(self, config: Config):
@@ -13,13 +33,51 @@ class QuestionGenerator:
         )
         self.embedding_system = EmbeddingSystem(
             model_name=config.EMBEDDING_MODEL,
-            db_path=config.VECTOR_DB_PATH
+            db_path=config.VECTOR_DB_PATH,
+            device=config.EMBEDDING_DEVICE,
+            precision=config.EMBEDDING_PRECISION,
+            cache_dir=config.EMBEDDING_CACHE_PATH,
+            cache_max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+            retrieval_cache_size=config.RETRIEVAL_CACHE_SIZE,
+            retrieval_cache_ttl=config.RETRIEVAL_CACHE_TTL,
+            backend=config.VECTOR_DB_BACKEND,
+            vector_precision=config.VECTOR_PRECISION,
+            rerank_factor=config.VECTOR_RERANK_FACTOR,
+            hybrid_search=config.HYBRID_SEARCH,
+            hybrid_candidates=config.HYBRID_CANDIDATES,
+            rrf_k=config.RRF_K,
+            vector_index=config.VECTOR_INDEX,
+            ivf_clusters=config.IVF_CLUSTERS,
+            ivf_nprobe=config.IVF_NPROBE
         )
         self.llm = LLMIntegration(
             api_key=config.OPENAI_API_KEY,
-            model=config.LLM_MODEL
+            model=config.LLM_MODEL,
+            base_url=config.LLM_BASE_URL,
+            timeout=config.LLM_REQUEST_TIMEOUT,
+            max_retries=config.LLM_MAX_RETRIES,
+            max_concurrency=config.LLM_MAX_CONCURRENCY,
+            prompt_token_budget=config.PROMPT_TOKEN_BUDGET,
+            prompt_question_share=config.PROMPT_QUESTION_SHARE,
+            seed=config.LLM_SEED,
+            cache_path=config.LLM_CACHE_PATH,
+            cache_max_entries=config.LLM_CACHE_MAX_ENTRIES,
+            cache_ttl=config.LLM_CACHE_TTL,
+            cache_deterministic_only=config.LLM_CACHE_DETERMINISTIC_ONLY,
+            backend=config.LLM_BACKEND,
+            pool_size=config.LLM_POOL_SIZE,
+            stub_latency=config.LLM_STUB_LATENCY
+        )
+        # Per-stage timings; with INSTRUMENTATION_ENABLED off no trace is started and spans do nothing
+        self.tracer = Tracer(
+            create_sinks(config.INSTRUMENTATION_SINKS, config.INSTRUMENTATION_LOG_PATH,
+                         config.PROMETHEUS_TEXTFILE_PATH) if config.INSTRUMENTATION_ENABLED else [],
+            enabled=config.INSTRUMENTATION_ENABLED
         )
         
+        # Background batch jobs; the SQLite queue and its workers start on the first submit
+        self._job_queue = None
+        
         # Setup collections
         self.embedding_system.setup_collections(
             config.COLLECTION_NAME_QUESTIONS,
@@ -30,122 +88,571 @@ class QuestionGenerator:
                           questions_file: str = None,
                           textbook_file: str = None,
                           questions_data: List[Dict[str, Any]] = None,
-                          textbook_content: str = None):
-        """Initialize the vector database with questions and textbook content"""
+                          textbook_content: str = None,
+                          incremental: bool = False,
+                          textbook_dir: str = None,
+                          source: str = None):
+        """
+        Initialize the vector database with questions and textbook content.
+        With incremental=True, unchanged sources are skipped and for changed
+        ones only new items are embedded while removed items are deleted.
+        Inline questions_data / textbook_content are tracked like a file only
+        when named by `source`; unnamed inline data is always just added, so it
+        never deletes what earlier inline calls ingested.
+        """
+        manifest = IngestManifest(self.config.INGEST_MANIFEST_PATH)
         
         # Process and add questions
-        if questions_file:
-            questions_data = self.data_processor.load_questions_from_file(questions_file)
-        
-        if questions_data:
-            processed_questions = self.data_processor.process_questions(questions_data)
-            self.embedding_system.add_questions_to_db(processed_questions)
-            print(f"Added {len(processed_questions)} questions to database")
+        if questions_file or questions_data:
+            tracked = bool(questions_file or source)
+            if questions_file:
+                item_source = os.path.abspath(questions_file)
+            else:
+                item_source = f"{source}:questions" if source else "inline_questions"
+            
+            def build_questions():
+                if questions_file:
+                    # Large files are read in chunks and cleaned column-wise
+                    return self.data_processor.iter_question_columns(
+                        questions_file, source=item_source, batch_size=self.config.INGEST_BATCH_SIZE,
+                        chunk_rows=self.config.QUESTIONS_READ_CHUNK_ROWS
+                    )
+                return batched(self.data_processor.process_questions(questions_data, source=item_source),
+                               self.config.INGEST_BATCH_SIZE)
+            
+            self._ingest_source(manifest, "questions", item_source, questions_file, questions_data,
+                                build_questions, incremental, tracked)
         
         # Process and add textbook content
-        if textbook_file:
-            textbook_content = self.data_processor.load_textbook_from_file(textbook_file)
+        if textbook_file or textbook_content:
+            tracked = bool(textbook_file or source)
+            if textbook_file:
+                item_source = os.path.abspath(textbook_file)
+            else:
+                item_source = f"{source}:textbook" if source else "inline_textbook"
+            
+            def build_chunks():
+                if textbook_file:
+                    # Stream large files block by block instead of reading them whole
+                    return self.data_processor.iter_textbook_file(
+                        textbook_file, source=item_source, block_size=self.config.TEXTBOOK_READ_BLOCK_SIZE
+                    )
+                return self.data_processor.iter_textbook_chunks([textbook_content], source=item_source)
+            
+            def build_chunk_batches():
+                return batched(build_chunks(), self.config.INGEST_BATCH_SIZE)
+            
+            self._ingest_source(manifest, "textbook", item_source, textbook_file, textbook_content,
+                                build_chunk_batches, incremental, tracked)
+            self.embedding_system.build_textbook_index()
+        
+        manifest.save()
+        
+        # Directories of textbooks go through the parallel pipeline
+        if textbook_dir:
+            self.ingest_textbook_directory(textbook_dir, incremental=incremental)
+    
+    def ingest_textbook_directory(self,
+                                  directory: str,
+                                  pattern: str = "*.txt",
+                                  incremental: bool = False,
+                                  workers: int = None,
+                                  batch_size: int = None) -> Dict[str, Any]:
+        """Ingest every matching textbook file in a directory with the parallel ingest pipeline"""
+        manifest = IngestManifest(self.config.INGEST_MANIFEST_PATH)
+        
+        files = []
+        # IDs recorded for each tracked source; only incremental runs skip re-embedding them,
+        # but every run deletes the ones that dropped out of the file
+        recorded_ids = {}
+        for path in sorted(glob.glob(os.path.join(directory, pattern))):
+            source = os.path.abspath(path)
+            if incremental and manifest.is_unchanged(source, mtime=os.path.getmtime(path)):
+                continue
+            files.append((path, source))
+            entry = manifest.get(source)
+            if entry:
+                recorded_ids[source] = set(entry["ids"])
+        previous_ids = recorded_ids if incremental else {}
+        
+        pipeline = IngestPipeline(
+            self.embedding_system,
+            chunk_size=self.config.CHUNK_SIZE,
+            chunk_overlap=self.config.CHUNK_OVERLAP,
+            workers=workers or self.config.INGEST_WORKERS,
+            batch_size=batch_size or self.config.INGEST_ENCODE_BATCH_SIZE
+        )
+        report = pipeline.ingest_textbooks(files, previous_ids=previous_ids)
+        
+        removed = 0
+        for source, result in report["sources"].items():
+            if source in recorded_ids:
+                to_delete = sorted(recorded_ids[source].difference(result["ids"]))
+                self.embedding_system.delete_textbook_chunks(to_delete)
+                removed += len(to_delete)
+            manifest.update(source, "textbook", result["sha256"], result["ids"], result["mtime"])
+        manifest.save()
+        
+        added = sum(result["added"] for result in report["sources"].values())
+        print(f"Added {added} textbook chunks from {len(files)} files to database"
+              + (f", removed {removed}" if removed else ""))
+        self.embedding_system.build_textbook_index()
+        return report
+    
+    def _ingest_source(self,
+                       manifest: IngestManifest,
+                       kind: str,
+                       source: str,
+                       file_path: Optional[str],
+                       content: Any,
+                       build_batches: Callable[[], Iterable[Any]],
+                       incremental: bool,
+                       tracked: bool = True):
+        """
+        Write the items of one source to the database and record them in the manifest.
+        build_batches yields lists of item dicts, or column dicts for questions
+        (see DataProcessor.iter_question_columns). Tracked sources are pruned of
+        items no longer produced on every run; incremental runs also skip items
+        already stored. Untracked sources (unnamed inline data) are only added:
+        never skipped, pruned or recorded.
+        """
+        label = "questions" if kind == "questions" else "textbook chunks"
+        incremental = incremental and tracked
+        mtime = os.path.getmtime(file_path) if file_path else None
+        if incremental and manifest.is_unchanged(source, mtime=mtime):
+            print(f"Skipping unchanged source {source}")
+            return
+        
+        if not tracked:
+            digest = None
+        else:
+            digest = file_digest(file_path) if file_path else content_digest(content)
+        entry = manifest.get(source)
+        if incremental and manifest.is_unchanged(source, digest=digest):
+            # Touched but identical: remember the new mtime so the next run skips hashing
+            manifest.update(source, kind, digest, entry["ids"], mtime)
+            print(f"Skipping unchanged source {source}")
+            return
+        
+        if kind == "questions":
+            write, delete = self.embedding_system.add_questions_to_db, self.embedding_system.delete_questions
+        else:
+            write, delete = self.embedding_system.add_textbook_to_db, self.embedding_system.delete_textbook_chunks
+        
+        # Items are embedded and written in bounded batches as they are produced
+        previous_ids = set(entry["ids"]) if tracked and entry else None
+        current_ids = []
+        added = 0
+        for batch in build_batches():
+            columnar = isinstance(batch, dict)
+            ids = batch["id"] if columnar else [item["id"] for item in batch]
+            current_ids.extend(ids)
+            if incremental and previous_ids is not None:
+                keep = [i for i, item_id in enumerate(ids) if item_id not in previous_ids]
+                batch = take_rows(batch, keep) if columnar else [batch[i] for i in keep]
+                ids = [ids[i] for i in keep]
+            if columnar:
+                self.embedding_system.add_question_columns(batch)
+            else:
+                write(batch)
+            added += len(ids)
         
-        if textbook_content:
-            textbook_chunks = self.data_processor.process_textbook(textbook_content)
-            self.embedding_system.add_textbook_to_db(textbook_chunks)
-            print(f"Added {len(textbook_chunks)} textbook chunks to database")
+        to_delete = sorted(previous_ids.difference(current_ids)) if previous_ids is not None else []
+        delete(to_delete)
+        
+        if tracked:
+            manifest.update(source, kind, digest, current_ids, mtime)
+        print(f"Added {added} {label} to database"
+              + (f", removed {len(to_delete)}" if to_delete else ""))
     
     def generate_new_question(self,
                             topic: str,
                             difficulty: str = "Medium",
                             question_type: str = "Multiple Choice",
                             top_k_questions: int = None,
-                            top_k_textbook: int = None) -> Dict[str, Any]:
-        """Generate a new question based on topic using RAG approach"""
+                            top_k_textbook: int = None,
+                            question_filters: Optional[Dict[str, Any]] = None,
+                            textbook_filters: Optional[Dict[str, Any]] = None,
+                            with_evaluation: bool = False) -> Dict[str, Any]:
+        """
+        Generate a new question based on topic using RAG approach.
+        question_filters / textbook_filters restrict retrieval by metadata,
+        e.g. {"topic": "Biology"} or {"chapter": "Chapter 3"}.
+        with_evaluation also returns a quality evaluation under "evaluation" (see GENERATION_MODE).
+        """
+        
+        with self.tracer.trace("generate_new_question") as trace:
+            # Steps 1-2: Retrieve similar questions and relevant textbook content
+            with span("retrieve"):
+                request, top_k_questions, top_k_textbook = self._prepare_request(
+                    topic, difficulty, question_type, top_k_questions, top_k_textbook,
+                    question_filters, textbook_filters
+                )
+            
+            # Step 3: Generate new question using LLM (regenerating near-duplicates)
+            if with_evaluation:
+                generated_question = self._generate_with_evaluation([request])[0]
+            else:
+                generated_question = self._generate_distinct([request], None,
+                                                             self.llm.generate_questions_concurrently)[0]
+            
+            # Step 4: Add metadata about the generation process
+            generated_question = self._add_generation_metadata(generated_question, request, top_k_questions,
+                                                               top_k_textbook)
+        
+        return self._attach_timings(generated_question, trace)
+    
+    def generate_new_question_stream(self,
+                                     topic: str,
+                                     difficulty: str = "Medium",
+                                     question_type: str = "Multiple Choice",
+                                     top_k_questions: int = None,
+                                     top_k_textbook: int = None,
+                                     question_filters: Optional[Dict[str, Any]] = None,
+                                     textbook_filters: Optional[Dict[str, Any]] = None,
+                                     with_evaluation: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Like generate_new_question, but yields the LLMIntegration.generate_question_stream
+        events while the question is written. The final {"type": "done"} event carries
+        the finished question with its generation metadata (and evaluation).
+        """
+        combined = with_evaluation and self.config.GENERATION_MODE == "combined"
+        if with_evaluation and not combined and self.config.GENERATION_MODE != "separate":
+            raise ValueError(f"Unsupported generation mode: {self.config.GENERATION_MODE}")
         
+        with self.tracer.trace("generate_new_question_stream") as trace:
+            with span("retrieve"):
+                request, top_k_questions, top_k_textbook = self._prepare_request(
+                    topic, difficulty, question_type, top_k_questions, top_k_textbook,
+                    question_filters, textbook_filters
+                )
+            
+            for event in self.llm.generate_question_stream(**request, with_evaluation=combined):
+                if event["type"] != "done":
+                    yield event
+                    continue
+                
+                generated_question = event["question"]
+                # A streamed question cannot be regenerated; near-duplicates are only flagged
+                duplicate = bool(self._flag_near_duplicates([generated_question]))
+                if with_evaluation and not combined and not duplicate:
+                    generated_question["evaluation"] = self.llm.evaluate_question_quality(generated_question)
+                elif combined and "error" not in generated_question and not duplicate:
+                    if random.random() < self.config.AUDIT_SAMPLE_RATE:
+                        generated_question["audit_evaluation"] = self.llm.evaluate_question_quality(generated_question)
+                generated_question = self._add_generation_metadata(generated_question, request, top_k_questions,
+                                                                   top_k_textbook)
+        
+        yield {"type": "done", "question": self._attach_timings(generated_question, trace)}
+    
+    def _prepare_request(self,
+                         topic: str,
+                         difficulty: str,
+                         question_type: str,
+                         top_k_questions: Optional[int],
+                         top_k_textbook: Optional[int],
+                         question_filters: Optional[Dict[str, Any]],
+                         textbook_filters: Optional[Dict[str, Any]]):
+        """Retrieve context for one topic; returns the generation request and the top-k values used"""
         if top_k_questions is None:
             top_k_questions = self.config.TOP_K_QUESTIONS
         if top_k_textbook is None:
             top_k_textbook = self.config.TOP_K_TEXTBOOK
         
-        # Step 1: Retrieve similar questions using RAG
-        similar_questions = self.embedding_system.search_similar_questions(
-            query=f"{topic} {difficulty} {question_type}",
-            top_k=top_k_questions
+        similar_per_topic, textbook_per_topic = self._retrieve_context(
+            [topic], difficulty, question_type, top_k_questions, top_k_textbook,
+            question_filters, textbook_filters
         )
-        
-        # Step 2: Retrieve relevant textbook content
-        relevant_textbook = self.embedding_system.search_relevant_textbook(
-            query=topic,
-            top_k=top_k_textbook
+        request = self._build_generation_request(
+            topic, difficulty, question_type, similar_per_topic[0], textbook_per_topic[0]
         )
+        return request, top_k_questions, top_k_textbook
+    
+    def _generate_with_evaluation(self,
+                                  requests: List[Dict[str, Any]],
+                                  max_concurrency: int = None) -> List[Dict[str, Any]]:
+        """
+        Generate and evaluate questions.
+        In "combined" GENERATION_MODE each question comes back with its own
+        self-assessment from a single LLM call, and a random AUDIT_SAMPLE_RATE
+        share is also graded by the separate evaluator ("audit_evaluation").
+        In "separate" mode every question costs a generation and an evaluation call.
+        """
+        mode = self.config.GENERATION_MODE
+        if mode == "combined":
+            questions = self._generate_distinct(requests, max_concurrency, self.llm.generate_and_evaluate_concurrently)
+            audited = [q for q in questions if "error" not in q and "near_duplicate" not in q
+                       and random.random() < self.config.AUDIT_SAMPLE_RATE]
+            for question, evaluation in zip(audited, self.llm.evaluate_questions_concurrently(audited, max_concurrency)):
+                question["audit_evaluation"] = evaluation
+            return questions
+        if mode == "separate":
+            questions = self._generate_distinct(requests, max_concurrency, self.llm.generate_questions_concurrently)
+            # The gate has just flagged the near-duplicates, so they are not checked again
+            self._evaluate_questions(questions, max_concurrency)
+            return questions
+        raise ValueError(f"Unsupported generation mode: {mode}")
+    
+    def _generate_distinct(self,
+                           requests: List[Dict[str, Any]],
+                           max_concurrency: Optional[int],
+                           generate: Callable[..., List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        generate(requests, max_concurrency) behind the near-duplicate gate: questions
+        within DEDUP_THRESHOLD cosine similarity of a stored question or of an earlier
+        question of the same batch are regenerated, with the rejected text added to
+        the prompt's avoid list, up to DEDUP_MAX_REGENERATIONS times. Questions still
+        too close are returned with the match under "near_duplicate".
+        """
+        questions = generate(requests, max_concurrency)
+        requests = list(requests)
+        for _ in range(self.config.DEDUP_MAX_REGENERATIONS):
+            duplicates = self._flag_near_duplicates(questions)
+            if not duplicates:
+                break
+            for i in duplicates:
+                rejected = questions[i].get("question", "")
+                requests[i] = dict(requests[i], avoid_questions=requests[i].get("avoid_questions", []) + [rejected])
+            print(f"Regenerating {len(duplicates)} near-duplicate question(s)")
+            for i, question in zip(duplicates, generate([requests[i] for i in duplicates], max_concurrency)):
+                questions[i] = question
+        else:
+            self._flag_near_duplicates(questions)
+        return questions
+    
+    def _flag_near_duplicates(self, questions: List[Dict[str, Any]]) -> List[int]:
+        """Mark near-duplicates (see EmbeddingSystem.find_near_duplicates) and return their positions"""
+        threshold = self.config.DEDUP_THRESHOLD
+        if threshold is None:
+            return []
+        # Failed generations have no question text to compare
+        checked = [i for i, q in enumerate(questions) if "error" not in q and q.get("question")]
+        with span("dedup", questions=len(checked)) as stage:
+            matches = self.embedding_system.find_near_duplicates([dedup_text(questions[i]) for i in checked],
+                                                                 threshold)
+            duplicates = []
+            for i, match in zip(checked, matches):
+                questions[i].pop("near_duplicate", None)
+                if match is None:
+                    continue
+                if match["source"] == "batch":
+                    match["index"] = checked[match["index"]]
+                questions[i]["near_duplicate"] = match
+                duplicates.append(i)
+            stage.set(duplicates=len(duplicates))
+        return duplicates
+    
+    def _retrieve_context(self,
+                          topics: List[str],
+                          difficulty: str,
+                          question_type: str,
+                          top_k_questions: int,
+                          top_k_textbook: int,
+                          question_filters: Optional[Dict[str, Any]] = None,
+                          textbook_filters: Optional[Dict[str, Any]] = None):
+        """
+        Similar questions and textbook chunks for each topic, in one batched search.
+        Without explicit question filters, example questions are restricted to the
+        requested difficulty (FILTER_SIMILAR_BY_DIFFICULTY); topics with no match
+        at that difficulty fall back to an unfiltered search.
+        """
+        difficulty_filtered = question_filters is None and self.config.FILTER_SIMILAR_BY_DIFFICULTY
+        if difficulty_filtered:
+            question_filters = {"difficulty": difficulty}
         
-        # Step 3: Generate new question using LLM
-        generated_question = self.llm.generate_question(
-            topic=topic,
-            similar_questions=similar_questions,
-            textbook_content=relevant_textbook,
-            difficulty=difficulty,
-            question_type=question_type,
-            max_tokens=self.config.MAX_TOKENS,
-            temperature=self.config.TEMPERATURE
+        question_queries = [f"{topic} {difficulty} {question_type}" for topic in topics]
+        similar_per_topic, textbook_per_topic = self.embedding_system.search_many(
+            question_queries=question_queries,
+            textbook_queries=list(topics),
+            top_k_questions=top_k_questions,
+            top_k_textbook=top_k_textbook,
+            question_where=question_filters,
+            textbook_where=textbook_filters
         )
         
-        # Step 4: Add metadata about the generation process
+        missing = [i for i, similar in enumerate(similar_per_topic) if not similar]
+        if difficulty_filtered and missing:
+            fallback, _ = self.embedding_system.search_many(
+                question_queries=[question_queries[i] for i in missing],
+                top_k_questions=top_k_questions
+            )
+            for i, similar in zip(missing, fallback):
+                similar_per_topic[i] = similar
+        
+        return similar_per_topic, textbook_per_topic
+    
+    def _build_generation_request(self,
+                                  topic: str,
+                                  difficulty: str,
+                                  question_type: str,
+                                  similar_questions: List[Dict[str, Any]],
+                                  relevant_textbook: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Keyword arguments for LLMIntegration.generate_question"""
+        return {
+            "topic": topic,
+            "similar_questions": similar_questions,
+            "textbook_content": relevant_textbook,
+            "difficulty": difficulty,
+            "question_type": question_type,
+            "max_tokens": self.config.MAX_TOKENS,
+            "temperature": self.config.TEMPERATURE
+        }
+    
+    def _add_generation_metadata(self,
+                                 generated_question: Dict[str, Any],
+                                 request: Dict[str, Any],
+                                 top_k_questions: int,
+                                 top_k_textbook: int) -> Dict[str, Any]:
+        similar_questions = request["similar_questions"]
         generated_question.update({
             "generation_metadata": {
                 "similar_questions_count": len(similar_questions),
-                "textbook_chunks_used": len(relevant_textbook),
+                "textbook_chunks_used": len(request["textbook_content"]),
                 "top_k_questions": top_k_questions,
                 "top_k_textbook": top_k_textbook,
                 "similar_questions": [q["question"] for q in similar_questions[:3]],
-                "similarity_scores": [q["similarity_score"] for q in similar_questions[:3]]
+                "similarity_scores": [q["similarity_score"] for q in similar_questions[:3]],
+                "prompt_tokens": generated_question.pop("prompt_tokens", None)
             }
         })
         
         return generated_question
     
+    def _attach_timings(self, question: Dict[str, Any], trace) -> Dict[str, Any]:
+        """Add the finished trace's per-stage timings to generation_metadata (no-op when tracing is off)"""
+        if trace is not None and "generation_metadata" in question:
+            question["generation_metadata"]["timings"] = trace.summary()
+        return question
+    
     def batch_generate_questions(self,
                                topics: List[str],
                                difficulty: str = "Medium",
                                question_type: str = "Multiple Choice",
-                               questions_per_topic: int = 1) -> List[Dict[str, Any]]:
-        """Generate multiple questions for multiple topics"""
-        
-        all_questions = []
+                               questions_per_topic: int = 1,
+                               max_concurrency: int = None,
+                               question_filters: Optional[Dict[str, Any]] = None,
+                               textbook_filters: Optional[Dict[str, Any]] = None,
+                               with_evaluation: bool = False) -> List[Dict[str, Any]]:
+        """
+        Generate multiple questions for multiple topics.
+        LLM calls run concurrently (up to max_concurrency, default LLM_MAX_CONCURRENCY);
+        results keep the topic order. The metadata filters apply to every topic.
+        with_evaluation adds a quality evaluation to each question (see GENERATION_MODE).
+        """
         
-        for topic in topics:
-            print(f"Generating {questions_per_topic} questions for topic: {topic}")
+        with self.tracer.trace("batch_generate_questions", questions=len(topics) * questions_per_topic) as trace:
+            top_k_questions = self.config.TOP_K_QUESTIONS
+            top_k_textbook = self.config.TOP_K_TEXTBOOK
             
-            for i in range(questions_per_topic):
-                question = self.generate_new_question(
-                    topic=topic,
-                    difficulty=difficulty,
-                    question_type=question_type
+            # Retrieve the context for every topic up front in one batched search
+            with span("retrieve"):
+                similar_per_topic, textbook_per_topic = self._retrieve_context(
+                    topics, difficulty, question_type, top_k_questions, top_k_textbook,
+                    question_filters, textbook_filters
                 )
-                question["batch_id"] = f"{topic}_{i+1}"
+            
+            requests = []
+            batch_ids = []
+            for topic, similar_questions, relevant_textbook in zip(topics, similar_per_topic, textbook_per_topic):
+                print(f"Generating {questions_per_topic} questions for topic: {topic}")
+            
+                for i in range(questions_per_topic):
+                    requests.append(self._build_generation_request(
+                        topic, difficulty, question_type, similar_questions, relevant_textbook
+                    ))
+                    batch_ids.append(f"{topic}_{i+1}")
+            
+            if with_evaluation:
+                generated = self._generate_with_evaluation(requests, max_concurrency)
+            else:
+                generated = self._generate_distinct(requests, max_concurrency, self.llm.generate_questions_concurrently)
+            
+            all_questions = []
+            for question, request, batch_id in zip(generated, requests, batch_ids):
+                question = self._add_generation_metadata(question, request, top_k_questions, top_k_textbook)
+                question["batch_id"] = batch_id
                 all_questions.append(question)
         
-        return all_questions
+        # Timings cover the whole batch
+        return [self._attach_timings(question, trace) for question in all_questions]
     
-    def evaluate_generated_questions(self, questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Evaluate a batch of generated questions"""
-        
-        evaluated_questions = []
-        
-        for question in questions:
-            evaluation = self.llm.evaluate_question_quality(question)
+    @property
+    def job_queue(self) -> JobQueue:
+        """Persistent job queue, resuming any unfinished jobs from a previous run when first used"""
+        if self._job_queue is None:
+            self._job_queue = JobQueue(self.config.JOB_QUEUE_PATH, self, workers=self.config.JOB_WORKERS,
+                                       max_attempts=self.config.JOB_MAX_ATTEMPTS,
+                                       retry_backoff=self.config.JOB_RETRY_BACKOFF,
+                                       retry_backoff_max=self.config.JOB_RETRY_BACKOFF_MAX,
+                                       lease_seconds=self.config.JOB_LEASE_SECONDS).start()
+        return self._job_queue
+    
+    def submit_batch_job(self,
+                         topics: List[str],
+                         difficulty: str = "Medium",
+                         question_type: str = "Multiple Choice",
+                         questions_per_topic: int = 1,
+                         question_filters: Optional[Dict[str, Any]] = None,
+                         textbook_filters: Optional[Dict[str, Any]] = None,
+                         with_evaluation: bool = False) -> str:
+        """
+        Queue a batch_generate_questions-style batch and return a job ID immediately.
+        Each question is checkpointed when done; track it with get_job_status / get_job_results.
+        """
+        return self.job_queue.submit(topics, difficulty, question_type, questions_per_topic,
+                                     question_filters, textbook_filters, with_evaluation)
+    
+    def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.job_queue.status(job_id)
+    
+    def get_job_results(self, job_id: str, include_failed: bool = False) -> List[Dict[str, Any]]:
+        """Questions finished so far, including those of unfinished jobs"""
+        return self.job_queue.results(job_id, include_failed)
+    
+    def evaluate_generated_questions(self, questions: List[Dict[str, Any]], max_concurrency: int = None) -> List[Dict[str, Any]]:
+        """
+        Evaluate a batch of generated questions concurrently.
+        They first pass the near-duplicate gate: questions too close to a stored
+        question or an earlier one in the list are flagged under "near_duplicate"
+        and returned without an evaluation.
+        """
+        self._flag_near_duplicates(questions)
+        return self._evaluate_questions(questions, max_concurrency)
+    
+    def _evaluate_questions(self, questions: List[Dict[str, Any]], max_concurrency: int = None) -> List[Dict[str, Any]]:
+        """Add an "evaluation" to every question not flagged as a near-duplicate; those are not worth a call"""
+        evaluated = [q for q in questions if "near_duplicate" not in q]
+        for question, evaluation in zip(evaluated, self.llm.evaluate_questions_concurrently(evaluated, max_concurrency)):
             question["evaluation"] = evaluation
-            evaluated_questions.append(question)
-        
-        return evaluated_questions
+        return questions
     
     def get_database_stats(self) -> Dict[str, Any]:
         """Get statistics about the current database"""
         try:
             questions_count = self.embedding_system.questions_collection.count()
             textbook_count = self.embedding_system.textbook_collection.count()
+            embedding_cache = self.embedding_system.embedding_cache
+            retrieval_cache = self.embedding_system.retrieval_cache
+            lexical_index = self.embedding_system.lexical_index
+            llm_cache = self.llm.response_cache
+            histograms = self.tracer.sink(HistogramSink)
             
             return {
                 "questions_in_database": questions_count,
                 "textbook_chunks_in_database": textbook_count,
-                "database_path": self.config.VECTOR_DB_PATH
+                "database_path": self.config.VECTOR_DB_PATH,
+                "embedding_models": ModelRegistry.stats(),
+                "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+                "retrieval_cache": retrieval_cache.stats() if retrieval_cache else None,
+                "lexical_index": lexical_index.stats() if lexical_index else None,
+                "llm_cache": llm_cache.stats() if llm_cache else None,
+                "llm_backend": self.llm.backend_name,
+                "instrumentation": histograms.stats() if histograms else None,
+                "vector_store": {
+                    "backend": self.embedding_system.backend,
+                    "questions": self.embedding_system.questions_collection.stats(),
+                    "textbook": self.embedding_system.textbook_collection.stats()
+                }
             }
         except Exception as e:
             return {"error": f"Failed to get database stats: {str(e)}"}
\ No newline at end of file
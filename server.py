@@ -0,0 +1,352 @@
+import argparse
+import asyncio
+import contextvars
+import json
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional
+import anyio
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from starlette.types import Receive, Scope, Send
+from config import Config
+from question_generator import QuestionGenerator
+from instrumentation import PrometheusSink
+
+
+class GenerateRequest(BaseModel):
+    topic: str
+    difficulty: str = "Medium"
+    question_type: str = "Multiple Choice"
+    top_k_questions: Optional[int] = None
+    top_k_textbook: Optional[int] = None
+    question_filters: Optional[Dict[str, Any]] = None
+    textbook_filters: Optional[Dict[str, Any]] = None
+    with_evaluation: bool = False
+
+
+class BatchGenerateRequest(BaseModel):
+    topics: List[str]
+    difficulty: str = "Medium"
+    question_type: str = "Multiple Choice"
+    questions_per_topic: int = 1
+    max_concurrency: Optional[int] = None
+    question_filters: Optional[Dict[str, Any]] = None
+    textbook_filters: Optional[Dict[str, Any]] = None
+    with_evaluation: bool = False
+
+
+class SearchRequest(BaseModel):
+    query: str
+    collection: str = "both"  # "questions", "textbook" or "both"
+    top_k_questions: Optional[int] = None
+    top_k_textbook: Optional[int] = None
+    question_filters: Optional[Dict[str, Any]] = None
+    textbook_filters: Optional[Dict[str, Any]] = None
+    nprobe: Optional[int] = None  # IVF clusters probed for textbook results (VECTOR_INDEX = "ivf")
+
+
+class IngestRequest(BaseModel):
+    questions: Optional[List[Dict[str, Any]]] = None
+    textbook_content: Optional[str] = None
+    # Names the payload like a file: a later ingest with the same source replaces it.
+    # Without a source every ingest only adds.
+    source: Optional[str] = None
+    incremental: bool = True
+
+
+class ConcurrencyLimiter:
+    """
+    Backpressure for one class of requests: at most `limit` run at once,
+    up to `max_waiting` more wait for a slot for at most queue_timeout
+    seconds, and everything beyond that is rejected with 503 + Retry-After.
+    """
+
+    def __init__(self, name: str, limit: int, max_waiting: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    def _busy(self) -> HTTPException:
+        self.rejected += 1
+        return HTTPException(status_code=503, detail=f"Too many concurrent {self.name} requests",
+                             headers={"Retry-After": str(max(int(self.queue_timeout), 1))})
+
+    async def acquire(self):
+        if not self._semaphore.locked():
+            # A free slot is taken without yielding to the event loop
+            await self._semaphore.acquire()
+            self.active += 1
+            return
+        if self.waiting >= self.max_waiting:
+            raise self._busy()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._busy()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limit": self.limit, "active": self.active, "waiting": self.waiting, "rejected": self.rejected}
+
+
+class SlotStreamingResponse(StreamingResponse):
+    """StreamingResponse that releases a ConcurrencyLimiter slot however it ends, even if the body never starts"""
+
+    def __init__(self, content, limiter: ConcurrencyLimiter, **kwargs):
+        super().__init__(content, **kwargs)
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.limiter.release()
+
+
+def create_app(config: Config = None, generator: QuestionGenerator = None) -> FastAPI:
+    """
+    ASGI app serving one QuestionGenerator, so the embedding model, vector
+    store and LLM connection pool are shared by all requests. Query encodes
+    from concurrent requests are micro-batched (EMBEDDING_BATCH_*).
+    """
+    config = config or Config()
+    state: Dict[str, Any] = {"generator": generator}
+    limiters = {
+        "generation": ConcurrencyLimiter("generation", config.SERVER_MAX_CONCURRENT_GENERATIONS,
+                                         config.SERVER_MAX_WAITING, config.SERVER_QUEUE_TIMEOUT),
+        "search": ConcurrencyLimiter("search", config.SERVER_MAX_CONCURRENT_SEARCHES,
+                                     config.SERVER_MAX_WAITING, config.SERVER_QUEUE_TIMEOUT),
+        # Ingests write to the store; one at a time, and callers are told to retry instead of queueing
+        "ingest": ConcurrencyLimiter("ingest", 1, 0, 0.0),
+    }
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Blocking work in request handlers runs on anyio's thread pool; size it for the limits above
+        anyio.to_thread.current_default_thread_limiter().total_tokens = (
+            config.SERVER_MAX_CONCURRENT_GENERATIONS + config.SERVER_MAX_CONCURRENT_SEARCHES + 2
+        )
+        if state["generator"] is None:
+            state["generator"] = await run_in_threadpool(QuestionGenerator, config)
+        embedding_system = state["generator"].embedding_system
+        if embedding_system.query_batcher is None:
+            embedding_system.enable_query_batching(config.EMBEDDING_BATCH_MAX_SIZE, config.EMBEDDING_BATCH_WAIT_MS)
+        # Load the model before the load balancer sends traffic
+        await run_in_threadpool(embedding_system.create_embeddings, ["warm up"])
+        # Open the collections so the BM25 index is loaded before the first search
+        await run_in_threadpool(embedding_system.open_collections)
+        yield
+
+    app = FastAPI(title="RAG Question Generator", lifespan=lifespan)
+
+    def get_generator() -> QuestionGenerator:
+        return state["generator"]
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def stats():
+        generator = get_generator()
+        database = await run_in_threadpool(generator.get_database_stats)
+        batcher = generator.embedding_system.query_batcher
+        return {
+            "database": database,
+            "embedding_batcher": batcher.stats() if batcher else None,
+            "limits": {name: limiter.stats() for name, limiter in limiters.items()},
+            "llm_usage": generator.llm.usage_stats(),
+        }
+
+    @app.get("/metrics")
+    async def metrics():
+        sink = get_generator().tracer.sink(PrometheusSink)
+        if sink is None:
+            raise HTTPException(status_code=404, detail="Enable the prometheus instrumentation sink for /metrics")
+        return PlainTextResponse(sink.render(), media_type="text/plain; version=0.0.4")
+
+    @app.post("/generate")
+    async def generate(request: GenerateRequest):
+        async with limiters["generation"].slot():
+            question = await run_in_threadpool(
+                get_generator().generate_new_question,
+                topic=request.topic,
+                difficulty=request.difficulty,
+                question_type=request.question_type,
+                top_k_questions=request.top_k_questions,
+                top_k_textbook=request.top_k_textbook,
+                question_filters=request.question_filters,
+                textbook_filters=request.textbook_filters,
+                with_evaluation=request.with_evaluation
+            )
+        # The LLM call failed; let the load balancer count it as an upstream error
+        return JSONResponse(question, status_code=502 if "error" in question else 200)
+
+    @app.post("/generate/stream")
+    async def generate_stream(request: GenerateRequest):
+        """Server-sent events: the generate_new_question_stream events, one JSON object per event"""
+        limiter = limiters["generation"]
+        # Taken before the response starts so a full server still answers 503;
+        # from here on the response owns the slot
+        await limiter.acquire()
+        try:
+            events = get_generator().generate_new_question_stream(
+                topic=request.topic,
+                difficulty=request.difficulty,
+                question_type=request.question_type,
+                top_k_questions=request.top_k_questions,
+                top_k_textbook=request.top_k_textbook,
+                question_filters=request.question_filters,
+                textbook_filters=request.textbook_filters,
+                with_evaluation=request.with_evaluation
+            )
+
+            # Every step runs in the same context so the generator's trace spans the whole stream
+            context = contextvars.copy_context()
+
+            async def body():
+                try:
+                    while True:
+                        event = await run_in_threadpool(context.run, next, events, None)
+                        if event is None:
+                            break
+                        yield f"data: {json.dumps(event)}\n\n"
+                finally:
+                    await run_in_threadpool(context.run, events.close)
+
+            return SlotStreamingResponse(body(), limiter, media_type="text/event-stream")
+        except BaseException:
+            limiter.release()
+            raise
+
+    @app.post("/batch-generate")
+    async def batch_generate(request: BatchGenerateRequest):
+        count = len(request.topics) * request.questions_per_topic
+        if count > config.SERVER_MAX_BATCH_QUESTIONS:
+            raise HTTPException(status_code=413,
+                                detail=f"{count} questions requested; the limit is {config.SERVER_MAX_BATCH_QUESTIONS}")
+        async with limiters["generation"].slot():
+            questions = await run_in_threadpool(
+                get_generator().batch_generate_questions,
+                topics=request.topics,
+                difficulty=request.difficulty,
+                question_type=request.question_type,
+                questions_per_topic=request.questions_per_topic,
+                max_concurrency=request.max_concurrency,
+                question_filters=request.question_filters,
+                textbook_filters=request.textbook_filters,
+                with_evaluation=request.with_evaluation
+            )
+        return {"questions": questions}
+
+    @app.post("/jobs")
+    async def submit_job(request: BatchGenerateRequest):
+        """Queue a batch as a background job (see JobQueue); returns its ID right away"""
+        job_id = await run_in_threadpool(
+            get_generator().submit_batch_job,
+            topics=request.topics,
+            difficulty=request.difficulty,
+            question_type=request.question_type,
+            questions_per_topic=request.questions_per_topic,
+            question_filters=request.question_filters,
+            textbook_filters=request.textbook_filters,
+            with_evaluation=request.with_evaluation
+        )
+        return JSONResponse({"job_id": job_id}, status_code=202)
+
+    @app.get("/jobs/{job_id}")
+    async def job_status(job_id: str):
+        status = await run_in_threadpool(get_generator().get_job_status, job_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+        return status
+
+    @app.get("/jobs/{job_id}/results")
+    async def job_results(job_id: str, include_failed: bool = False):
+        generator = get_generator()
+        if await run_in_threadpool(generator.get_job_status, job_id) is None:
+            raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+        return {"questions": await run_in_threadpool(generator.get_job_results, job_id, include_failed)}
+
+    @app.delete("/jobs/{job_id}")
+    async def cancel_job(job_id: str):
+        if not await run_in_threadpool(get_generator().job_queue.cancel, job_id):
+            raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+        return {"job_id": job_id, "status": "cancelled"}
+
+    @app.post("/search")
+    async def search(request: SearchRequest):
+        if request.collection not in ("questions", "textbook", "both"):
+            raise HTTPException(status_code=422, detail=f"Unknown collection: {request.collection}")
+        async with limiters["search"].slot():
+            similar, textbook = await run_in_threadpool(
+                get_generator().embedding_system.search_many,
+                question_queries=[request.query] if request.collection != "textbook" else [],
+                textbook_queries=[request.query] if request.collection != "questions" else [],
+                top_k_questions=request.top_k_questions or config.TOP_K_QUESTIONS,
+                top_k_textbook=request.top_k_textbook or config.TOP_K_TEXTBOOK,
+                question_where=request.question_filters,
+                textbook_where=request.textbook_filters,
+                textbook_nprobe=request.nprobe
+            )
+        return {
+            "questions": similar[0] if similar else [],
+            "textbook": textbook[0] if textbook else [],
+        }
+
+    @app.post("/ingest")
+    async def ingest(request: IngestRequest):
+        if not request.questions and not request.textbook_content:
+            raise HTTPException(status_code=422, detail="Provide questions and/or textbook_content")
+        generator = get_generator()
+        async with limiters["ingest"].slot():
+            await run_in_threadpool(
+                generator.initialize_database,
+                questions_data=request.questions,
+                textbook_content=request.textbook_content,
+                incremental=request.incremental,
+                source=request.source
+            )
+        return {
+            "questions_in_database": generator.embedding_system.questions_collection.count(),
+            "textbook_chunks_in_database": generator.embedding_system.textbook_collection.count(),
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the question generator over HTTP")
+    parser.add_argument("--host", default=Config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.SERVER_PORT)
+    args = parser.parse_args()
+
+    # One process holds one copy of the model; scale out with more instances behind the load balancer
+    uvicorn.run(create_app(Config()), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
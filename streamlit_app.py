@@ -17,7 +17,7 @@ st.sidebar.header("Configuration")
 
 # File uploads
 st.sidebar.subheader("Data Sources")
-questions_file = st.sidebar.file_uploader("Upload Existing Questions", type=['csv', 'json', 'txt'])
+questions_file = st.sidebar.file_uploader("Upload Existing Questions", type=['csv', 'json', 'jsonl'])
 textbook_file = st.sidebar.file_uploader("Upload Textbook Content", type=['txt'])
 
 # Parameters
@@ -39,10 +39,13 @@ if st.sidebar.button("Initialize System"):
             questions_data = None
             textbook_content = None
             
+            # The loader picks the format from the extension, so keep the uploaded one
+            questions_path = None
             if questions_file:
-                with open("temp_questions.csv", "wb") as f:
+                questions_path = "temp_questions" + os.path.splitext(questions_file.name)[1].lower()
+                with open(questions_path, "wb") as f:
                     f.write(questions_file.getbuffer())
-                questions_data = "temp_questions.csv"
+                questions_data = questions_path
             
             if textbook_file:
                 with open("temp_textbook.txt", "wb") as f:
@@ -57,8 +60,8 @@ if st.sidebar.button("Initialize System"):
             st.session_state.data_loaded = True
             
             # Clean up temp files
-            for temp_file in ["temp_questions.csv", "temp_textbook.txt"]:
-                if os.path.exists(temp_file):
+            for temp_file in [questions_path, "temp_textbook.txt"]:
+                if temp_file and os.path.exists(temp_file):
                     os.remove(temp_file)
         
         st.success("System initialized successfully!")
@@ -76,25 +79,38 @@ if st.session_state.data_loaded:
         with st.spinner(f"Generating {num_questions} questions about '{topic}'..."):
             try:
                 questions = []
+                preview = st.empty()
                 for i in range(num_questions):
-                    question_data = st.session_state.generator.generate_new_question(
+                    # Generate and evaluate (one LLM call per question in combined mode),
+                    # showing the question and options as they stream in
+                    question_text, options = "", []
+                    for event in st.session_state.generator.generate_new_question_stream(
                         topic=topic,
                         difficulty=difficulty,
                         question_type=question_type,
                         top_k_questions=top_k_questions,
-                        top_k_textbook=top_k_textbook
-                    )
-                    
-                    # Evaluate question quality
-                    evaluation = st.session_state.generator.llm.evaluate_question_quality(question_data)
-                    question_data['evaluation'] = evaluation
-                    questions.append(question_data)
+                        top_k_textbook=top_k_textbook,
+                        with_evaluation=True
+                    ):
+                        if event["type"] == "done":
+                            questions.append(event["question"])
+                            continue
+                        if event.get("key") == "question" and event["type"] in ("partial", "field"):
+                            question_text = event["value"]
+                        elif event.get("key") == "options" and event["type"] == "item":
+                            options.append(str(event["value"]))
+                        else:
+                            continue
+                        preview.markdown(
+                            f"**Question {i + 1}:** {question_text}" + "".join(f"\n- {option}" for option in options)
+                        )
+                preview.empty()
                 
                 st.success(f"Generated {len(questions)} questions!")
                 
                 # Display questions
                 for i, q_data in enumerate(questions, 1):
-                    with st.expander(f"Question {i} (Score: {q_data.get('evaluation', {}).get('overall_score', 'N/A')}/10)"):
+                    with st.expander(f"Question {i} (Score: {q_data.get('evaluation', {}).get('overall', 'N/A')}/10)"):
                         st.write("**Question:**")
                         st.write(q_data['question'])
                         
@@ -121,11 +137,13 @@ if st.session_state.data_loaded:
                             if 'clarity' in eval_data:
                                 col1, col2 = st.columns(2)
                                 with col1:
-                                    st.metric("Clarity", f"{eval_data.get('clarity', {}).get('score', 'N/A')}/10")
-                                    st.metric("Relevance", f"{eval_data.get('relevance', {}).get('score', 'N/A')}/10")
+                                    st.metric("Clarity", f"{eval_data.get('clarity', 'N/A')}/10")
+                                    st.metric("Accuracy", f"{eval_data.get('accuracy', 'N/A')}/10")
                                 with col2:
-                                    st.metric("Difficulty", f"{eval_data.get('difficulty', {}).get('score', 'N/A')}/10")
-                                    st.metric("Educational Value", f"{eval_data.get('educational_value', {}).get('score', 'N/A')}/10")
+                                    st.metric("Difficulty", f"{eval_data.get('difficulty', 'N/A')}/10")
+                                    st.metric("Educational Value", f"{eval_data.get('educational_value', 'N/A')}/10")
+                                if eval_data.get('feedback'):
+                                    st.write(f"*{eval_data['feedback']}*")
                 
                 # Download option
                 if st.button("Download Results as JSON"):
@@ -149,28 +167,40 @@ if st.session_state.data_loaded:
     if st.button("Generate for All Topics") and topics_text:
         topics_list = [topic.strip() for topic in topics_text.split('\n') if topic.strip()]
         
-        with st.spinner(f"Generating questions for {len(topics_list)} topics..."):
-            try:
-                batch_results = st.session_state.generator.batch_generate_questions(
-                    topics=topics_list,
-                    difficulty=difficulty,
-                    question_type=question_type,
-                    questions_per_topic=num_questions
-                )
-                
-                st.success(f"Generated questions for {len(topics_list)} topics!")
-                
-                # Display batch results
-                for i, q_data in enumerate(batch_results, 1):
-                    topic = q_data.get('topic', f'Question {i}')
-                    st.subheader(f"📚 {topic}")
-                    st.write(f"**Question:** {q_data['question']}")
-                    if 'options' in q_data and q_data['options']:
-                        for option in q_data['options']:
-                            st.write(option)
-                    st.write("---")
-                
-                # Download batch results
+        # Runs as a background job so the session is not blocked; progress survives restarts
+        try:
+            st.session_state.batch_job_id = st.session_state.generator.submit_batch_job(
+                topics=topics_list,
+                difficulty=difficulty,
+                question_type=question_type,
+                questions_per_topic=num_questions
+            )
+        except Exception as e:
+            st.error(f"Error in batch generation: {str(e)}")
+    
+    job_id = st.session_state.get('batch_job_id')
+    if job_id:
+        status = st.session_state.generator.get_job_status(job_id)
+        if status:
+            st.write(f"**Job {job_id[:8]}:** {status['status']} ({status['done']}/{status['total']} done"
+                     + (f", {status['failed']} failed" if status['failed'] else "") + ")")
+            st.progress(status['progress'])
+            if status['pending'] or status['running']:
+                st.button("Refresh Progress")
+            
+            # Display the questions finished so far
+            batch_results = st.session_state.generator.get_job_results(job_id)
+            for i, q_data in enumerate(batch_results, 1):
+                topic = q_data.get('topic', f'Question {i}')
+                st.subheader(f"📚 {topic}")
+                st.write(f"**Question:** {q_data['question']}")
+                if 'options' in q_data and q_data['options']:
+                    for option in q_data['options']:
+                        st.write(option)
+                st.write("---")
+            
+            # Download batch results
+            if batch_results:
                 batch_json = json.dumps(batch_results, indent=2)
                 st.download_button(
                     label="Download All Results",
@@ -178,9 +208,6 @@ if st.session_state.data_loaded:
                     file_name="batch_generated_questions.json",
                     mime="application/json"
                 )
-                
-            except Exception as e:
-                st.error(f"Error in batch generation: {str(e)}")
 
 else:
     st.info("👆 Please upload data files and initialize the system using the sidebar.")
@@ -0,0 +1,67 @@
+import hashlib
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from model_registry import ModelRegistry, SharedModel
+
+
+class HashingEncoder:
+    """
+    Deterministic stand-in for a SentenceTransformer in unit tests: a normalized
+    bag of hashed words, so texts sharing words are similar and nothing is downloaded
+    """
+
+    dim = 64
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        self.calls.append(list(texts))
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in str(text).lower().split():
+                vectors[row, int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.dim] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def half(self):
+        return self
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    """Every SharedModel loads a HashingEncoder instead of a real model"""
+    encoder = HashingEncoder()
+    monkeypatch.setattr(SharedModel, "_load", lambda self: encoder)
+    ModelRegistry.clear()
+    yield encoder
+    ModelRegistry.clear()
+
+
+@pytest.fixture
+def config(tmp_path, encoder):
+    """A Config writing everything under tmp_path, with the numpy store and the offline LLM stub"""
+
+    class TestConfig(Config):
+        OPENAI_API_KEY = "test"
+        LLM_BACKEND = "stub"
+        LLM_CACHE_PATH = None
+        VECTOR_DB_BACKEND = "numpy"
+        VECTOR_DB_PATH = str(tmp_path / "vector_db")
+        INGEST_MANIFEST_PATH = str(tmp_path / "vector_db" / "ingest_manifest.json")
+        EMBEDDING_CACHE_PATH = str(tmp_path / "embedding_cache")
+        JOB_QUEUE_PATH = str(tmp_path / "jobs" / "jobs.db")
+        INSTRUMENTATION_LOG_PATH = str(tmp_path / "logs" / "traces.jsonl")
+        INGEST_WORKERS = 1
+        AUDIT_SAMPLE_RATE = 0.0
+
+    return TestConfig()
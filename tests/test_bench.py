@@ -0,0 +1,34 @@
+from bench.bench_end_to_end import bench_generation, bench_ingest, bench_retrieval
+from bench.synthetic_corpus import SUBJECTS, make_queries, make_questions, make_textbook, write_corpus
+from data_processor import DataProcessor
+from question_generator import QuestionGenerator
+
+
+def test_corpus_is_deterministic_and_sized():
+    assert make_questions(20, seed=3) == make_questions(20, seed=3)
+    assert make_questions(20, seed=3) != make_questions(20, seed=4)
+    text = make_textbook(0.05, seed=1)
+    assert text == make_textbook(0.05, seed=1)
+    assert 50_000 <= len(text) < 52_000
+    assert make_queries(5, seed=2) == make_queries(5, seed=2)
+
+
+def test_textbook_chapters_are_found_by_the_chunker():
+    chunks = DataProcessor(chunk_size=500, chunk_overlap=50).process_textbook(make_textbook(0.02, paragraphs_per_chapter=3))
+    chapters = {chunk["chapter"] for chunk in chunks}
+    assert {f"Chapter {n}: {subject}" for n, subject in enumerate(SUBJECTS, 1)} <= chapters
+
+
+def test_benchmark_stages_run_on_a_small_corpus(config, tmp_path):
+    questions_path, textbook_path = write_corpus(str(tmp_path / "corpus"), 30, 0.01)
+    generator = QuestionGenerator(config)
+
+    ingest = bench_ingest(generator, questions_path, textbook_path)
+    assert ingest["questions"] == 30 and ingest["textbook_chunks"] > 0
+
+    retrieval = bench_retrieval(generator, make_queries(5), 3, 2)
+    assert retrieval["questions"]["count"] == retrieval["textbook"]["count"] == 5
+
+    generation = bench_generation(generator, make_queries(2), make_queries(3, seed=9), max_concurrency=2)
+    assert generation["single"]["errors"] == generation["batch"]["errors"] == 0
+    assert generation["batch"]["questions"] == 3
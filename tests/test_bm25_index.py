@@ -0,0 +1,62 @@
+from bm25_index import BM25Index, tokenize
+
+DOCS = {
+    "a": "Photosynthesis turns light into sugar: 6CO2 + 6H2O",
+    "b": "Cellular respiration releases energy from sugar",
+    "c": "The derivative of a function measures its rate of change",
+}
+
+
+def make_index():
+    index = BM25Index()
+    index.add(list(DOCS), list(DOCS.values()), [{"topic": t} for t in ("bio", "bio", "math")])
+    return index
+
+
+def test_tokenize_keeps_formulas_whole():
+    assert tokenize("6CO2 + 6H2O -> Sugar") == ["6co2", "6h2o", "sugar"]
+
+
+def test_search_ranks_by_keyword_match():
+    index = make_index()
+    assert [doc for doc, _ in index.search("6CO2 sugar")][0] == "a"
+    assert [doc for doc, _ in index.search("derivative")] == ["c"]
+    assert index.search("unknown words") == []
+    assert [doc for doc, _ in index.search("sugar", where={"topic": "math"})] == []
+
+
+def test_replacing_and_removing_documents():
+    index = make_index()
+    index.add(["a"], ["Derivative rules"])
+    assert sorted(doc for doc, _ in index.search("derivative")) == ["a", "c"]
+    index.remove(["c", "missing"])
+    assert [doc for doc, _ in index.search("derivative")] == ["a"]
+    assert len(index) == 2
+
+
+def test_compaction_keeps_results():
+    index = BM25Index()
+    index.add([f"d{i}" for i in range(20)], [f"word{i % 4} common" for i in range(20)])
+    index.remove([f"d{i}" for i in range(0, 20, 4)] + ["d1"])
+    assert index.stats()["tombstones"] == 0
+    assert index.search("word0", top_k=20) == []
+    assert sorted(doc for doc, _ in index.search("word1", top_k=20)) == ["d13", "d17", "d5", "d9"]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = make_index()
+    index.remove(["b"])
+    index.save(str(tmp_path / "bm25"))
+
+    loaded = BM25Index()
+    assert loaded.load(str(tmp_path / "bm25"))
+    assert len(loaded) == 2
+    for query in ("sugar", "derivative change", "6h2o"):
+        assert loaded.search(query) == index.search(query)
+    assert loaded.search("sugar", where={"topic": "math"}) == []
+    loaded.add(["d"], ["More sugar"])
+    assert "d" in dict(loaded.search("sugar"))
+
+
+def test_load_without_a_saved_copy(tmp_path):
+    assert not BM25Index().load(str(tmp_path / "missing"))
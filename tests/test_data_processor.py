@@ -0,0 +1,109 @@
+import pandas as pd
+import pytest
+from data_processor import DataProcessor, SECTION_HEADING
+
+
+@pytest.mark.parametrize("line", [
+    "Chapter 2: Cell Structure",
+    "  CHAPTER IV The Cell",
+    "Part II",
+    "Unit 3.1",
+    "Chapter 7 - Ecology",
+])
+def test_heading_lines(line):
+    assert SECTION_HEADING.fullmatch(line)
+
+
+@pytest.mark.parametrize("line", [
+    "Part of the light is reflected by the leaf.",
+    "Part I of the experiment was done in the lab.",
+    "Chapter 3 covers the basics of",
+    "Unit 5 is measured in meters.",
+    "Chapter 2: " + "very long title " * 10,
+])
+def test_prose_is_not_a_heading(line):
+    assert not SECTION_HEADING.search(line)
+
+
+def test_headings_are_normalized_into_chapter_metadata():
+    processor = DataProcessor(chunk_size=200, chunk_overlap=20)
+    text = ("Intro text.\nChapter   1:  The Cell*\nCells are small.\n"
+            "Part of the light is reflected by the leaf.\nChapter 2: Energy\nATP stores energy.\n")
+    chapters = [chunk["chapter"] for chunk in processor.process_textbook(text)]
+    assert chapters == ["Unknown", "Chapter 1: The Cell", "Chapter 2: Energy"]
+
+
+def test_a_line_cut_between_blocks_is_not_a_heading():
+    processor = DataProcessor(chunk_size=100, chunk_overlap=10)
+    # One line longer than the split threshold, so it is cut without a newline
+    long_line = "word " * 100 + "Chapter 9: Not A Heading"
+    chunks = list(processor.iter_textbook_chunks([long_line[:450], long_line[450:] + "\nChapter 2: Real\nText.\n"]))
+    assert {chunk["chapter"] for chunk in chunks} == {"Unknown", "Chapter 2: Real"}
+
+
+def test_ids_are_stable_and_depend_on_source():
+    processor = DataProcessor()
+    questions = [{"question": "What is osmosis?", "answer": "Diffusion of water", "topic": "Bio"}]
+    first = processor.process_questions(questions, source="a")
+    assert first[0]["id"] == processor.process_questions(questions, source="a")[0]["id"]
+    assert first[0]["id"] != processor.process_questions(questions, source="b")[0]["id"]
+
+
+def test_editing_one_chapter_keeps_the_other_chapters_ids():
+    processor = DataProcessor(chunk_size=100, chunk_overlap=10)
+    before = "Chapter 1: A\n" + "alpha " * 40 + "\nChapter 2: B\n" + "beta " * 40
+    after = "Chapter 1: A\n" + "alpha " * 40 + "\nChapter 2: B\n" + "gamma " * 40
+    ids = lambda text, chapter: {c["id"] for c in processor.process_textbook(text) if c["chapter"] == chapter}
+    assert ids(before, "Chapter 1: A") == ids(after, "Chapter 1: A")
+    assert ids(before, "Chapter 2: B").isdisjoint(ids(after, "Chapter 2: B"))
+
+
+@pytest.mark.parametrize("block_size", [7, 64, 1000, 1 << 20])
+def test_streamed_chunks_match_whole_text_chunks(tmp_path, block_size):
+    processor = DataProcessor(chunk_size=120, chunk_overlap=20)
+    text = "".join(f"Chapter {n}: Topic {n}\n" + f"Sentence {n} about   cells, energy & life. " * 30 + "\n"
+                   for n in range(1, 4))
+    path = tmp_path / "book.txt"
+    path.write_text(text, encoding="utf-8")
+
+    whole = processor.process_textbook(text, source="book")
+    streamed = list(processor.iter_textbook_file(str(path), source="book", block_size=block_size))
+    assert [(c["id"], c["content"], c["chapter"]) for c in streamed] == \
+        [(c["id"], c["content"], c["chapter"]) for c in whole]
+
+
+def test_chunk_offsets_point_into_the_cleaned_text():
+    processor = DataProcessor(chunk_size=80, chunk_overlap=10)
+    text = "Some   text with  spacing. " * 20
+    cleaned = processor.clean_text(text)
+    for chunk in processor.process_textbook(text):
+        assert cleaned[chunk["start_char"]:chunk["end_char"]] == chunk["content"]
+
+
+def test_chunk_offsets_are_relative_to_their_chapter():
+    processor = DataProcessor(chunk_size=80, chunk_overlap=10)
+    chapter_two = "\nChapter 2: Water\n" + "Osmosis moves water across membranes. " * 10
+    before = processor.process_textbook("Chapter 1: Cells\n" + "Cells make ATP. " * 10 + chapter_two)
+    after = processor.process_textbook("Chapter 1: Cells\n" + "Cells make ATP. " * 30 + chapter_two)
+
+    spans = lambda chunks: [(c["id"], c["start_char"], c["end_char"]) for c in chunks if c["chapter"] == "Chapter 2: Water"]
+    assert spans(after) == spans(before)
+    assert spans(before)[0][1] == 0
+
+
+def test_question_ids_match_between_dicts_and_frames():
+    rows = [
+        {"question": "What is osmosis?", "answer": "Diffusion", "topic": "Biology", "difficulty": "Easy"},
+        {"question": "What is a cell?", "answer": "A unit"},
+        {"question": "What is ATP?", "answer": None, "topic": "", "difficulty": None},
+        {"question": "What is pH?", "answer": "Acidity", "topic": float("nan"), "difficulty": "  "},
+        {"question": None, "answer": "Skipped"},
+    ]
+    processor = DataProcessor()
+    from_dicts = processor.process_questions(rows)
+    from_frame = processor.process_question_frame(pd.DataFrame.from_records(rows))
+
+    assert [q["id"] for q in from_dicts] == from_frame["id"]
+    assert [q["topic"] for q in from_dicts] == from_frame["topic"] == ["Biology", "General", "General", "General"]
+    assert [q["difficulty"] for q in from_dicts] == ["Easy", "Medium", "Medium", "Medium"]
+    assert [q["content"] for q in from_dicts] == from_frame["content"]
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from embedding_cache import EmbeddingCache
+from conftest import HashingEncoder
+
+
+def test_only_misses_are_encoded(tmp_path):
+    model = HashingEncoder()
+    cache = EmbeddingCache(str(tmp_path), "m")
+    first = cache.encode(model, ["a b", "c d"])
+    second = cache.encode(model, ["c d", "a  b", "e f"])
+
+    assert model.calls == [["a b", "c d"], ["e f"]]
+    np.testing.assert_allclose(second[0], first[1])
+    # Whitespace-only differences share an entry
+    np.testing.assert_allclose(second[1], first[0])
+    assert cache.stats()["hits"] == 2
+
+
+def test_entries_survive_reopening(tmp_path):
+    model = HashingEncoder()
+    EmbeddingCache(str(tmp_path), "m").encode(model, ["persisted text"])
+    reopened = EmbeddingCache(str(tmp_path), "m")
+    reopened.encode(model, ["persisted text"])
+    assert model.calls == [["persisted text"]]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    model = HashingEncoder()
+    cache = EmbeddingCache(str(tmp_path), "m", max_entries=2)
+    cache.encode(model, ["one"])
+    cache.encode(model, ["two"])
+    cache.encode(model, ["one"])
+    cache.encode(model, ["three"])
+
+    assert cache.stats()["evictions"] == 1
+    model.calls.clear()
+    cache.encode(model, ["one", "two"])
+    assert model.calls == [["two"]]
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "m")
+    cache.put_many(["k1"], np.ones((1, 4)))
+    with pytest.raises(ValueError):
+        cache.put_many(["k2"], np.ones((1, 8)))
+
+
+def test_caches_sharing_a_directory_never_share_slots(tmp_path):
+    # Two handles on one directory stand in for two processes
+    first = EmbeddingCache(str(tmp_path), "m")
+    second = EmbeddingCache(str(tmp_path), "m")
+    first.put_many(["a"], np.full((1, 4), 1.0))
+    second.put_many(["b", "c"], np.full((2, 4), 2.0))
+    first.put_many(["d"], np.full((1, 4), 3.0))
+
+    for cache in (first, second, EmbeddingCache(str(tmp_path), "m")):
+        found = cache.get_many(["a", "b", "c", "d"])
+        assert {key: float(vector[0]) for key, vector in found.items()} == {"a": 1.0, "b": 2.0, "c": 2.0, "d": 3.0}
+
+
+def test_precision_and_normalization_get_separate_entries(tmp_path):
+    EmbeddingCache(str(tmp_path), "m").put_many(["k"], np.ones((1, 4)))
+    assert EmbeddingCache(str(tmp_path), "m", precision="float16").get_many(["k"]) == {}
+    normalized = EmbeddingCache(str(tmp_path), "m", normalize=True)
+    assert normalized.get_many(["k"]) == {}
+    with pytest.raises(ValueError):
+        normalized.encode(HashingEncoder(), ["text"], normalize_embeddings=False)
@@ -0,0 +1,120 @@
+import pytest
+from data_processor import DataProcessor
+from embedding_system import EmbeddingSystem
+
+QUESTIONS = [
+    {"question": "What is osmosis?", "answer": "Diffusion of water", "topic": "Biology", "difficulty": "Easy"},
+    {"question": "What does a mitochondrion do?", "answer": "It makes ATP", "topic": "Biology", "difficulty": "Hard"},
+    {"question": "What is the derivative of x squared?", "answer": "2x", "topic": "Math", "difficulty": "Medium"},
+]
+
+TEXTBOOK = """Chapter 1: Cells
+Cells are the basic unit of life. The mitochondrion makes ATP for the cell.
+Chapter 2: Water
+Osmosis is the diffusion of water across a membrane.
+Chapter 3: Calculus
+The derivative measures how a function changes.
+"""
+
+
+def make_system(tmp_path, **kwargs):
+    kwargs.setdefault("backend", "numpy")
+    kwargs.setdefault("hybrid_search", False)
+    es = EmbeddingSystem("m", db_path=str(tmp_path / "db"), **kwargs)
+    es.setup_collections("questions", "textbook")
+    processor = DataProcessor(chunk_size=100, chunk_overlap=10)
+    es.add_questions_to_db(processor.process_questions(QUESTIONS))
+    es.add_textbook_to_db(processor.process_textbook(TEXTBOOK))
+    return es
+
+
+@pytest.fixture
+def system(tmp_path, encoder):
+    return make_system(tmp_path)
+
+
+def test_search_many_matches_single_searches(system):
+    queries = ["water diffusion", "ATP energy", "derivative"]
+    similar, textbook = system.search_many(question_queries=queries, textbook_queries=queries,
+                                           top_k_questions=2, top_k_textbook=2)
+    system.retrieval_cache.clear()
+    for i, query in enumerate(queries):
+        assert similar[i] == system.search_similar_questions(query, top_k=2)
+        assert textbook[i] == system.search_relevant_textbook(query, top_k=2)
+
+
+def test_search_many_encodes_all_queries_in_one_call(system, encoder):
+    encoder.calls.clear()
+    system.search_many(question_queries=["a b", "c d"], textbook_queries=["c d", "e f"])
+    assert encoder.calls == [["a b", "c d", "e f"]]
+
+
+def test_repeated_queries_get_independent_results(system):
+    similar, _ = system.search_many(question_queries=["osmosis", "osmosis"], top_k_questions=1)
+    similar[0][0]["question"] = "changed"
+    assert similar[1][0]["question"] == "What is osmosis?"
+
+
+def test_writes_invalidate_cached_results(system):
+    before = system.search_similar_questions("photosynthesis light", top_k=5)
+    assert system.search_similar_questions("photosynthesis light", top_k=5) == before
+    assert system.retrieval_cache.stats()["hits"] == 1
+
+    system.add_questions_to_db(DataProcessor().process_questions(
+        [{"question": "What is photosynthesis?", "answer": "Light to sugar", "topic": "Biology"}]))
+    after = system.search_similar_questions("photosynthesis light", top_k=5)
+    assert len(after) == len(before) + 1
+
+
+def test_filtered_search(system):
+    hits = system.search_similar_questions("what is", top_k=5, where={"difficulty": {"$in": ["Easy", "Hard"]}})
+    assert {hit["difficulty"] for hit in hits} == {"Easy", "Hard"}
+    chunks = system.search_relevant_textbook("water", top_k=5, where={"chapter": "Chapter 2: Water"})
+    assert [chunk["chapter"] for chunk in chunks] == ["Chapter 2: Water"]
+
+
+def test_bm25_index_is_saved_at_ingest_and_loaded_on_open(tmp_path, encoder):
+    built = make_system(tmp_path, hybrid_search=True)
+    built.build_textbook_index()
+
+    reopened = EmbeddingSystem("m", db_path=str(tmp_path / "db"), backend="numpy", hybrid_search=True)
+    reopened.setup_collections("questions", "textbook")
+    rebuilt = []
+    reopened.lexical_index.add = lambda *args: rebuilt.append(args)
+    reopened.open_collections()
+    assert rebuilt == []
+    assert len(reopened.lexical_index) == built.textbook_collection.count()
+    assert reopened.search_relevant_textbook("derivative", top_k=1)[0]["bm25_score"] > 0
+
+
+def test_bm25_index_follows_writes_and_rebuilds_stale_copies(tmp_path, encoder):
+    es = make_system(tmp_path, hybrid_search=True)
+    es.build_textbook_index()
+    chunk = DataProcessor().process_textbook("Chapter 4: Light\nPhotosynthesis splits 6H2O.")[0]
+    es.add_textbook_to_db([chunk])
+    assert es.search_relevant_textbook("6H2O", top_k=1)[0]["id"] == chunk["id"]
+
+    # Not saved since the write, so the copy on disk is one chunk short and gets rebuilt
+    reopened = EmbeddingSystem("m", db_path=str(tmp_path / "db"), backend="numpy", hybrid_search=True)
+    reopened.setup_collections("questions", "textbook")
+    reopened.open_collections()
+    assert len(reopened.lexical_index) == es.textbook_collection.count()
+
+    reopened.delete_textbook_chunks([chunk["id"]])
+    assert all(hit["id"] != chunk["id"] for hit in reopened.search_relevant_textbook("6H2O", top_k=3))
+
+
+def test_results_racing_a_write_are_not_cached_under_the_new_version(system):
+    collection = system.questions_collection
+    query = collection.query
+
+    def query_during_write(**kwargs):
+        results = query(**kwargs)
+        system.add_questions_to_db(DataProcessor().process_questions(
+            [{"question": "What is photosynthesis?", "answer": "Light to sugar", "topic": "Biology"}]))
+        return results
+
+    collection.query = query_during_write
+    before = system.search_similar_questions("photosynthesis light", top_k=5)
+    collection.query = query
+    assert len(system.search_similar_questions("photosynthesis light", top_k=5)) == len(before) + 1
@@ -0,0 +1,55 @@
+import json
+import pytest
+from incremental_json import IncrementalJSONParser
+
+DOCUMENT = {
+    "question": "Which gas do plants take in? \"CO2\" — or O2",
+    "options": ["A) CO2", "B) O2", "C) N2"],
+    "correct_answer": "A",
+    "evaluation": {"overall": 8, "notes": ["ok", {"x": "}"}]},
+    "score": 7.5,
+    "final": True,
+}
+
+
+def feed_in_pieces(text, size):
+    parser = IncrementalJSONParser()
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return parser, events
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_fields_match_a_full_parse_for_any_split(size):
+    text = "```json\n" + json.dumps(DOCUMENT, indent=2) + "\n```"
+    parser, events = feed_in_pieces(text, size)
+    assert parser.done
+    assert parser.result == DOCUMENT
+    assert [e["key"] for e in events if e["type"] == "field"] == list(DOCUMENT)
+    assert [e["value"] for e in events if e["type"] == "item"] == DOCUMENT["options"]
+
+
+def test_string_fields_are_reported_while_they_stream():
+    parser = IncrementalJSONParser()
+    assert parser.feed('Sure: {"question": "Which g') == [{"type": "partial", "key": "question", "value": "Which g"}]
+    assert parser.feed('as?", "n"') == [{"type": "field", "key": "question", "value": "Which gas?"}]
+    assert not parser.done
+
+
+def test_incomplete_escape_is_not_reported_half_decoded():
+    parser = IncrementalJSONParser()
+    events = parser.feed('{"q": "caf\\u00')
+    assert events[-1]["value"] == "caf"
+    assert parser.feed('e9"}')[0]["value"] == "café"
+
+
+def test_array_items_are_reported_as_they_close():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"options": ["A) one", ["ne') == [{"type": "item", "key": "options", "index": 0, "value": "A) one"}]
+    assert parser.feed('sted"], {"k": 1}]}') == [
+        {"type": "item", "key": "options", "index": 1, "value": ["nested"]},
+        {"type": "item", "key": "options", "index": 2, "value": {"k": 1}},
+        {"type": "field", "key": "options", "value": ["A) one", ["nested"], {"k": 1}]},
+    ]
+    assert parser.done
@@ -0,0 +1,93 @@
+import queue
+import threading
+import time
+import pytest
+import ingest_pipeline
+from embedding_system import EmbeddingSystem
+from ingest_pipeline import IngestPipeline, chunk_textbook_file
+from data_processor import DataProcessor
+
+
+def write_books(tmp_path, count, paragraphs=40):
+    files = []
+    for n in range(count):
+        path = tmp_path / f"book{n}.txt"
+        path.write_text("".join(f"Chapter {c}: Topic {c}\n" + f"Book {n} chapter {c} sentence. " * paragraphs + "\n"
+                                for c in range(1, 4)), encoding="utf-8")
+        files.append((str(path), str(path)))
+    return files
+
+
+@pytest.fixture
+def embedding_system(tmp_path, encoder):
+    es = EmbeddingSystem("m", db_path=str(tmp_path / "db"), backend="numpy", hybrid_search=False)
+    es.setup_collections("questions", "textbook")
+    return es
+
+
+def test_pipeline_matches_sequential_chunking(tmp_path, embedding_system):
+    files = write_books(tmp_path, 3)
+    report = IngestPipeline(embedding_system, chunk_size=100, chunk_overlap=10, workers=2,
+                            batch_size=8).ingest_textbooks(files)
+
+    processor = DataProcessor(chunk_size=100, chunk_overlap=10)
+    for path, source in files:
+        expected = [c["id"] for c in processor.iter_textbook_file(path, source=source)]
+        assert report["sources"][source]["ids"] == expected
+        assert report["sources"][source]["added"] == len(expected)
+    assert embedding_system.textbook_collection.count() == sum(len(r["ids"]) for r in report["sources"].values())
+
+
+def test_known_chunks_are_not_re_embedded(tmp_path, embedding_system, encoder):
+    files = write_books(tmp_path, 1)
+    pipeline = IngestPipeline(embedding_system, chunk_size=100, chunk_overlap=10, workers=1, batch_size=8)
+    first = pipeline.ingest_textbooks(files)
+    encoder.calls.clear()
+
+    source = files[0][1]
+    second = pipeline.ingest_textbooks(files, previous_ids={source: set(first["sources"][source]["ids"])})
+    assert second["sources"][source]["added"] == 0
+    assert encoder.calls == []
+
+
+def test_workers_send_chunks_in_bounded_batches(tmp_path, monkeypatch):
+    path, source = write_books(tmp_path, 1, paragraphs=200)[0]
+    sent = queue.Queue()
+    monkeypatch.setattr(ingest_pipeline, "_chunk_queue", sent)
+
+    summary = chunk_textbook_file(path, source, 100, 10, batch_size=5)
+    messages = [sent.get() for _ in range(sent.qsize())]
+    batches = [payload for kind, _, payload in messages if kind == "chunks"]
+    assert messages[-1] == ("done", source, summary)
+    assert max(len(batch) for batch in batches) == 5
+    assert sum(len(batch) for batch in batches) == summary["chunks"]
+
+
+def test_encoder_failure_is_raised_instead_of_hanging(tmp_path, embedding_system, monkeypatch):
+    files = write_books(tmp_path, 4, paragraphs=200)
+    calls = []
+
+    def failing_create_embeddings(texts):
+        calls.append(len(texts))
+        if len(calls) == 3:
+            # Fail only once the ingest thread is blocked on the full encode queue
+            time.sleep(0.5)
+            raise RuntimeError("encoder failed")
+        return embedding_system.model.encode(texts)
+
+    monkeypatch.setattr(embedding_system, "create_embeddings", failing_create_embeddings)
+    pipeline = IngestPipeline(embedding_system, chunk_size=100, chunk_overlap=10, workers=2,
+                              batch_size=4, queue_size=2)
+    outcome = {}
+
+    def run():
+        try:
+            pipeline.ingest_textbooks(files)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(60)
+    assert not thread.is_alive(), "ingest hung after the encoder failed"
+    assert str(outcome["error"]) == "encoder failed"
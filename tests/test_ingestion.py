@@ -0,0 +1,83 @@
+import pytest
+from question_generator import QuestionGenerator
+
+QUESTIONS = [
+    {"question": "What is osmosis?", "answer": "Diffusion of water", "topic": "Biology", "difficulty": "Easy"},
+    {"question": "What is a cell?", "answer": "The unit of life", "topic": "Biology", "difficulty": "Easy"},
+]
+
+
+@pytest.fixture
+def generator(config):
+    return QuestionGenerator(config)
+
+
+def counts(generator):
+    es = generator.embedding_system
+    return es.questions_collection.count(), es.textbook_collection.count()
+
+
+def test_unnamed_inline_ingests_only_add(generator):
+    generator.initialize_database(questions_data=QUESTIONS[:1], textbook_content="Chapter 1: A\nOne.",
+                                  incremental=True)
+    generator.initialize_database(questions_data=QUESTIONS[1:], textbook_content="Chapter 2: B\nTwo.",
+                                  incremental=True)
+    assert counts(generator) == (2, 2)
+
+
+def test_named_inline_source_is_pruned_like_a_file(generator):
+    generator.initialize_database(questions_data=QUESTIONS, incremental=True, source="course")
+    generator.initialize_database(questions_data=QUESTIONS[1:], incremental=True, source="course")
+    assert counts(generator) == (1, 0)
+    # Other sources are untouched
+    generator.initialize_database(questions_data=QUESTIONS[:1], incremental=True, source="other")
+    assert counts(generator) == (2, 0)
+
+
+def test_incremental_file_ingest_skips_unchanged_and_deletes_removed(generator, tmp_path, capsys):
+    path = tmp_path / "book.txt"
+    path.write_text("Chapter 1: A\nFirst chapter.\nChapter 2: B\nSecond chapter.\n", encoding="utf-8")
+    generator.initialize_database(textbook_file=str(path), incremental=True)
+    generator.initialize_database(textbook_file=str(path), incremental=True)
+    assert "Skipping unchanged source" in capsys.readouterr().out
+
+    path.write_text("Chapter 1: A\nFirst chapter.\n", encoding="utf-8")
+    generator.initialize_database(textbook_file=str(path), incremental=True)
+    assert counts(generator) == (0, 1)
+
+
+def test_directory_ingest_updates_changed_files(generator, tmp_path):
+    books = tmp_path / "books"
+    books.mkdir()
+    (books / "a.txt").write_text("Chapter 1: A\nAlpha text.\nChapter 2: B\nBeta text.\n", encoding="utf-8")
+    (books / "b.txt").write_text("Chapter 1: C\nGamma text.\n", encoding="utf-8")
+    generator.ingest_textbook_directory(str(books), incremental=True)
+    assert counts(generator) == (0, 3)
+
+    (books / "a.txt").write_text("Chapter 1: A\nAlpha text.\n", encoding="utf-8")
+    report = generator.ingest_textbook_directory(str(books), incremental=True)
+    assert list(report["sources"]) == [str(books / "a.txt")]
+    assert counts(generator) == (0, 2)
+
+
+def test_full_reingest_of_a_tracked_source_deletes_removed_chunks(generator, tmp_path, capsys):
+    path = tmp_path / "book.txt"
+    path.write_text("Chapter 1: A\nFirst chapter.\nChapter 2: B\nSecond chapter.\n", encoding="utf-8")
+    generator.initialize_database(textbook_file=str(path), incremental=True)
+    path.write_text("Chapter 1: A\nFirst chapter.\n", encoding="utf-8")
+    generator.initialize_database(textbook_file=str(path))
+    assert counts(generator) == (0, 1)
+
+    generator.initialize_database(questions_data=QUESTIONS, source="course")
+    generator.initialize_database(questions_data=QUESTIONS[1:], source="course")
+    assert counts(generator) == (1, 1)
+
+
+def test_full_directory_reingest_deletes_removed_chunks(generator, tmp_path):
+    books = tmp_path / "books"
+    books.mkdir()
+    (books / "a.txt").write_text("Chapter 1: A\nAlpha text.\nChapter 2: B\nBeta text.\n", encoding="utf-8")
+    generator.ingest_textbook_directory(str(books))
+    (books / "a.txt").write_text("Chapter 1: A\nAlpha text.\n", encoding="utf-8")
+    generator.ingest_textbook_directory(str(books))
+    assert counts(generator) == (0, 1)
@@ -0,0 +1,78 @@
+import json
+from instrumentation import HistogramSink, JSONLogSink, PrometheusSink, Tracer, annotate, span
+from question_generator import QuestionGenerator
+
+
+def test_spans_outside_a_trace_are_noops():
+    with span("orphan") as stage:
+        stage.set(tokens=5)
+    assert stage is span("other")
+    tracer = Tracer(enabled=False)
+    with tracer.trace("off") as trace:
+        assert trace is None
+
+
+def test_summary_adds_numbers_and_keeps_latest_values():
+    sink = HistogramSink()
+    tracer = Tracer([sink])
+    with tracer.trace("request", user="u1") as trace:
+        for tokens in (3, 4):
+            with span("llm_call", tokens=tokens, model="m"):
+                pass
+        annotate(questions=2)
+    summary = trace.summary()
+    assert summary["trace"] == "request" and summary["user"] == "u1" and summary["questions"] == 2
+    assert summary["stages"]["llm_call"]["count"] == 2
+    assert summary["stages"]["llm_call"]["tokens"] == 7
+    assert summary["stages"]["llm_call"]["model"] == "m"
+
+    stats = sink.stats()
+    assert stats["request"]["total"]["count"] == 1
+    assert stats["request"]["llm_call"]["count"] == 2
+    assert stats["counters"]["llm_call.tokens"] == 7
+
+
+def test_failed_stages_are_marked():
+    tracer = Tracer([])
+    try:
+        with tracer.trace("request") as trace:
+            with span("parse"):
+                raise KeyError("x")
+    except KeyError:
+        pass
+    assert trace.attributes["error"] == "KeyError"
+    assert trace.summary()["stages"]["parse"]["error"] == "KeyError"
+
+
+def test_prometheus_and_json_sinks(tmp_path):
+    prometheus = PrometheusSink(textfile_path=str(tmp_path / "metrics.prom"))
+    log = JSONLogSink(str(tmp_path / "logs" / "traces.jsonl"))
+
+    class BrokenSink:
+        def record(self, trace):
+            raise RuntimeError("down")
+
+    tracer = Tracer([BrokenSink(), prometheus, log])
+    for _ in range(2):
+        with tracer.trace("search"):
+            with span("vector_query", cache_hits=1):
+                pass
+
+    text = (tmp_path / "metrics.prom").read_text(encoding="utf-8")
+    assert 'question_generator_stage_duration_seconds_count{trace="search",stage="vector_query"} 2' in text
+    assert 'question_generator_stage_attribute_total{stage="vector_query",attribute="cache_hits"} 2.0' in text
+    lines = (tmp_path / "logs" / "traces.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["trace"] for line in lines] == ["search", "search"]
+
+
+def test_generation_reports_stage_timings(config):
+    config.INSTRUMENTATION_ENABLED = True
+    generator = QuestionGenerator(config)
+    question = generator.generate_new_question("Biology")
+    stages = question["generation_metadata"]["timings"]["stages"]
+    assert {"retrieve", "prompt_build", "llm_call"} <= set(stages)
+    assert generator.get_database_stats()["instrumentation"]["generate_new_question"]["total"]["count"] == 1
+
+    config.INSTRUMENTATION_ENABLED = False
+    question = QuestionGenerator(config).generate_new_question("Biology")
+    assert "timings" not in question["generation_metadata"]
@@ -0,0 +1,96 @@
+import numpy as np
+from data_processor import DataProcessor
+from embedding_system import EmbeddingSystem
+from ivf_index import IVFIndex, assign, default_clusters, kmeans
+from vector_store import NumpyVectorStore
+
+
+def clustered_vectors(clusters=8, per_cluster=100, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32) * 4
+    vectors = np.repeat(centres, per_cluster, axis=0) + rng.standard_normal((clusters * per_cluster, dim))
+    vectors = vectors.astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True), np.repeat(np.arange(clusters), per_cluster)
+
+
+def exact(vectors, query, k):
+    return set(np.argsort(-(vectors @ query))[:k].tolist())
+
+
+def test_kmeans_separates_clear_clusters():
+    vectors, truth = clustered_vectors()
+    labels, _ = assign(vectors, kmeans(vectors, 8, iterations=20))
+    # Every true cluster lands in one k-means cluster
+    assert all(len(set(labels[truth == c])) == 1 for c in range(8))
+    assert default_clusters(10000) == 400 and default_clusters(3) == 3
+
+
+def test_probing_every_cluster_is_exact_and_few_keep_recall(tmp_path):
+    vectors, _ = clustered_vectors()
+    index = IVFIndex(str(tmp_path / "ivf"), n_clusters=16)
+    report = index.build(vectors, version=1)
+    assert (report["rows"], report["clusters"], report["retrained"]) == (800, 16, True)
+
+    queries = vectors[::80] + 0.01
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    for (rows, scores), query in zip(index.search(queries, 10, nprobe=16), queries):
+        assert set(rows.tolist()) == exact(vectors, query, 10)
+        assert np.all(np.diff(scores) <= 0)
+    hits = sum(len(set(rows.tolist()) & exact(vectors, query, 10))
+               for (rows, _), query in zip(index.search(queries, 10, nprobe=3), queries))
+    assert hits >= 0.9 * 10 * len(queries)
+
+
+def test_allowed_mask_restricts_rows(tmp_path):
+    vectors, _ = clustered_vectors()
+    index = IVFIndex(str(tmp_path / "ivf"), n_clusters=8)
+    index.build(vectors, version=1)
+    allowed = np.arange(len(vectors)) % 2 == 0
+    rows, _ = index.search(vectors[:1], 20, nprobe=8, allowed=allowed)[0]
+    assert len(rows) == 20 and all(row % 2 == 0 for row in rows)
+
+
+def test_index_persists_and_reuses_centroids_until_growth(tmp_path):
+    vectors, _ = clustered_vectors()
+    IVFIndex(str(tmp_path / "ivf"), n_clusters=8).build(vectors[:200], version=1)
+
+    reopened = IVFIndex(str(tmp_path / "ivf"), n_clusters=8, retrain_growth=2.0)
+    assert reopened.is_current(1) and not reopened.is_current(2)
+    assert reopened.build(vectors[:350], version=2)["retrained"] is False
+    assert reopened.build(vectors[:500], version=3)["retrained"] is True
+    assert reopened.stats()["trained_rows"] == 500
+
+
+def test_store_falls_back_to_exact_search_while_stale(tmp_path):
+    vectors, truth = clustered_vectors()
+    store = NumpyVectorStore(str(tmp_path / "store"), index="ivf", ivf_clusters=8, nprobe=8)
+    ids = [f"id{i}" for i in range(len(vectors))]
+    store.upsert(ids=ids, embeddings=vectors, documents=ids, metadatas=[{"c": int(c)} for c in truth])
+    assert store.stats()["ivf"]["built"] is False
+
+    assert store.build_index()["rows"] == 800
+    assert store.build_index() is None
+    assert store.stats()["ivf"]["current"] is True
+    top = store.query(query_embeddings=vectors[:1], n_results=5)["ids"][0]
+    assert top[0] == "id0"
+
+    store.delete(["id0"])
+    assert store.stats()["ivf"]["current"] is False
+    assert "id0" not in store.query(query_embeddings=vectors[:1], n_results=5)["ids"][0]
+    filtered = store.query(query_embeddings=vectors[:1], n_results=5, where={"c": 3})
+    assert all(m["c"] == 3 for m in filtered["metadatas"][0])
+
+
+def test_embedding_system_builds_the_textbook_index(tmp_path, encoder, capsys):
+    es = EmbeddingSystem("m", db_path=str(tmp_path / "db"), backend="numpy", hybrid_search=False,
+                         vector_index="ivf", ivf_clusters=4)
+    es.setup_collections("questions", "textbook")
+    text = "".join(f"Chapter {c}: Topic {c}\n" + f"Section {c} covers term{c} in depth. " * 30 + "\n" for c in range(1, 9))
+    es.add_textbook_to_db(DataProcessor(chunk_size=100, chunk_overlap=10).process_textbook(text))
+    es.build_textbook_index()
+    assert "in 4 clusters (retrained)" in capsys.readouterr().out
+    assert es.textbook_collection.stats()["ivf"]["current"] is True
+    es.build_textbook_index()
+    assert "Built IVF" not in capsys.readouterr().out
+    hits = es.search_relevant_textbook("term3", top_k=3, nprobe=4)
+    assert hits and hits[0]["chapter"] == "Chapter 3: Topic 3"
@@ -0,0 +1,135 @@
+import sqlite3
+import threading
+import time
+from job_queue import JobQueue
+
+
+class FakeGenerator:
+    """generate_new_question stand-in that fails the first `failures` calls per topic"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def generate_new_question(self, topic, **kwargs):
+        with self._lock:
+            self.calls.append((topic, time.time()))
+            attempt = sum(1 for called, _ in self.calls if called == topic)
+        if attempt <= self.failures:
+            raise RuntimeError(f"attempt {attempt} failed")
+        return {"question": f"About {topic}?", "topic": topic}
+
+
+def make_queue(tmp_path, generator, **kwargs):
+    kwargs.setdefault("workers", 2)
+    kwargs.setdefault("retry_backoff", 0.0)
+    return JobQueue(str(tmp_path / "jobs.db"), generator, **kwargs)
+
+
+def test_job_results_keep_submission_order(tmp_path):
+    queue = make_queue(tmp_path, FakeGenerator()).start()
+    job_id = queue.submit(["cells", "water"], questions_per_topic=2)
+    status = queue.wait(job_id, timeout=10)
+    queue.stop()
+    assert (status["status"], status["done"], status["progress"]) == ("completed", 4, 1.0)
+    assert [q["batch_id"] for q in queue.results(job_id)] == ["cells_1", "cells_2", "water_1", "water_2"]
+
+
+def test_empty_job_is_completed_at_submit(tmp_path):
+    queue = make_queue(tmp_path, FakeGenerator())
+    status = queue.status(queue.submit([]))
+    assert (status["status"], status["total"], status["progress"]) == ("completed", 0, 1.0)
+
+
+def test_failed_items_are_retried_after_a_growing_delay(tmp_path):
+    generator = FakeGenerator(failures=2)
+    queue = make_queue(tmp_path, generator, workers=1, retry_backoff=0.2, max_attempts=3).start()
+    job_id = queue.submit(["cells"])
+    status = queue.wait(job_id, timeout=10)
+    queue.stop()
+    assert status["status"] == "completed"
+    times = [called for _, called in generator.calls]
+    assert len(times) == 3
+    assert times[1] - times[0] >= 0.2 and times[2] - times[1] >= 0.4
+    assert queue.retry_delay(20) == queue.retry_backoff_max
+
+
+def test_items_that_keep_failing_are_marked_failed(tmp_path):
+    queue = make_queue(tmp_path, FakeGenerator(failures=5), max_attempts=2).start()
+    job_id = queue.submit(["cells", "water"])
+    status = queue.wait(job_id, timeout=10)
+    queue.stop()
+    assert (status["status"], status["failed"]) == ("completed_with_errors", 2)
+    assert queue.results(job_id) == []
+
+
+def test_running_items_are_only_reclaimed_after_their_lease(tmp_path):
+    first = make_queue(tmp_path, FakeGenerator(), lease_seconds=0.5)
+    job_id = first.submit(["cells"])
+    # The first process claims the item, then stalls as if it had died
+    stalled = first._claim()
+
+    generator = FakeGenerator()
+    second = make_queue(tmp_path, generator, lease_seconds=0.5).start()
+    time.sleep(0.3)
+    assert generator.calls == [] and second.status(job_id)["running"] == 1
+    assert second.wait(job_id, timeout=10)["status"] == "completed"
+    second.stop()
+    assert len(generator.calls) == 1
+
+    # The stalled worker finishing late does not overwrite the newer result
+    first._process(stalled)
+    assert first.status(job_id)["done"] == 1
+    assert first.results(job_id)[0]["batch_id"] == "cells_1"
+
+
+def test_expired_last_attempt_fails_the_item(tmp_path):
+    queue = make_queue(tmp_path, FakeGenerator(), lease_seconds=0.0, max_attempts=1)
+    job_id = queue.submit(["cells"])
+    assert queue._claim() is not None
+    assert queue._claim() is None
+    status = queue.status(job_id)
+    assert (status["status"], status["failed"]) == ("completed_with_errors", 1)
+
+
+def test_queues_from_before_leases_are_migrated(tmp_path):
+    db = sqlite3.connect(str(tmp_path / "jobs.db"))
+    db.executescript(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, params TEXT NOT NULL, total INTEGER NOT NULL, "
+        "created REAL NOT NULL, updated REAL NOT NULL);"
+        "CREATE TABLE items (job_id TEXT NOT NULL, idx INTEGER NOT NULL, topic TEXT NOT NULL, batch_id TEXT NOT NULL, "
+        "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT, "
+        "updated REAL NOT NULL, PRIMARY KEY (job_id, idx));"
+        "INSERT INTO jobs VALUES ('old', 'pending', '{\"difficulty\": \"Medium\", \"question_type\": \"Multiple Choice\", "
+        "\"question_filters\": null, \"textbook_filters\": null, \"with_evaluation\": false}', 1, 0, 0);"
+        "INSERT INTO items (job_id, idx, topic, batch_id, status, updated) VALUES ('old', 0, 'cells', 'cells_1', 'pending', 0);"
+    )
+    db.commit()
+    db.close()
+    queue = make_queue(tmp_path, FakeGenerator()).start()
+    assert queue.wait("old", timeout=10)["status"] == "completed"
+    queue.stop()
+
+
+def test_items_cancelled_during_a_failing_attempt_are_not_retried(tmp_path):
+    generator = FakeGenerator(failures=5)
+    queue = make_queue(tmp_path, generator, max_attempts=3)
+    job_id = queue.submit(["cells"])
+    item = queue._claim()
+    queue.cancel(job_id)
+    queue._process(item)
+    assert queue._claim() is None
+    assert len(generator.calls) == 1
+    assert queue.status(job_id)["cancelled"] == 1
+
+
+def test_expired_items_of_cancelled_jobs_are_not_reclaimed(tmp_path):
+    generator = FakeGenerator()
+    queue = make_queue(tmp_path, generator, lease_seconds=0.0)
+    job_id = queue.submit(["cells"])
+    assert queue._claim() is not None
+    queue.cancel(job_id)
+    assert queue._claim() is None
+    status = queue.status(job_id)
+    assert (status["status"], status["running"], status["cancelled"]) == ("cancelled", 0, 1)
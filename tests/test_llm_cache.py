@@ -0,0 +1,64 @@
+import time
+from llm_backends import StubBackend
+from llm_cache import LLMCache, request_key
+from llm_integration import LLMIntegration
+
+
+class CountingBackend(StubBackend):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def complete(self, model, messages, max_tokens, temperature, timeout, seed=None):
+        self.calls += 1
+        return super().complete(model, messages, max_tokens, temperature, timeout, seed)
+
+
+def request(topic="cells"):
+    return {"topic": topic, "similar_questions": [], "textbook_content": []}
+
+
+def test_key_covers_every_request_setting():
+    messages = [{"role": "user", "content": "hi"}]
+    key = request_key("m", messages, 0.0, 10)
+    assert key == request_key("m", [dict(messages[0])], 0.0, 10)
+    assert len({key, request_key("m2", messages, 0.0, 10), request_key("m", messages, 0.5, 10),
+                request_key("m", messages, 0.0, 20), request_key("m", messages, 0.0, 10, seed=1)}) == 5
+
+
+def test_entries_expire_and_least_recently_used_are_evicted(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.db"), max_entries=2, ttl_seconds=0.2)
+    cache.put("a", "m", "A")
+    cache.put("b", "m", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "m", "C")
+    assert cache.get("b") is None and cache.get("a") == "A"
+    assert cache.stats()["evictions"] == 1
+    time.sleep(0.25)
+    assert cache.get("c") is None
+
+
+def test_only_deterministic_requests_are_cacheable_by_default(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.db"))
+    assert cache.cacheable(0.0) and cache.cacheable(0.7, seed=3)
+    assert not cache.cacheable(0.7)
+    assert cache.stats()["skipped"] == 1
+    assert LLMCache(str(tmp_path / "all.db"), deterministic_only=False).cacheable(0.7)
+
+
+def test_sampled_generations_with_identical_prompts_are_not_served_from_cache(tmp_path):
+    backend = CountingBackend()
+    llm = LLMIntegration("key", backend=backend, cache_path=str(tmp_path / "cache.db"))
+    llm.generate_question(**request())
+    llm.generate_question(**request())
+    assert backend.calls == 2
+    assert llm.response_cache.stats()["entries"] == 0
+
+
+def test_seeded_generations_are_answered_from_cache(tmp_path):
+    backend = CountingBackend()
+    llm = LLMIntegration("key", backend=backend, seed=7, cache_path=str(tmp_path / "cache.db"))
+    first = llm.generate_question(**request())
+    assert llm.generate_question(**request()) == first
+    assert backend.calls == 1
+    assert llm.response_cache.stats()["hits"] == 1
@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+from llm_backends import LLMBackend, StubBackend, TransientBackendError
+from llm_integration import LLMIntegration
+
+
+class ScriptedBackend(LLMBackend):
+    """Answers with the topic it was asked about; optionally fails the first calls or holds each call"""
+
+    name = "scripted"
+
+    def __init__(self, failures=0, error=TransientBackendError, delay=0.0):
+        self.failures = failures
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def complete(self, model, messages, max_tokens, temperature, timeout, seed=None):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            failing = self.calls <= self.failures
+        try:
+            time.sleep(self.delay)
+            if failing:
+                raise self.error("try again")
+            topic = messages[-1]["content"].split(" question about ")[1].split(" at ")[0]
+            return json.dumps({"question": f"About {topic}?", "topic": topic}), None
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def request(topic):
+    return {"topic": topic, "similar_questions": [], "textbook_content": []}
+
+
+def test_concurrent_generation_keeps_input_order_and_bounds_concurrency():
+    backend = ScriptedBackend(delay=0.02)
+    llm = LLMIntegration("key", backend=backend, max_concurrency=3)
+    results = llm.generate_questions_concurrently([request(f"t{i}") for i in range(10)])
+    assert [r["topic"] for r in results] == [f"t{i}" for i in range(10)]
+    assert 1 < backend.max_active <= 3
+
+
+def test_transient_errors_are_retried():
+    backend = ScriptedBackend(failures=2)
+    llm = LLMIntegration("key", backend=backend, max_retries=3, backoff_base=0.0)
+    assert llm.generate_question(**request("cells"))["question"] == "About cells?"
+    assert backend.calls == 3
+
+
+def test_other_errors_are_reported_without_retrying():
+    backend = ScriptedBackend(failures=5, error=ValueError)
+    llm = LLMIntegration("key", backend=backend, max_retries=3, backoff_base=0.0)
+    result = llm.generate_question(**request("cells"))
+    assert "error" in result
+    assert backend.calls == 1
+
+
+def test_evaluations_run_concurrently_in_order():
+    llm = LLMIntegration("key", backend=StubBackend())
+    questions = [{"question": f"Q{i}?"} for i in range(5)]
+    evaluations = llm.evaluate_questions_concurrently(questions, max_concurrency=2)
+    assert len(evaluations) == 5
+    assert all("overall" in evaluation for evaluation in evaluations)
+
+
+def test_combined_call_returns_question_and_self_assessment():
+    backend = StubBackend()
+    llm = LLMIntegration("key", backend=backend)
+    question = llm.generate_and_evaluate_question(**request("cells"))
+    assert backend.request_count == 1
+    assert "validation_errors" not in question
+    assert question["evaluation"]["source"] == "self"
+    assert 1 <= question["evaluation"]["overall"] <= 10
+
+
+def test_combined_response_without_assessment_is_flagged():
+    llm = LLMIntegration("key", backend=ScriptedBackend())
+    question = llm.generate_and_evaluate_question(**request("cells"))
+    assert question["question"] == "About cells?"
+    assert "$: missing required property 'evaluation'" in question["validation_errors"]
+    assert question["evaluation"] == {"error": "Response did not include a valid self-assessment", "source": "self"}
+
+
+def test_streamed_question_matches_the_blocking_call():
+    llm = LLMIntegration("key", backend=StubBackend(chunk_chars=5))
+    events = list(llm.generate_question_stream(**request("cells")))
+    done = events[-1]
+    assert done["type"] == "done"
+    assert done["question"] == llm.generate_question(**request("cells"))
+
+    kinds = [event["type"] for event in events]
+    assert kinds.count("token") > 1
+    # The question text is complete before the stream ends
+    assert kinds.index("field") < len(events) - 1
+    fields = {event["key"]: event["value"] for event in events if event["type"] == "field"}
+    assert fields["question"] == done["question"]["question"]
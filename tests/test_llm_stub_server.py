@@ -0,0 +1,66 @@
+import json
+import time
+import numpy as np
+import pytest
+from conftest import HashingEncoder
+from llm_integration import LLMIntegration
+from llm_backends import StubBackend
+from llm_stub_server import StubLLMServer, stub_completion_text
+from question_generator import QuestionGenerator
+
+TOPICS = ["cells", "osmosis", "enzymes", "derivatives", "integrals", "acids", "waves", "empires"]
+
+
+def generate(llm, topic):
+    textbook = [{"id": topic, "content": f"The {topic} chapter covers structure, transport and energy of {topic}."}]
+    return llm.generate_question(topic, [], textbook, difficulty="Hard")
+
+
+def test_replies_are_deterministic_and_follow_the_prompt():
+    messages = [{"role": "user", "content": "Write a question about osmosis at easy difficulty level."}]
+    assert stub_completion_text(messages) == stub_completion_text(messages)
+    llm = LLMIntegration("key", backend=StubBackend())
+    question = generate(llm, "osmosis")
+    assert (question["topic"], question["difficulty"]) == ("osmosis", "Hard")
+    assert question["correct_answer"] in "ABCD" and len(question["options"]) == 4
+    assert json.loads(stub_completion_text([{"content": "Evaluate the quality of this"}]))["overall"] >= 1
+
+
+def test_questions_for_different_prompts_are_not_near_duplicates():
+    llm = LLMIntegration("key", backend=StubBackend())
+    texts = [generate(llm, topic)["question"] for topic in TOPICS]
+    assert len(set(texts)) == len(TOPICS)
+    vectors = HashingEncoder().encode(texts)
+    similarity = vectors @ vectors.T
+    assert similarity[~np.eye(len(TOPICS), dtype=bool)].max() < 0.92
+
+
+def test_stub_batch_needs_no_regenerations(config):
+    generator = QuestionGenerator(config)
+    questions = generator.batch_generate_questions(TOPICS, with_evaluation=True)
+    assert generator.llm.backend.request_count == len(TOPICS)
+    assert not any("near_duplicate" in q for q in questions)
+
+
+@pytest.mark.parametrize("backend", ["http", "openai"])
+def test_rate_limited_requests_are_retried_over_http(backend):
+    with StubLLMServer(rate_limit_every=3) as server:
+        # The 429s carry Retry-After: 0, so honouring it keeps the long backoff from ever applying
+        llm = LLMIntegration("stub", backend=backend, base_url=server.base_url,
+                             max_retries=2, backoff_base=30.0, backoff_max=30.0)
+        start = time.perf_counter()
+        results = llm.generate_questions_concurrently([{"topic": topic, "similar_questions": [], "textbook_content": []}
+                                                       for topic in TOPICS[:6]], max_concurrency=3)
+        # Every third request was refused: 6 answers take 8 requests
+        assert server.request_count == 8
+        assert [result["topic"] for result in results] == TOPICS[:6]
+        assert all("error" not in result and len(result["options"]) == 4 for result in results)
+
+        # Request 9 is refused before the stream starts, request 10 streams the reply
+        events = list(llm.generate_question_stream("cells", [], []))
+        assert server.request_count == 10
+        assert sum(event["type"] == "token" for event in events) > 1
+        assert events[-1]["type"] == "done"
+        assert events[-1]["question"] == llm.generate_question("cells", [], [])
+        assert time.perf_counter() - start < 10
+        llm.backend.close()
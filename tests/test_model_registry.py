@@ -0,0 +1,23 @@
+from model_registry import ModelRegistry, get_model
+from embedding_system import EmbeddingSystem
+
+
+def test_same_configuration_shares_one_handle(encoder):
+    assert get_model("m") is get_model("m")
+    assert get_model("m") is not get_model("m", precision="float16")
+    assert get_model("m") is not get_model("m", device="cpu")
+
+
+def test_model_loads_on_first_encode(encoder):
+    model = get_model("m")
+    assert not model.is_loaded
+    model.encode(["hello"])
+    assert model.is_loaded
+    assert ModelRegistry.stats()["models"][0]["loaded"]
+
+
+def test_embedding_systems_reuse_the_registered_model(encoder, tmp_path):
+    first = EmbeddingSystem("m", db_path=str(tmp_path / "a"), backend="numpy")
+    second = EmbeddingSystem("m", db_path=str(tmp_path / "b"), backend="numpy")
+    assert first.model is second.model
+    assert first.embedding_function.model is first.model
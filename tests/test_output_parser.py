@@ -0,0 +1,42 @@
+import pytest
+from output_parser import EVALUATION_SCHEMA, GENERATE_AND_EVALUATE_SCHEMA, extract_json, parse_structured_output, validate
+
+EVALUATION = {"clarity": 8, "difficulty": 6, "educational_value": 7, "accuracy": 9, "overall": 8, "feedback": "Good"}
+
+
+def test_valid_evaluation_has_no_errors():
+    assert validate(EVALUATION, EVALUATION_SCHEMA) == []
+
+
+@pytest.mark.parametrize("change, error", [
+    ({"overall": 11}, "$.overall: 11 is above the maximum 10"),
+    ({"clarity": 0}, "$.clarity: 0 is below the minimum 1"),
+    ({"accuracy": True}, "$.accuracy: expected integer, got boolean"),
+    ({"feedback": 3}, "$.feedback: expected string, got int"),
+])
+def test_invalid_fields_are_reported_with_their_path(change, error):
+    assert validate(dict(EVALUATION, **change), EVALUATION_SCHEMA) == [error]
+
+
+def test_missing_and_nested_errors():
+    question = {"question": "", "options": ["A", 2], "evaluation": {"overall": 5}}
+    errors = validate(question, GENERATE_AND_EVALUATE_SCHEMA)
+    assert "$: missing required property 'correct_answer'" in errors
+    assert "$.question: string is shorter than 1" in errors
+    assert "$.options[1]: expected string, got int" in errors
+    assert "$.evaluation: missing required property 'clarity'" in errors
+
+
+def test_json_is_extracted_from_fences_and_prose():
+    assert extract_json('```json\n{"a": 1}\n```') == '{"a": 1}'
+    assert extract_json('Here it is: {"a": {"b": 2}} hope that helps') == '{"a": {"b": 2}}'
+    assert extract_json("no json") is None
+
+
+def test_parse_structured_output():
+    data, errors = parse_structured_output('Sure! {"clarity": 8}', EVALUATION_SCHEMA)
+    assert data == {"clarity": 8}
+    assert len(errors) == 4
+    assert parse_structured_output("{broken", EVALUATION_SCHEMA) == (None, ["$: no JSON object found in the response"])
+    data, errors = parse_structured_output('{"a": }', EVALUATION_SCHEMA)
+    assert data is None and errors[0].startswith("$: invalid JSON")
@@ -0,0 +1,78 @@
+from llm_backends import StubBackend
+from llm_integration import LLMIntegration
+from prompt_builder import PromptBuilder, TokenCounter, merge_chunks
+
+
+def chunk(content, start=None, source="book", chapter="Chapter 1", chunk_id=None):
+    item = {"id": chunk_id or content[:8], "content": content, "source": source, "chapter": chapter}
+    if start is not None:
+        item.update(start_char=start, end_char=start + len(content))
+    return item
+
+
+def test_truncate_stays_within_budget_on_a_word_boundary():
+    counter = TokenCounter()
+    text = " ".join(f"word{i}" for i in range(200))
+    cut = counter.truncate(text, 20)
+    assert 0 < counter.count(cut) <= 20
+    assert text.startswith(cut) and text[len(cut)] == " "
+    assert counter.truncate("short", 20) == "short"
+    assert counter.truncate(text, 0) == ""
+
+
+def test_chunks_with_overlapping_spans_are_joined():
+    text = "The cell membrane controls what enters and leaves the cell."
+    merged = merge_chunks([chunk(text[20:], 20, chunk_id="b"), chunk(text[:30], 0, chunk_id="a"),
+                           chunk("Other book", 0, source="other", chunk_id="c")])
+    assert [c["content"] for c in merged] == [text, "Other book"]
+    assert merged[0]["merged_ids"] == ["b", "a"]
+    assert (merged[0]["start_char"], merged[0]["end_char"]) == (0, len(text))
+
+
+def test_overlapping_spans_from_other_chapters_or_stale_offsets_are_not_spliced():
+    # Offsets are per chapter, so chapters of one source reuse the same ranges
+    assert len(merge_chunks([chunk("Cells divide by mitosis.", 0),
+                             chunk("Light drives photosynthesis.", 10, chapter="Chapter 2")])) == 2
+    # An outdated span claims an overlap the text does not have
+    assert len(merge_chunks([chunk("Cells divide by mitosis.", 0, chunk_id="a"),
+                             chunk("Enzymes speed up reactions.", 10, chunk_id="b")])) == 2
+
+
+def test_chunks_without_spans_merge_on_shared_text():
+    first = "Osmosis is the diffusion of water across a semipermeable membrane"
+    second = "across a semipermeable membrane from low to high solute concentration"
+    merged = merge_chunks([chunk(first), chunk(second), chunk("diffusion of water"),
+                           chunk("across a semipermeable membrane", chapter="Chapter 2")])
+    assert [c["content"] for c in merged] == [
+        first + " from low to high solute concentration",
+        "across a semipermeable membrane",
+    ]
+
+
+def test_pack_skips_what_does_not_fit_and_truncates_the_last_chunk():
+    builder = PromptBuilder(min_chunk_tokens=5)
+    counter = builder.counter
+    items = [chunk("alpha " * 10), chunk("beta " * 200), chunk("gamma " * 5)]
+    fmt = lambda i, c: f"{i}. {c['content']}\n"
+
+    entries, used = builder.pack(items, fmt, 40)
+    assert [e.split()[1] for e in entries] == ["alpha", "gamma"]
+    assert used == sum(counter.count(e) for e in entries) <= 40
+
+    entries, used = builder.pack(items, fmt, 40, truncate_last=True, truncate_item=builder.truncate_chunk)
+    assert len(entries) == 2 and entries[1].startswith("2. beta") and entries[1].rstrip().endswith("...")
+    assert used <= 40
+
+
+def test_question_prompt_respects_the_token_budget():
+    llm = LLMIntegration("key", backend=StubBackend(), prompt_token_budget=600)
+    similar = [{"question": f"Question {i} " + "about cells " * 20, "answer": "A", "topic": "Biology"}
+               for i in range(10)]
+    textbook = [chunk(f"Passage {i} " + "membranes and transport " * 40, chunk_id=f"p{i}") for i in range(10)]
+    prompt, report = llm.build_question_prompt("Biology", similar, textbook)
+
+    assert report["total"] <= 600
+    assert 0 < report["similar_questions_used"] < 10
+    assert report["similar_questions"] <= int((600 - report["system"] - report["instructions"]) * 0.3)
+    assert report["textbook_chunks_used"] >= 1
+    assert "Passage 0" in prompt and "Passage 9" not in prompt
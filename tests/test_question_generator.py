@@ -0,0 +1,48 @@
+import pytest
+from question_generator import QuestionGenerator
+
+
+def make_generator(config, **settings):
+    for name, value in settings.items():
+        setattr(config, name, value)
+    return QuestionGenerator(config)
+
+
+@pytest.mark.parametrize("mode, requests", [("combined", 1), ("separate", 2)])
+def test_generation_modes_cost_one_or_two_calls(config, mode, requests):
+    generator = make_generator(config, GENERATION_MODE=mode)
+    question = generator.generate_new_question("Biology", with_evaluation=True)
+    assert generator.llm.backend.request_count == requests
+    assert "overall" in question["evaluation"]
+    assert (question["evaluation"].get("source") == "self") is (mode == "combined")
+
+
+def test_combined_mode_audits_a_sample(config):
+    generator = make_generator(config, GENERATION_MODE="combined", AUDIT_SAMPLE_RATE=1.0)
+    question = generator.generate_new_question("Biology", with_evaluation=True)
+    assert generator.llm.backend.request_count == 2
+    assert "overall" in question["audit_evaluation"]
+
+
+def test_unknown_generation_mode_is_rejected(config):
+    with pytest.raises(ValueError):
+        make_generator(config, GENERATION_MODE="both").generate_new_question("Biology", with_evaluation=True)
+
+
+def test_batch_without_evaluation_regenerates_near_duplicates(config):
+    generator = make_generator(config)
+    # Identical prompts get identical stub replies, so the second one is a near-duplicate of the first
+    questions = generator.batch_generate_questions(["Biology"], questions_per_topic=2)
+    assert generator.llm.backend.request_count == 3
+    assert questions[0]["question"] != questions[1]["question"]
+    assert not any("near_duplicate" in q for q in questions)
+
+
+def test_evaluation_skips_near_duplicates(config):
+    generator = make_generator(config)
+    question = generator.generate_new_question("Biology")
+    requests = generator.llm.backend.request_count
+    evaluated = generator.evaluate_generated_questions([question, dict(question)])
+    assert generator.llm.backend.request_count == requests + 1
+    assert "overall" in evaluated[0]["evaluation"]
+    assert evaluated[1]["near_duplicate"]["source"] == "batch" and "evaluation" not in evaluated[1]
@@ -0,0 +1,32 @@
+import time
+from retrieval_cache import RetrievalCache, filters_key
+
+
+def test_hits_return_copies():
+    cache = RetrievalCache()
+    cache.put("k", [{"id": "a"}])
+    cache.get("k")[0]["id"] = "changed"
+    assert cache.get("k") == [{"id": "a"}]
+    assert cache.stats()["hits"] == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = RetrievalCache(max_entries=2)
+    cache.put("a", [])
+    cache.put("b", [])
+    cache.get("a")
+    cache.put("c", [])
+    assert cache.get("b") is None
+    assert cache.get("a") == [] and cache.get("c") == []
+
+
+def test_entries_expire():
+    cache = RetrievalCache(ttl_seconds=0.01)
+    cache.put("k", [])
+    time.sleep(0.02)
+    assert cache.get("k") is None
+
+
+def test_filters_key_ignores_key_order():
+    assert filters_key({"a": 1, "b": 2}) == filters_key({"b": 2, "a": 1})
+    assert filters_key(None) is None and filters_key({}) is None
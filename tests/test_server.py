@@ -0,0 +1,64 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from question_generator import QuestionGenerator
+from server import create_app
+
+
+@pytest.fixture
+def client(config):
+    with TestClient(create_app(config, QuestionGenerator(config))) as client:
+        yield client
+
+
+def counts(client):
+    database = client.get("/stats").json()["database"]
+    return database["questions_in_database"], database["textbook_chunks_in_database"]
+
+
+def question(text):
+    return {"question": text, "answer": "A", "topic": "Biology", "difficulty": "Easy"}
+
+
+def test_ingests_without_a_source_keep_earlier_payloads(client):
+    first = client.post("/ingest", json={"questions": [question("What is osmosis?")],
+                                         "textbook_content": "Chapter 1: Water\nOsmosis moves water."})
+    second = client.post("/ingest", json={"questions": [question("What is a cell?")],
+                                          "textbook_content": "Chapter 2: Cells\nCells are small."})
+    assert first.status_code == second.status_code == 200
+    assert second.json() == {"questions_in_database": 2, "textbook_chunks_in_database": 2}
+
+
+def test_ingest_with_a_source_replaces_only_that_source(client):
+    client.post("/ingest", json={"questions": [question("What is osmosis?")], "source": "course-a"})
+    client.post("/ingest", json={"questions": [question("What is a cell?")], "source": "course-b"})
+    client.post("/ingest", json={"questions": [question("What is an enzyme?")], "source": "course-a"})
+    assert counts(client) == (2, 0)
+
+
+def test_stream_sends_events_and_frees_its_slot(client):
+    with client.stream("POST", "/generate/stream", json={"topic": "Biology"}) as response:
+        events = [json.loads(line[len("data: "):]) for line in response.iter_lines() if line]
+    assert events[-1]["type"] == "done"
+    assert client.get("/stats").json()["limits"]["generation"]["active"] == 0
+
+
+def test_stream_slot_is_released_when_the_body_never_starts(config):
+    app = create_app(config, QuestionGenerator(config))
+    scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+             "method": "POST", "scheme": "http", "path": "/generate/stream", "raw_path": b"/generate/stream",
+             "root_path": "", "query_string": b"", "headers": [(b"content-type", b"application/json")],
+             "client": ("test", 1), "server": ("test", 80)}
+    body = json.dumps({"topic": "Biology"}).encode()
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        # The client went away before the response could start
+        raise OSError("connection reset")
+
+    with pytest.raises(Exception):
+        asyncio.run(app(scope, receive, send))
+    assert TestClient(app).get("/stats").json()["limits"]["generation"]["active"] == 0
@@ -0,0 +1,30 @@
+import pytest
+from bench.bench_startup import HEAVY_MODULES, IMPORT_SCRIPT, run_script
+
+CONSTRUCT_SCRIPT = """
+import json, sys
+from config import Config
+from question_generator import QuestionGenerator
+Config.VECTOR_DB_PATH = {db_path!r}
+Config.VECTOR_DB_BACKEND = "numpy"
+Config.EMBEDDING_CACHE_PATH = None
+Config.LLM_CACHE_PATH = None
+Config.LLM_BACKEND = "stub"
+generator = QuestionGenerator(Config())
+generator.get_database_stats()
+print(json.dumps({{"loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+@pytest.mark.parametrize("module, allowed", [
+    ("config", []),
+    ("question_generator", []),
+    ("server", ["fastapi"]),
+])
+def test_imports_leave_heavy_dependencies_unloaded(module, allowed):
+    assert run_script(IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES))["loaded"] == allowed
+
+
+def test_construction_and_stats_load_no_model(tmp_path):
+    report = run_script(CONSTRUCT_SCRIPT.format(db_path=str(tmp_path / "db"), heavy=HEAVY_MODULES))
+    assert report["loaded"] == []
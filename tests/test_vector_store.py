@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+from vector_store import NumpyVectorStore, matches_where, chroma_where
+
+
+def random_vectors(rows, dim=16, seed=0):
+    return np.random.default_rng(seed).standard_normal((rows, dim)).astype(np.float32)
+
+
+def fill(store, vectors, metadatas=None):
+    ids = [f"id{i}" for i in range(len(vectors))]
+    store.upsert(ids=ids, embeddings=vectors, documents=[f"doc{i}" for i in range(len(vectors))],
+                 metadatas=metadatas or [{"n": i} for i in range(len(vectors))])
+    return ids
+
+
+def exact_top(vectors, query, k):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [f"id{i}" for i in np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:k]]
+
+
+def test_query_returns_exact_nearest_neighbours(tmp_path):
+    vectors = random_vectors(200)
+    store = NumpyVectorStore(str(tmp_path))
+    fill(store, vectors)
+    queries = random_vectors(5, seed=1)
+    result = store.query(query_embeddings=queries, n_results=4)
+    for q, query in enumerate(queries):
+        assert result["ids"][q] == exact_top(vectors, query, 4)
+        assert result["distances"][q] == sorted(result["distances"][q])
+    assert result["metadatas"][0][0] == {"n": int(result["ids"][0][0][2:])}
+
+
+def test_upsert_overwrites_and_delete_keeps_rows_contiguous(tmp_path):
+    vectors = random_vectors(10)
+    store = NumpyVectorStore(str(tmp_path))
+    fill(store, vectors)
+    store.upsert(ids=["id3"], embeddings=vectors[7:8], documents=["new"], metadatas=[{"n": 70}])
+    store.delete(["id0", "id5", "missing"])
+
+    assert store.count() == 8
+    assert store.get(ids=["id3"])["documents"] == ["new"]
+    # The last row was moved into a freed slot and is still found by its own vector
+    assert store.query(query_embeddings=vectors[9:10], n_results=1)["ids"] == [["id9"]]
+    assert store.query(query_embeddings=vectors[7:8], n_results=2)["ids"][0][0] in ("id3", "id7")
+
+
+def test_rows_persist_across_reopening(tmp_path):
+    vectors = random_vectors(20)
+    fill(NumpyVectorStore(str(tmp_path)), vectors)
+    reopened = NumpyVectorStore(str(tmp_path))
+    assert reopened.count() == 20
+    assert reopened.query(query_embeddings=vectors[4:5], n_results=1)["ids"] == [["id4"]]
+    assert reopened.get(limit=3, offset=2)["ids"] == ["id2", "id3", "id4"]
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    store = NumpyVectorStore(str(tmp_path))
+    fill(store, random_vectors(2))
+    with pytest.raises(ValueError):
+        store.upsert(ids=["x"], embeddings=random_vectors(1, dim=8), documents=[""], metadatas=[{}])
+
+
+def test_empty_store_returns_empty_results(tmp_path):
+    result = NumpyVectorStore(str(tmp_path)).query(query_embeddings=random_vectors(2), n_results=3)
+    assert result["ids"] == [[], []]
+
+
+@pytest.mark.parametrize("precision", ["float16", "int8"])
+def test_quantized_scan_is_reranked_exactly(tmp_path, precision):
+    vectors = random_vectors(500, dim=32)
+    store = NumpyVectorStore(str(tmp_path), precision=precision, rerank_factor=4)
+    fill(store, vectors)
+    queries = random_vectors(10, dim=32, seed=2)
+    result = store.query(query_embeddings=queries, n_results=5)
+    hits = sum(len(set(result["ids"][q]) & set(exact_top(vectors, query, 5))) for q, query in enumerate(queries))
+    assert hits >= 48
+    # Distances come from the float32 rows, not the compact copy
+    best = vectors[int(result["ids"][0][0][2:])]
+    expected = 1.0 - (best / np.linalg.norm(best)) @ (queries[0] / np.linalg.norm(queries[0]))
+    assert result["distances"][0][0] == pytest.approx(expected, abs=1e-5)
+
+
+def test_quantized_store_rebuilds_its_compact_copy_on_open(tmp_path):
+    vectors = random_vectors(50)
+    fill(NumpyVectorStore(str(tmp_path), precision="int8"), vectors)
+    reopened = NumpyVectorStore(str(tmp_path), precision="int8")
+    assert reopened.query(query_embeddings=vectors[10:11], n_results=1)["ids"] == [["id10"]]
+    assert reopened.stats()["bytes_per_vector"] == 16 + 4
+
+
+@pytest.mark.parametrize("where, expected", [
+    ({"topic": "bio"}, True),
+    ({"topic": {"$ne": "bio"}}, False),
+    ({"level": {"$gte": 2, "$lt": 3}}, True),
+    ({"topic": {"$in": ["math", "bio"]}, "level": 2}, True),
+    ({"$or": [{"topic": "math"}, {"level": {"$gt": 5}}]}, False),
+    ({"$and": [{"topic": "bio"}, {"missing": {"$nin": ["x"]}}]}, True),
+    ({"missing": {"$gt": 1}}, False),
+])
+def test_matches_where(where, expected):
+    assert matches_where({"topic": "bio", "level": 2}, where) is expected
+
+
+def test_chroma_where_splits_multi_field_filters():
+    assert chroma_where({"a": 1}) == {"a": 1}
+    assert chroma_where({"a": 1, "b": {"$in": [2]}}) == {"$and": [{"a": 1}, {"b": {"$in": [2]}}]}
+    assert chroma_where(None) is None
+
+
+def test_filtered_query_only_scores_matching_rows(tmp_path):
+    vectors = random_vectors(60)
+    metadatas = [{"topic": ["bio", "math", "chem"][i % 3], "page": i} for i in range(60)]
+    store = NumpyVectorStore(str(tmp_path))
+    fill(store, vectors, metadatas)
+
+    result = store.query(query_embeddings=vectors[:1], n_results=5, where={"topic": {"$in": ["math", "chem"]}})
+    assert all(m["topic"] in ("math", "chem") for m in result["metadatas"][0])
+    result = store.query(query_embeddings=vectors[:1], n_results=50, where={"topic": "bio", "page": {"$lt": 30}})
+    assert sorted(m["page"] for m in result["metadatas"][0]) == list(range(0, 30, 3))
+
+
+def test_indexes_follow_rows_moved_by_deletes(tmp_path):
+    vectors = random_vectors(6)
+    store = NumpyVectorStore(str(tmp_path))
+    fill(store, vectors, [{"topic": t} for t in ["a", "b", "a", "b", "a", "c"]])
+    # id5 ("c") moves into row 1
+    store.delete(["id1"])
+    assert store.query(query_embeddings=vectors[:1], n_results=5, where={"topic": "c"})["ids"] == [["id5"]]
+    assert store.query(query_embeddings=vectors[:1], n_results=5, where={"topic": "b"})["ids"] == [["id3"]]
+    assert store.stats()["indexed_fields"]["topic"] == 3
@@ -0,0 +1,499 @@
+import json
+import os
+import sqlite3
+import threading
+import numpy as np
+from typing import List, Dict, Any, Optional, Set
+from ivf_index import IVFIndex
+
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    """Check one metadata value against a literal or an operator dict such as {"$in": [...]}"""
+    if not isinstance(condition, dict):
+        return value == condition
+    for op, operand in condition.items():
+        if op == "$eq":
+            matched = value == operand
+        elif op == "$ne":
+            matched = value != operand
+        elif op == "$in":
+            matched = value in operand
+        elif op == "$nin":
+            matched = value not in operand
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            matched = {"$gt": value > operand, "$gte": value >= operand,
+                       "$lt": value < operand, "$lte": value <= operand}[op]
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        if not matched:
+            return False
+    return True
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluate a Chroma-style metadata filter against one metadata dict.
+    Supports field literals, $eq/$ne/$in/$nin/$gt/$gte/$lt/$lte and $and/$or;
+    several fields in one dict must all match.
+    """
+    for key, condition in (where or {}).items():
+        if key == "$and":
+            if not all(matches_where(metadata, c) for c in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, c) for c in condition):
+                return False
+        elif not _match_condition(metadata.get(key), condition):
+            return False
+    return True
+
+
+def chroma_where(where: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Rewrite a filter for Chroma, which accepts only one field per filter dict"""
+    if not where:
+        return None
+    clauses = []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            clauses.append({key: [chroma_where(c) for c in condition]})
+        else:
+            clauses.append({key: condition})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class VectorStore:
+    """
+    Minimal collection interface used by EmbeddingSystem.
+    Method names and result shapes follow ChromaDB collections, so query()
+    returns {"ids": [[...]], "documents": [[...]], "metadatas": [[...]], "distances": [[...]]}
+    with one inner list per query and cosine distances.
+    """
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+               metadatas: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]):
+        raise NotImplementedError
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None, nprobe: Optional[int] = None) -> Dict[str, Any]:
+        """nprobe: clusters searched per query when the store has an IVF index (ignored otherwise)"""
+        raise NotImplementedError
+
+    def get(self, ids: Optional[List[str]] = None, limit: Optional[int] = None, offset: int = 0) -> Dict[str, Any]:
+        """Documents and metadata by ID, or a page of all rows when ids is None"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"rows": self.count()}
+
+
+class ChromaVectorStore(VectorStore):
+    """VectorStore backed by a ChromaDB collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+
+    def query(self, query_embeddings, n_results=10, where=None, nprobe=None):
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results,
+                                     where=chroma_where(where))
+
+    def get(self, ids=None, limit=None, offset=0):
+        return self.collection.get(ids=ids, limit=limit, offset=offset or None, include=["documents", "metadatas"])
+
+    def count(self):
+        return self.collection.count()
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process exact cosine search over a normalized float32 matrix.
+    Vectors live in a memory-mapped file; documents and metadata are kept in
+    columnar lists in memory and persisted row by row to SQLite.
+    Deletes move the last row into the freed slot, so rows stay contiguous.
+
+    With precision "float16" or "int8" (per-vector scale) a compact copy of
+    the vectors is kept in memory for the coarse scan, and the best
+    n_results * rerank_factor candidates are re-scored exactly against the
+    float32 rows on disk.
+
+    Inverted indexes (value -> rows) over the INDEXED_FIELDS metadata columns
+    resolve `where` filters up front, so filtered queries only score the
+    matching rows; other fields fall back to a scan of the metadata column.
+
+    With index "ivf", build_index() clusters the vectors into an IVFIndex and
+    queries probe the `nprobe` closest clusters instead of scanning every row.
+    Writes make the index stale; until the next build_index() queries are exact.
+    """
+
+    PRECISIONS = ("float32", "float16", "int8")
+    SCAN_BLOCK_ROWS = 65536  # Rows scored per matrix product, bounds temporary memory
+    INDEXED_FIELDS = ("topic", "difficulty", "chapter", "subject")
+
+    def __init__(self, path: str, precision: str = "float32", rerank_factor: int = 4,
+                 indexed_fields: Optional[List[str]] = None, index: str = "flat",
+                 ivf_clusters: Optional[int] = None, nprobe: int = 8):
+        if precision not in self.PRECISIONS:
+            raise ValueError(f"Unsupported vector precision: {precision}")
+        if index not in ("flat", "ivf"):
+            raise ValueError(f"Unsupported vector index: {index}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.precision = precision
+        self.rerank_factor = max(rerank_factor, 1)
+        self._compact = None
+        self._scales = None
+        self._indexes: Dict[str, Dict[Any, Set[int]]] = {
+            name: {} for name in (self.INDEXED_FIELDS if indexed_fields is None else indexed_fields)
+        }
+        self._lock = threading.RLock()
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._db = sqlite3.connect(os.path.join(path, "store.db"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "id TEXT PRIMARY KEY, row INTEGER NOT NULL, document TEXT, metadata TEXT)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        self._db.commit()
+
+        self.dim = self._get_meta("dim")
+        self._capacity = self._get_meta("capacity") or 0
+        # Bumped by every write; an IVF index is only used while it matches
+        self.version = self._get_meta("version") or 0
+        self.nprobe = nprobe
+        self.ivf = IVFIndex(os.path.join(path, "ivf"), n_clusters=ivf_clusters) if index == "ivf" else None
+        self._vectors = None
+        if self.dim and self._capacity:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                      shape=(self._capacity, self.dim))
+        self._load_rows()
+        if self.precision != "float32" and self._vectors is not None:
+            self._grow_compact(self._capacity)
+            for start in range(0, len(self.ids), self.SCAN_BLOCK_ROWS):
+                end = min(start + self.SCAN_BLOCK_ROWS, len(self.ids))
+                self._store_compact(np.arange(start, end), np.asarray(self._vectors[start:end]))
+
+    def _get_meta(self, name: str) -> Optional[int]:
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name: str, value: int):
+        self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def _bump_version(self):
+        self.version += 1
+        self._set_meta("version", self.version)
+
+    def _load_rows(self):
+        rows = self._db.execute("SELECT id, row, document, metadata FROM items ORDER BY row").fetchall()
+        self.ids = [r[0] for r in rows]
+        self.documents = [r[2] for r in rows]
+        self.columns: Dict[str, List[Any]] = {}
+        for i, r in enumerate(rows):
+            self._set_metadata(i, json.loads(r[3]) if r[3] else {})
+        self._row_of = {item_id: i for i, item_id in enumerate(self.ids)}
+
+    def _set_metadata(self, row: int, metadata: Dict[str, Any]):
+        """Write one row of metadata into the columnar lists, padding new columns with None"""
+        for name in metadata:
+            if name not in self.columns:
+                self.columns[name] = [None] * len(self.ids)
+        for name, column in self.columns.items():
+            while len(column) <= row:
+                column.append(None)
+            value = metadata.get(name)
+            index = self._indexes.get(name)
+            if index is not None:
+                self._index_remove(index, column[row], row)
+                if value is not None:
+                    index.setdefault(value, set()).add(row)
+            column[row] = value
+
+    @staticmethod
+    def _index_remove(index: Dict[Any, Set[int]], value: Any, row: int):
+        rows = index.get(value)
+        if rows is not None:
+            rows.discard(row)
+            if not rows:
+                del index[value]
+
+    def _move_indexed_row(self, source: int, target: int):
+        """Re-point index entries from row `source` to row `target`"""
+        for name, index in self._indexes.items():
+            column = self.columns.get(name)
+            if column is not None and column[source] is not None:
+                self._index_remove(index, column[source], source)
+                index.setdefault(column[source], set()).add(target)
+
+    def _metadata(self, row: int) -> Dict[str, Any]:
+        return {name: column[row] for name, column in self.columns.items() if column[row] is not None}
+
+    def _ensure_capacity(self, rows_needed: int):
+        if rows_needed <= self._capacity:
+            return
+        new_capacity = max(rows_needed, self._capacity * 2, 1024)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                  shape=(new_capacity, self.dim))
+        self._capacity = new_capacity
+        self._set_meta("capacity", new_capacity)
+        if self.precision != "float32":
+            self._grow_compact(new_capacity)
+
+    def _grow_compact(self, capacity: int):
+        dtype = np.float16 if self.precision == "float16" else np.int8
+        compact = np.zeros((capacity, self.dim), dtype=dtype)
+        scales = np.zeros(capacity, dtype=np.float32)
+        if self._compact is not None:
+            compact[:len(self._compact)] = self._compact
+            scales[:len(self._scales)] = self._scales
+        self._compact = compact
+        self._scales = scales
+
+    def _store_compact(self, rows, vectors: np.ndarray):
+        """Write the compact (float16 or int8) representation of normalized vectors"""
+        if self.precision == "float16":
+            self._compact[rows] = vectors.astype(np.float16)
+        elif self.precision == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self._compact[rows] = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+            self._scales[rows] = scales
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        if not ids:
+            return
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._set_meta("dim", self.dim)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dim}")
+
+            rows = []
+            for item_id, document, metadata in zip(ids, documents, metadatas):
+                row = self._row_of.get(item_id)
+                if row is None:
+                    row = len(self.ids)
+                    self._row_of[item_id] = row
+                    self.ids.append(item_id)
+                    self.documents.append(document)
+                else:
+                    self.documents[row] = document
+                self._set_metadata(row, metadata or {})
+                rows.append(row)
+
+            self._ensure_capacity(len(self.ids))
+            self._bump_version()
+            self._vectors[rows] = vectors
+            self._vectors.flush()
+            if self.precision != "float32":
+                self._store_compact(rows, vectors)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO items (id, row, document, metadata) VALUES (?, ?, ?, ?)",
+                [(item_id, row, document, json.dumps(metadata or {}))
+                 for item_id, row, document, metadata in zip(ids, rows, documents, metadatas)]
+            )
+            self._db.commit()
+
+    def delete(self, ids):
+        with self._lock:
+            for item_id in ids:
+                row = self._row_of.pop(item_id, None)
+                if row is None:
+                    continue
+                last = len(self.ids) - 1
+                for name, index in self._indexes.items():
+                    if name in self.columns:
+                        self._index_remove(index, self.columns[name][row], row)
+                if row != last:
+                    # Move the last row into the freed slot
+                    moved_id = self.ids[last]
+                    self._move_indexed_row(last, row)
+                    self.ids[row] = moved_id
+                    self.documents[row] = self.documents[last]
+                    for column in self.columns.values():
+                        column[row] = column[last]
+                    self._vectors[row] = self._vectors[last]
+                    if self._compact is not None:
+                        self._compact[row] = self._compact[last]
+                        self._scales[row] = self._scales[last]
+                    self._row_of[moved_id] = row
+                    self._db.execute("UPDATE items SET row = ? WHERE id = ?", (row, moved_id))
+                self.ids.pop()
+                self.documents.pop()
+                for column in self.columns.values():
+                    column.pop()
+                self._db.execute("DELETE FROM items WHERE id = ?", (item_id,))
+                self._bump_version()
+            if self._vectors is not None:
+                self._vectors.flush()
+            self._db.commit()
+
+    def _field_rows(self, name: str, condition: Any) -> Set[int]:
+        """Rows whose metadata field matches the condition, via the inverted index when possible"""
+        index = self._indexes.get(name)
+        if index is not None:
+            if not isinstance(condition, dict):
+                return set(index.get(condition, ()))
+            if set(condition) <= {"$eq", "$in"}:
+                rows = None
+                for op, operand in condition.items():
+                    values = [operand] if op == "$eq" else operand
+                    matched = set().union(*(index.get(v, ()) for v in values))
+                    rows = matched if rows is None else rows & matched
+                return rows
+        column = self.columns.get(name) or [None] * len(self.ids)
+        return {row for row, value in enumerate(column) if _match_condition(value, condition)}
+
+    def _filter_rows(self, where: Dict[str, Any]) -> Set[int]:
+        """Rows matching a Chroma-style `where` filter"""
+        rows = None
+        for key, condition in where.items():
+            if key == "$and":
+                matched = set.intersection(*(self._filter_rows(c) for c in condition)) if condition else set()
+            elif key == "$or":
+                matched = set().union(*(self._filter_rows(c) for c in condition))
+            else:
+                matched = self._field_rows(key, condition)
+            rows = matched if rows is None else rows & matched
+        return rows if rows is not None else set(range(len(self.ids)))
+
+    def _scan_scores(self, queries: np.ndarray, rows) -> np.ndarray:
+        """Cosine scores of the queries against the given rows (a slice or an index array)"""
+        if self.precision == "float32":
+            return queries @ self._vectors[rows].T
+        scores = queries @ self._compact[rows].astype(np.float32).T
+        if self.precision == "int8":
+            scores *= self._scales[rows]
+        return scores
+
+    def _top_rows(self, queries: np.ndarray, candidates: int, count: int,
+                  subset: Optional[np.ndarray] = None) -> np.ndarray:
+        """Best `candidates` rows per query from a block-wise scan of all rows or a sorted subset, unsorted"""
+        best_rows = None
+        best_scores = None
+        total = count if subset is None else len(subset)
+        for start in range(0, total, self.SCAN_BLOCK_ROWS):
+            end = min(start + self.SCAN_BLOCK_ROWS, total)
+            if subset is None:
+                scores = self._scan_scores(queries, slice(start, end))
+                rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            else:
+                scores = self._scan_scores(queries, subset[start:end])
+                rows = np.broadcast_to(subset[start:end], scores.shape)
+            if best_rows is not None:
+                scores = np.concatenate([best_scores, scores], axis=1)
+                rows = np.concatenate([best_rows, rows], axis=1)
+            keep = min(candidates, scores.shape[1])
+            # argpartition finds the top candidates in linear time without sorting
+            top = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_rows = np.take_along_axis(rows, top, axis=1)
+        return best_rows
+
+    def build_index(self, retrain: bool = False) -> Optional[Dict[str, Any]]:
+        """(Re)build the IVF index from the current rows; None without one or when it is up to date"""
+        with self._lock:
+            if self.ivf is None or (self.ivf.is_current(self.version) and not retrain):
+                return None
+            if self._vectors is None:
+                return None
+            return self.ivf.build(self._vectors[:len(self.ids)], self.version, retrain)
+
+    def _use_ivf(self, subset: Optional[np.ndarray]) -> bool:
+        if self.ivf is None or not self.ivf.is_current(self.version):
+            return False
+        # Small filtered subsets are cheaper to scan exactly
+        return subset is None or len(subset) > self.SCAN_BLOCK_ROWS
+
+    def query(self, query_embeddings, n_results=10, where=None, nprobe=None):
+        queries = self._normalize(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self._lock:
+            subset = None
+            count = len(self.ids)
+            if where:
+                subset = np.fromiter(sorted(self._filter_rows(where)), dtype=np.int64)
+                count = len(subset)
+            k = min(n_results, count)
+            if k == 0:
+                for key in result:
+                    result[key] = [[] for _ in range(len(queries))]
+                return result
+
+            if self._use_ivf(subset):
+                allowed = None
+                if subset is not None:
+                    allowed = np.zeros(len(self.ids), dtype=bool)
+                    allowed[subset] = True
+                matches = self.ivf.search(queries, k, nprobe or self.nprobe, allowed)
+            else:
+                quantized = self.precision != "float32"
+                candidates = self._top_rows(queries, k * self.rerank_factor if quantized else k, count, subset)
+                matches = []
+                for q in range(len(queries)):
+                    # Candidates are (re-)scored exactly against the float32 rows
+                    rows = np.sort(candidates[q])
+                    exact = self._vectors[rows] @ queries[q]
+                    order = np.argsort(-exact)[:k]
+                    matches.append((rows[order], exact[order]))
+            for rows, scores in matches:
+                result["ids"].append([self.ids[r] for r in rows])
+                result["documents"].append([self.documents[r] for r in rows])
+                result["metadatas"].append([self._metadata(r) for r in rows])
+                result["distances"].append((1.0 - scores).tolist())
+        return result
+
+    def get(self, ids=None, limit=None, offset=0):
+        with self._lock:
+            if ids is None:
+                rows = range(offset, len(self.ids) if limit is None else min(offset + limit, len(self.ids)))
+            else:
+                rows = [self._row_of[i] for i in ids if i in self._row_of]
+            return {
+                "ids": [self.ids[r] for r in rows],
+                "documents": [self.documents[r] for r in rows],
+                "metadatas": [self._metadata(r) for r in rows],
+            }
+
+    def count(self):
+        return len(self.ids)
+
+    def stats(self) -> Dict[str, Any]:
+        """Row count and in-memory footprint of the scanned representation"""
+        dim = self.dim or 0
+        bytes_per_vector = {"float32": 4 * dim, "float16": 2 * dim, "int8": dim + 4}[self.precision]
+        stats = {
+            "rows": len(self.ids),
+            "precision": self.precision,
+            "bytes_per_vector": bytes_per_vector,
+            "scan_bytes": bytes_per_vector * len(self.ids),
+            "indexed_fields": {name: len(index) for name, index in self._indexes.items()},
+        }
+        if self.ivf is not None:
+            stats["ivf"] = dict(self.ivf.stats(), current=self.ivf.is_current(self.version), nprobe=self.nprobe)
+        return stats